@@ -0,0 +1,246 @@
+"""Almacén de fotos direccionado por contenido.
+
+Cada foto se guarda una sola vez bajo el SHA-256 de sus bytes; subir la misma
+imagen dos veces no ocupa más espacio. En la base de datos solo queda la URL
+``/fotos/<sha256><ext>``, que sirve ``routers/fotos.py`` con ETag (el hash) y
+soporte de Range. Como el contenido de una URL nunca cambia, se puede cachear
+para siempre. ``variantes_fotos.py`` guarda junto a cada foto sus versiones
+reducidas (``<hash>_mini.webp``, etc.).
+
+Por defecto (``ALMACEN_FOTOS=disco``) las fotos se guardan en FOTOS_DIR
+(uploads/fotos), repartidas en subdirectorios por los primeros caracteres del
+hash. El disco se considera duradero (FOTOS_DIR_PERSISTENTE, 1) salvo en
+Render y Railway (se detectan por RENDER y RAILWAY_ENVIRONMENT), donde el
+disco de cada instancia se pierde al redesplegar y no lo comparten varias
+instancias; ahí la migración no saca las fotos de la base.
+
+En esos hosts se configura ``ALMACEN_FOTOS=base``: los bytes van a la tabla
+``fotos_almacen`` de la base de datos, lo único duradero que tienen. Para
+servirlas con Range, cada instancia copia las fotos que lee a FOTOS_CACHE_DIR
+(un caché que se puede borrar). Otro backend (S3, GCS) se configura con
+``ALMACEN_FOTOS=paquete.modulo:Clase``: una clase sin argumentos con los
+mismos métodos que ``AlmacenDisco``; si no guarda en disco local, ``ruta``
+devuelve None y la foto se sirve con ``leer``.
+"""
+import base64
+import binascii
+import hashlib
+import importlib
+import mimetypes
+import os
+import re
+import shutil
+import tempfile
+from typing import Optional
+
+from sqlalchemy import select
+
+FOTOS_DIR = os.getenv("FOTOS_DIR", "uploads/fotos")
+# Hosts cuyo disco se pierde en cada despliegue
+HOST_EFIMERO = bool(os.getenv("RENDER") or os.getenv("RAILWAY_ENVIRONMENT"))
+FOTOS_DIR_PERSISTENTE = os.getenv("FOTOS_DIR_PERSISTENTE", "0" if HOST_EFIMERO else "1") == "1"
+FOTOS_CACHE_DIR = os.getenv("FOTOS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "red-ciudadana-fotos"))
+ALMACEN_FOTOS = os.getenv("ALMACEN_FOTOS", "disco")
+
+PREFIJO_URL = "/fotos/"
+CLAVE = re.compile(r"^[0-9a-f]{64}$")
+
+_FIRMAS = ((b"\xff\xd8\xff", ".jpg"), (b"\x89PNG\r\n\x1a\n", ".png"), (b"GIF87a", ".gif"), (b"GIF89a", ".gif"))
+_DATA_URI = re.compile(r"^data:([\w.+-]+/[\w.+-]+)?(?:;[\w-]+=[^;,]*)*;base64,", re.IGNORECASE)
+
+
+class AlmacenDisco:
+    def __init__(self, directorio: str = FOTOS_DIR, duradero: bool = FOTOS_DIR_PERSISTENTE):
+        self.directorio = directorio
+        # Si las fotos sobreviven a un redespliegue y las ven todas las instancias
+        self.duradero = duradero
+
+    def _ruta(self, clave: str) -> str:
+        return os.path.join(self.directorio, clave[:2], clave[2:4], clave)
+
+    def guardar(self, datos: bytes) -> str:
+        """Guarda los bytes (si no estaban) y devuelve su clave."""
+        clave = hashlib.sha256(datos).hexdigest()
+        if not self.existe(clave):
+            self.guardar_como(clave, datos)
+        return clave
+
+    def guardar_como(self, clave: str, datos: bytes):
+        """Guarda datos derivados de una foto (variantes) bajo ``<hash>_<sufijo>``, junto al original."""
+        self._escribir(clave, lambda f: f.write(datos))
+
+    def guardar_archivo(self, clave: str, archivo):
+        """Como ``guardar_como`` copiando un archivo abierto por partes."""
+        self._escribir(clave, lambda f: shutil.copyfileobj(archivo, f))
+
+    def _escribir(self, clave: str, escribir):
+        ruta = self._ruta(clave)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        # Archivo temporal + rename: nunca se sirve una foto a medio escribir
+        fd, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), prefix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                escribir(f)
+            os.replace(temporal, ruta)
+        except BaseException:
+            os.unlink(temporal)
+            raise
+
+    def existe(self, clave: str) -> bool:
+        return os.path.exists(self._ruta(clave))
+
+    def ruta(self, clave: str) -> Optional[str]:
+        """Archivo local con el contenido (para servirlo con sendfile)."""
+        ruta = self._ruta(clave)
+        return ruta if os.path.exists(ruta) else None
+
+    def leer(self, clave: str) -> bytes:
+        with open(self._ruta(clave), "rb") as f:
+            return f.read()
+
+
+class AlmacenBase:
+    """Fotos en la tabla fotos_almacen; las leídas se copian a un caché en disco local."""
+
+    duradero = True
+
+    def __init__(self, cache_dir: str = FOTOS_CACHE_DIR):
+        self.cache = AlmacenDisco(cache_dir, duradero=False)
+
+    def guardar(self, datos: bytes, conn=None) -> str:
+        """Guarda los bytes (si no estaban) y devuelve su clave.
+
+        Con ``conn`` se escribe en esa conexión (dentro de su transacción)."""
+        clave = hashlib.sha256(datos).hexdigest()
+        if not self.existe(clave, conn):
+            self.guardar_como(clave, datos, conn)
+        return clave
+
+    def guardar_como(self, clave: str, datos: bytes, conn=None):
+        from .database import engine, insert_sin_conflicto
+        from .models import FotoAlmacen
+
+        def escribir(c):
+            c.execute(insert_sin_conflicto(c, FotoAlmacen.__table__).values(
+                clave=clave, contenido=datos, tamano=len(datos)))
+
+        if conn is not None:
+            escribir(conn)
+        else:
+            with engine.begin() as c:
+                escribir(c)
+
+    def guardar_archivo(self, clave: str, archivo):
+        # La columna recibe los bytes completos
+        self.guardar_como(clave, archivo.read())
+
+    def existe(self, clave: str, conn=None) -> bool:
+        if self.cache.existe(clave):
+            return True
+        from .database import engine
+        from .models import FotoAlmacen
+        consulta = select(FotoAlmacen.clave).where(FotoAlmacen.clave == clave)
+        if conn is not None:
+            return conn.execute(consulta).first() is not None
+        with engine.connect() as c:
+            return c.execute(consulta).first() is not None
+
+    def ruta(self, clave: str) -> Optional[str]:
+        """Archivo del caché local, si esta instancia ya leyó la foto."""
+        return self.cache.ruta(clave)
+
+    def leer(self, clave: str) -> bytes:
+        if self.cache.existe(clave):
+            return self.cache.leer(clave)
+        from .database import engine
+        from .models import FotoAlmacen
+        with engine.connect() as c:
+            datos = c.execute(select(FotoAlmacen.contenido).where(FotoAlmacen.clave == clave)).scalar_one()
+        self.cache.guardar_como(clave, datos)
+        return datos
+
+
+_almacen = None
+
+
+def almacen():
+    global _almacen
+    if _almacen is None:
+        if ALMACEN_FOTOS == "base":
+            _almacen = AlmacenBase()
+        elif ALMACEN_FOTOS == "disco":
+            _almacen = AlmacenDisco()
+        else:
+            modulo, clase = ALMACEN_FOTOS.split(":")
+            _almacen = getattr(importlib.import_module(modulo), clase)()
+    return _almacen
+
+
+def almacen_duradero() -> bool:
+    """Si el almacén configurado conserva las fotos entre despliegues e instancias."""
+    return getattr(almacen(), "duradero", True)
+
+
+def extension(datos: bytes, tipo: Optional[str] = None) -> str:
+    """Extensión por los primeros bytes; si no se reconoce, por el tipo MIME declarado."""
+    for firma, ext in _FIRMAS:
+        if datos.startswith(firma):
+            return ext
+    if datos[:4] == b"RIFF" and datos[8:12] == b"WEBP":
+        return ".webp"
+    return (mimetypes.guess_extension(tipo) if tipo else None) or ".bin"
+
+
+def guardar_foto(datos: bytes, tipo: Optional[str] = None, conn=None) -> str:
+    """Guarda la foto y devuelve su URL relativa (/fotos/<hash><ext>).
+
+    ``conn`` (solo AlmacenBase) escribe dentro de esa transacción."""
+    destino = almacen()
+    clave = destino.guardar(datos, conn=conn) if conn is not None else destino.guardar(datos)
+    return f"{PREFIJO_URL}{clave}{extension(datos, tipo)}"
+
+
+def guardar_archivo(archivo, tipo: Optional[str] = None) -> tuple:
+    """Como ``guardar_foto`` para un archivo abierto (``UploadFile.file``); devuelve (URL, tamaño).
+
+    El hash se calcula por partes y la foto solo se lee entera si no estaba
+    en el almacén. Bloquea: desde un endpoint async se llama con
+    ``run_in_threadpool``."""
+    archivo.seek(0)
+    cabecera = archivo.read(16)
+    archivo.seek(0)
+    clave = hashlib.file_digest(archivo, "sha256").hexdigest()
+    # file_digest no siempre mueve la posición (con getbuffer() no lee el archivo)
+    tamano = archivo.seek(0, os.SEEK_END)
+    destino = almacen()
+    if not destino.existe(clave):
+        archivo.seek(0)
+        if hasattr(destino, "guardar_archivo"):
+            destino.guardar_archivo(clave, archivo)
+        else:
+            destino.guardar_como(clave, archivo.read())
+    return f"{PREFIJO_URL}{clave}{extension(cabecera, tipo)}", tamano
+
+
+def es_data_uri(valor: Optional[str]) -> bool:
+    return bool(valor) and _DATA_URI.match(valor[:200]) is not None
+
+
+def decodificar_base64(valor: str) -> tuple:
+    """(bytes, tipo MIME o None) de un data URI o de base64 sin encabezado.
+
+    Lanza ValueError si el base64 no es válido."""
+    encabezado = _DATA_URI.match(valor[:200])
+    contenido = "".join((valor[encabezado.end():] if encabezado else valor).split())
+    try:
+        datos = base64.b64decode(contenido, validate=True)
+    except binascii.Error as e:
+        raise ValueError(f"Foto en base64 inválida: {e}")
+    if not datos:
+        raise ValueError("Foto vacía")
+    return datos, encabezado.group(1) if encabezado else None
+
+
+def guardar_data_uri(valor: str) -> str:
+    """Guarda una foto en data URI (data:image/jpeg;base64,...) y devuelve su URL."""
+    return guardar_foto(*decodificar_base64(valor))
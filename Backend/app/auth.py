@@ -1,32 +1,72 @@
+import asyncio
+import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import func, inspect, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from dotenv import load_dotenv
 
-from .database import get_db
+from . import cache_reportes
+from .cache import TTLCache
+from .database import get_async_db, get_db, SessionLocal
 from .models import Usuario
+from .replica import usuario_en_curso
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Configuración para producción y desarrollo
 SECRET_KEY = os.getenv("SECRET_KEY", "tu-clave-secreta-super-segura-aqui-cambiar-en-produccion")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# email -> (generación, copia desconectada del Usuario)
+#
+# Un acierto no consulta la base. invalidar_usuario incrementa la generación
+# del usuario en el backend del cache de reportes, y una entrada con otra
+# generación se descarta. Con Redis (REPORTES_CACHE_URL) la generación es
+# compartida y una revocación o desactivación aplica de inmediato en todos los
+# workers; en memoria aplica de inmediato en el worker que la hizo y en los
+# demás a lo más en AUTH_CACHE_TTL.
+_cache_usuarios = TTLCache(ttl=AUTH_CACHE_TTL, maxsize=4096)
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+# bcrypt libera el GIL, así que un pool de hilos escala con los núcleos. El
+# tamaño del pool limita cuántos hashes corren a la vez; el resto espera en cola
+# sin bloquear el event loop.
+_pool_hash = ThreadPoolExecutor(max_workers=max(1, PASSWORD_HASH_WORKERS), thread_name_prefix="password-hash")
+
+async def _en_pool_hash(funcion, *args):
+    return await asyncio.get_running_loop().run_in_executor(_pool_hash, funcion, *args)
+
+def cola_hash() -> int:
+    """Hashes esperando un hilo libre del pool."""
+    return _pool_hash._work_queue.qsize()
+
+async def get_password_hash_async(password):
+    """Igual que get_password_hash, sin bloquear el event loop."""
+    return await _en_pool_hash(pwd_context.hash, password)
+
 def get_user(db: Session, email: str):
     return db.query(Usuario).filter(Usuario.email == email).first()
 
@@ -38,6 +78,29 @@ def authenticate_user(db: Session, email: str, password: str):
         return False
     return user
 
+async def authenticate_user_async(db: Session, email: str, password: str):
+    """Como authenticate_user, pero verifica en el pool de hash.
+
+    Si el hash guardado usa otro costo (BCRYPT_ROUNDS) o un esquema obsoleto,
+    se reemplaza por uno nuevo aprovechando que se tiene la contraseña en claro.
+    """
+    user = get_user(db, email)
+    if not user:
+        return False
+    # Soltar la conexión mientras se espera al pool: con muchos logins en cola
+    # se agotaría el pool de conexiones de la base.
+    db.expunge(user)
+    db.rollback()
+    valido, nuevo_hash = await _en_pool_hash(pwd_context.verify_and_update, password, user.password_hash)
+    if not valido:
+        return False
+    if nuevo_hash:
+        user = db.merge(user, load=False)
+        user.password_hash = nuevo_hash
+        db.commit()
+        invalidar_usuario(user.email)
+    return user
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -48,29 +111,172 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def _copia_desconectada(user: Usuario) -> Usuario:
+    copia = Usuario(**{attr.key: getattr(user, attr.key) for attr in inspect(Usuario).column_attrs})
+    make_transient_to_detached(copia)
+    return copia
+
+def _claves_generacion(email: str) -> list:
+    return ["auth", f"auth:{email}"]
+
+def _generacion(email: str) -> Optional[tuple]:
+    """Generación actual del usuario en el cache, o None si el backend no responde."""
+    try:
+        return tuple(cache_reportes.backend.generaciones(_claves_generacion(email)))
+    except Exception as e:
+        logger.warning(f"Generación de usuarios no disponible: {e}")
+        return None
+
+def invalidar_usuario(email: Optional[str] = None):
+    """Saca a un usuario del cache de autenticación (o vacía el cache si email es None).
+
+    Debe llamarse después del commit de cualquier cambio a un Usuario.
+    """
+    _cache_usuarios.invalidate(email)
+    try:
+        cache_reportes.backend.incrementar(["auth"] if email is None else [f"auth:{email}"])
+    except Exception as e:
+        logger.warning(f"No se pudo incrementar la generación de usuarios: {e}")
+
+def crear_tokens(user: Usuario) -> dict:
+    """Access token y refresh token para un usuario, ligados a su token_version."""
+    version = user.token_version or 0
+    return {
+        "access_token": create_access_token(
+            {"sub": user.email, "ver": version}, timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        ),
+        "refresh_token": create_access_token(
+            {"sub": user.email, "ver": version, "typ": "refresh"}, timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+        ),
+        "token_type": "bearer",
+    }
+
+def revocar_tokens(db: Session, user: Usuario):
+    """Invalida todos los tokens emitidos al usuario. El llamador hace commit y invalidar_usuario."""
+    # Incremento en la base (no sobre el valor leído): dos revocaciones a la vez suman dos
+    db.execute(update(Usuario).where(Usuario.id == user.id)
+               .values(token_version=func.coalesce(Usuario.token_version, 0) + 1))
+
+def _usuario_de_token(db: Session, payload: dict) -> Optional[Usuario]:
+    """Usuario del token (cache o base), o None si no existe o sus tokens fueron revocados."""
+    email = payload.get("sub")
+    if email is None:
+        return None
+    # La generación se lee antes que la base: un cambio entre ambas lecturas
+    # deja la entrada con una generación vieja y se descarta en la siguiente
+    generacion = _generacion(email)
+    cacheado = _cache_usuarios.get(email)
+    if cacheado is not None and generacion is not None and cacheado[0] == generacion:
+        # Copia ligada a la sesión de esta petición
+        user = db.merge(cacheado[1], load=False)
+    else:
+        user = get_user(db, email=email)
+        if user is None:
+            return None
+        if generacion is not None:
+            _cache_usuarios.set(email, (generacion, _copia_desconectada(user)))
+    # Tokens emitidos antes de existir "ver" cuentan como versión 0
+    if (user.token_version or 0) != payload.get("ver", 0):
+        return None
+    return user
+
+async def _usuario_de_token_async(db: AsyncSession, payload: dict) -> Optional[Usuario]:
+    """Como _usuario_de_token sobre una AsyncSession; devuelve una copia desconectada."""
+    email = payload.get("sub")
+    if email is None:
+        return None
+    generacion = _generacion(email)
+    cacheado = _cache_usuarios.get(email)
+    if cacheado is not None and generacion is not None and cacheado[0] == generacion:
+        user = cacheado[1]
+    else:
+        user = (await db.execute(select(Usuario).where(Usuario.email == email))).scalars().first()
+        if user is None:
+            return None
+        user = _copia_desconectada(user)
+        # Soltar la conexión: un endpoint que lee de la réplica no ocupa además una de la primaria
+        await db.rollback()
+        if generacion is not None:
+            _cache_usuarios.set(email, (generacion, user))
+    if (user.token_version or 0) != payload.get("ver", 0):
+        return None
+    # Cada petición recibe su copia; la del cache no se modifica
+    return _copia_desconectada(user)
+
+def renovar_tokens(db: Session, refresh_token: str) -> Optional[dict]:
+    """Nuevo access token a partir de un refresh token válido, sin verificar la contraseña."""
+    try:
+        payload = jwt.decode(refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    if payload.get("typ") != "refresh":
+        return None
+    user = _usuario_de_token(db, payload)
+    if user is None or not user.activo:
+        return None
+    tokens = crear_tokens(user)
+    tokens["refresh_token"] = refresh_token
+    return tokens
+
+def _credenciales_invalidas():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _payload_de_acceso(token: str) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
     except JWTError:
-        raise credentials_exception
-    user = get_user(db, email=email)
+        raise _credenciales_invalidas()
+    if payload.get("typ") == "refresh":
+        raise _credenciales_invalidas()
+    return payload
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    payload = _payload_de_acceso(token)
+    user = _usuario_de_token(db, payload)
+    if user is None:
+        raise _credenciales_invalidas()
+    usuario_en_curso.set(payload.get("sub"))
+    return user
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    """get_current_user para los endpoints con sesión asíncrona: comparte su sesión
+    (get_async_db) y no bloquea el event loop."""
+    payload = _payload_de_acceso(token)
+    user = await _usuario_de_token_async(db, payload)
     if user is None:
-        raise credentials_exception
+        raise _credenciales_invalidas()
+    usuario_en_curso.set(payload.get("sub"))
     return user
 
+def es_token_admin(token: str) -> bool:
+    """True si es un access token vigente de un administrador activo (fuera de Depends)."""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return False
+    if payload.get("typ") == "refresh":
+        return False
+    db = SessionLocal()
+    try:
+        user = _usuario_de_token(db, payload)
+        return user is not None and user.activo and user.rol == "admin"
+    finally:
+        db.close()
+
 async def get_current_active_user(current_user: Usuario = Depends(get_current_user)):
     if not current_user.activo:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
+async def get_current_active_user_async(current_user: Usuario = Depends(get_current_user_async)):
+    if not current_user.activo:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return current_user
+
 async def require_admin(current_user: Usuario = Depends(get_current_active_user)):
     if current_user.rol != "admin":
         raise HTTPException(
@@ -0,0 +1,56 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Cache en memoria (por proceso) con expiración por entrada y tamaño máximo."""
+
+    def __init__(self, ttl: float, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entrada = self._datos.get(key)
+            if entrada is None:
+                return default
+            expira, valor = entrada
+            if expira < time.monotonic():
+                del self._datos[key]
+                return default
+            self._datos.move_to_end(key)
+            return valor
+
+    def set(self, key, value, ttl: float | None = None):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        expira = time.monotonic() + ttl
+        with self._lock:
+            self._datos[key] = (expira, value)
+            self._datos.move_to_end(key)
+            while len(self._datos) > self.maxsize:
+                self._datos.popitem(last=False)
+
+    def get_or_set(self, key, factory, ttl: float | None = None):
+        """Devuelve el valor cacheado o lo calcula con factory() y lo guarda."""
+        _faltante = object()
+        valor = self.get(key, _faltante)
+        if valor is _faltante:
+            valor = factory()
+            self.set(key, valor, ttl)
+        return valor
+
+    def invalidate(self, key=None):
+        """Elimina una entrada, o todo el cache si key es None."""
+        with self._lock:
+            if key is None:
+                self._datos.clear()
+            else:
+                self._datos.pop(key, None)
+
+    def __len__(self):
+        return len(self._datos)
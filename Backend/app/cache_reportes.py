@@ -0,0 +1,221 @@
+"""Cache de resultados de /reportes/* por (endpoint, parámetros, alcance del usuario).
+
+Cada reporte declara de qué tablas depende. La clave de cache incluye la
+"generación" actual de esas tablas, y la generación se incrementa al hacer
+commit de cualquier cambio ORM sobre ellas (eventos de Session, abajo). Así una
+escritura invalida de inmediato todos los reportes afectados sin tener que
+buscarlos; las entradas viejas simplemente dejan de consultarse y expiran por TTL.
+
+Con réplica, un reporte leído de ella poco después de un cambio puede venir
+sin ese cambio aunque ya lleve la generación nueva en la clave. Por eso los
+backends recuerdan también cuándo cambió cada tabla por última vez, y durante
+LECTURA_PROPIA_SEGUNDOS después de un cambio lo que se lee de la réplica se
+devuelve pero no se guarda.
+
+Backends:
+- memoria (por defecto): por proceso, usando TTLCache
+- redis: si REPORTES_CACHE_URL está definida y el paquete ``redis`` está
+  instalado; comparte entradas y generaciones entre workers
+"""
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .cache import TTLCache
+from .replica import LECTURA_PROPIA_SEGUNDOS, sesion_en_replica
+
+logger = logging.getLogger(__name__)
+
+REPORTES_CACHE_TTL = float(os.getenv("REPORTES_CACHE_TTL", "15"))
+REPORTES_CACHE_URL = os.getenv("REPORTES_CACHE_URL")
+REPORTES_CACHE_MAXSIZE = int(os.getenv("REPORTES_CACHE_MAXSIZE", "2048"))
+
+ROLES_LIDER = ["lider_estatal", "lider_regional", "lider_municipal", "lider_zona"]
+
+
+class MemoriaBackend:
+    """Entradas y generaciones en memoria del proceso."""
+
+    def __init__(self, ttl: float, maxsize: int):
+        self._entradas = TTLCache(ttl=ttl, maxsize=maxsize)
+        self._generaciones = {}
+        self._cambios = {}
+        self._lock = threading.Lock()
+
+    def generaciones(self, tablas) -> list:
+        return [self._generaciones.get(t, 0) for t in tablas]
+
+    def estado(self, tablas) -> tuple:
+        """(generaciones, time.time() del último cambio en cualquiera de las tablas o 0)."""
+        return self.generaciones(tablas), max((self._cambios.get(t, 0.0) for t in tablas), default=0.0)
+
+    def incrementar(self, tablas):
+        with self._lock:
+            ahora = time.time()
+            for t in tablas:
+                self._generaciones[t] = self._generaciones.get(t, 0) + 1
+                self._cambios[t] = ahora
+
+    def get(self, clave):
+        return self._entradas.get(clave)
+
+    def set(self, clave, valor):
+        self._entradas.set(clave, valor)
+
+
+class RedisBackend:
+    """Entradas (JSON con expiración) y generaciones (INCR) en un servidor Redis."""
+
+    PREFIJO = "reportes:"
+
+    def __init__(self, cliente, ttl: float):
+        self._cliente = cliente
+        self._ttl = max(1, int(ttl))
+
+    def generaciones(self, tablas) -> list:
+        valores = self._cliente.mget([f"{self.PREFIJO}gen:{t}" for t in tablas]) if tablas else []
+        return [int(v) if v is not None else 0 for v in valores]
+
+    def estado(self, tablas) -> tuple:
+        """Como MemoriaBackend.estado, con generaciones y tiempos en un solo MGET."""
+        if not tablas:
+            return [], 0.0
+        claves = [f"{self.PREFIJO}gen:{t}" for t in tablas] + [f"{self.PREFIJO}gen_t:{t}" for t in tablas]
+        valores = self._cliente.mget(claves)
+        generaciones = [int(v) if v is not None else 0 for v in valores[:len(tablas)]]
+        return generaciones, max(float(v) if v is not None else 0.0 for v in valores[len(tablas):])
+
+    def incrementar(self, tablas):
+        pipe = self._cliente.pipeline()
+        ahora = time.time()
+        for t in tablas:
+            pipe.incr(f"{self.PREFIJO}gen:{t}")
+            pipe.set(f"{self.PREFIJO}gen_t:{t}", ahora)
+        pipe.execute()
+
+    def get(self, clave):
+        valor = self._cliente.get(self.PREFIJO + clave)
+        return json.loads(valor) if valor is not None else None
+
+    def set(self, clave, valor):
+        self._cliente.set(self.PREFIJO + clave, json.dumps(valor), ex=self._ttl)
+
+
+def _crear_backend():
+    if REPORTES_CACHE_URL:
+        try:
+            import redis
+            cliente = redis.Redis.from_url(REPORTES_CACHE_URL)
+            cliente.ping()
+            logger.info("Cache de reportes en Redis")
+            return RedisBackend(cliente, REPORTES_CACHE_TTL)
+        except ImportError:
+            logger.warning("REPORTES_CACHE_URL definida pero el paquete redis no está instalado; usando memoria")
+        except Exception as e:
+            logger.warning(f"No se pudo conectar al cache de reportes en Redis ({e}); usando memoria")
+    return MemoriaBackend(REPORTES_CACHE_TTL, REPORTES_CACHE_MAXSIZE)
+
+
+backend = _crear_backend()
+
+
+def alcance(usuario) -> str:
+    """Parte de la clave que identifica qué datos puede ver el usuario."""
+    if usuario is None:
+        return "anonimo"
+    if usuario.rol == "admin":
+        return "admin"
+    if usuario.rol in ROLES_LIDER:
+        return f"red:{usuario.id}"
+    return f"usuario:{usuario.id}"
+
+
+def invalidar(*tablas):
+    """Invalida los reportes que dependen de las tablas indicadas."""
+    if tablas:
+        backend.incrementar(sorted(set(tablas)))
+
+
+def cachear_reporte(*tablas):
+    """Decorador para endpoints de reportes.
+
+    Los parámetros del endpoint (excepto ``db`` y ``current_user``) y el
+    alcance del usuario forman la clave; ``tablas`` son las tablas de las que
+    depende el resultado. El valor se guarda ya convertido a JSON.
+    """
+    tablas = tuple(sorted(set(tablas)))
+
+    def decorador(func):
+        @functools.wraps(func)
+        async def envoltura(*args, **kwargs):
+            if REPORTES_CACHE_TTL <= 0:
+                return await func(*args, **kwargs)
+            parametros = {k: v for k, v in kwargs.items() if k not in ("db", "current_user")}
+            try:
+                generaciones, ultimo_cambio = backend.estado(tablas)
+            except Exception as e:
+                logger.warning(f"Cache de reportes no disponible: {e}")
+                return await func(*args, **kwargs)
+            clave = "|".join([
+                func.__name__,
+                alcance(kwargs.get("current_user")),
+                json.dumps(jsonable_encoder(parametros), sort_keys=True),
+                ",".join(str(g) for g in generaciones),
+            ])
+            valor = backend.get(clave)
+            if valor is None:
+                valor = jsonable_encoder(await func(*args, **kwargs))
+                # La réplica puede no tener todavía el cambio que subió la generación
+                if time.time() - ultimo_cambio < LECTURA_PROPIA_SEGUNDOS and sesion_en_replica(kwargs.get("db")):
+                    return valor
+                backend.set(clave, valor)
+            return valor
+        return envoltura
+    return decorador
+
+
+# --- Invalidación automática al hacer commit -------------------------------
+
+def _registrar_tablas(session, tablas):
+    session.info.setdefault("tablas_modificadas", set()).update(tablas)
+
+
+@event.listens_for(Session, "before_flush")
+def _antes_de_flush(session, flush_context, instances):
+    tablas = {
+        obj.__table__.name
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+        if hasattr(obj, "__table__")
+    }
+    if tablas:
+        _registrar_tablas(session, tablas)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _ejecucion_orm(orm_execute_state):
+    # query.update() / query.delete() en bloque no pasan por el flush
+    if (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert) \
+            and orm_execute_state.bind_mapper is not None:
+        _registrar_tablas(orm_execute_state.session, {orm_execute_state.bind_mapper.local_table.name})
+
+
+@event.listens_for(Session, "after_commit")
+def _despues_de_commit(session):
+    tablas = session.info.pop("tablas_modificadas", None)
+    if tablas:
+        try:
+            invalidar(*tablas)
+        except Exception as e:
+            logger.warning(f"No se pudo invalidar el cache de reportes: {e}")
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _despues_de_rollback(session, previous_transaction):
+    session.info.pop("tablas_modificadas", None)
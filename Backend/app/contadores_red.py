@@ -0,0 +1,200 @@
+"""Contadores de tamaño de red por líder, mantenidos incrementalmente.
+
+Cada fila de ``contadores_red`` guarda, para un usuario activo:
+- personas_directas: personas activas con ese usuario como líder responsable
+- personas_red: personas activas en todo su subárbol (incluye las directas)
+- lideres_red: usuarios activos en su subárbol (sin contarse a sí mismo)
+
+Las funciones de este módulo NO hacen commit: se llaman antes del
+``db.commit()`` del endpoint para que el contador cambie en la misma
+transacción que el dato que lo origina. ``reconstruir_contadores`` recalcula
+todo desde cero y ``verificar_contadores`` reporta diferencias.
+
+El árbol cacheado de jerarquia.py se invalida después del commit (eventos de
+Session, abajo), no al sumar: si se invalidara antes, otra petición podría
+volver a cachearlo con los contadores todavía sin confirmar.
+"""
+import logging
+
+from sqlalchemy import case, event, func, select
+from sqlalchemy.orm import Session
+
+from .database import insert_sin_conflicto
+from .jerarquia import cargar_arbol, invalidar_arbol, subordinados_select, superiores_select
+from .models import ContadorRed as ContadorRedModel
+from .models import Persona as PersonaModel
+from .models import Usuario as UsuarioModel
+
+logger = logging.getLogger(__name__)
+
+
+def _cadena_ancestros(db: Session, user_id) -> list:
+    """El usuario y sus superiores activos, en una sola consulta recursiva.
+
+    La cadena se corta en el primer usuario inactivo, igual que el árbol de
+    /reportes/estructura-jerarquica.
+    """
+    if user_id is None:
+        return []
+    base = select(UsuarioModel.id, UsuarioModel.id_lider_superior).where(
+        UsuarioModel.id == user_id, UsuarioModel.activo == True
+    ).cte(name="ancestros", recursive=True)
+    superior = select(UsuarioModel.id, UsuarioModel.id_lider_superior).where(
+        UsuarioModel.id == base.c.id_lider_superior, UsuarioModel.activo == True
+    )
+    # UNION (no UNION ALL) evita ciclos infinitos si la jerarquía está corrupta
+    cte = base.union(superior)
+    return [row.id for row in db.execute(select(cte.c.id)).all()]
+
+
+def _invalidar_arbol_al_commit(db: Session):
+    db.info["invalidar_arbol"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _despues_de_commit(session):
+    if session.info.pop("invalidar_arbol", False):
+        invalidar_arbol()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _despues_de_rollback(session, previous_transaction):
+    session.info.pop("invalidar_arbol", None)
+
+
+def _asegurar_filas(db: Session, ids):
+    """Crea en cero las filas que falten; dos primeras escrituras concurrentes no chocan."""
+    existentes = {
+        row[0] for row in db.query(ContadorRedModel.id_usuario).filter(ContadorRedModel.id_usuario.in_(ids)).all()
+    }
+    faltantes = set(ids) - existentes
+    if faltantes:
+        db.execute(insert_sin_conflicto(db.connection(), ContadorRedModel.__table__), [
+            {"id_usuario": uid, "personas_directas": 0, "personas_red": 0, "lideres_red": 0}
+            for uid in faltantes
+        ])
+
+
+def _sumar(db: Session, ids, **deltas):
+    ids = list(ids)
+    if not ids or not any(deltas.values()):
+        return
+    _asegurar_filas(db, ids)
+    db.query(ContadorRedModel).filter(ContadorRedModel.id_usuario.in_(ids)).update(
+        {getattr(ContadorRedModel, campo): getattr(ContadorRedModel, campo) + delta
+         for campo, delta in deltas.items() if delta},
+        synchronize_session=False,
+    )
+
+
+def registrar_persona(db: Session, id_lider, delta: int = 1):
+    """Suma (o resta con delta=-1) una persona activa al líder y a sus superiores."""
+    cadena = _cadena_ancestros(db, id_lider)
+    if not cadena:
+        return
+    _sumar(db, [id_lider], personas_directas=delta)
+    _sumar(db, cadena, personas_red=delta)
+    _invalidar_arbol_al_commit(db)
+
+
+def cambiar_persona(db: Session, lider_anterior, activo_anterior, lider_nuevo, activo_nuevo):
+    """Ajusta los contadores cuando cambia el líder o el estado activo de una persona."""
+    if lider_anterior == lider_nuevo and bool(activo_anterior) == bool(activo_nuevo):
+        return
+    if activo_anterior:
+        registrar_persona(db, lider_anterior, -1)
+    if activo_nuevo:
+        registrar_persona(db, lider_nuevo, +1)
+
+
+def registrar_lider(db: Session, user_id, id_lider_superior):
+    """Alta de un usuario nuevo (sin personas ni subordinados todavía)."""
+    _asegurar_filas(db, [user_id])
+    _sumar(db, _cadena_ancestros(db, id_lider_superior), lideres_red=1)
+    _invalidar_arbol_al_commit(db)
+
+
+def crearia_ciclo(db: Session, user_id, superior_nuevo) -> bool:
+    """True si ``superior_nuevo`` es el propio usuario o cuelga de él (activo o no)."""
+    if superior_nuevo is None:
+        return False
+    cadena = superiores_select(superior_nuevo).subquery()
+    return db.execute(select(func.count()).select_from(cadena).where(cadena.c.id == user_id)).scalar() > 0
+
+
+def mover_subarbol(db: Session, user_id, superior_anterior, superior_nuevo):
+    """Re-asigna el subárbol de un usuario activo a otro superior.
+
+    El llamador rechaza antes los ciclos (``crearia_ciclo``)."""
+    if superior_anterior == superior_nuevo:
+        return
+    cadena_nueva = _cadena_ancestros(db, superior_nuevo)
+    _asegurar_filas(db, [user_id])
+    propio = db.query(ContadorRedModel).filter(ContadorRedModel.id_usuario == user_id).first()
+    personas, lideres = propio.personas_red, propio.lideres_red + 1
+    _sumar(db, _cadena_ancestros(db, superior_anterior), personas_red=-personas, lideres_red=-lideres)
+    _sumar(db, cadena_nueva, personas_red=personas, lideres_red=lideres)
+    _invalidar_arbol_al_commit(db)
+
+
+def reactivar_lider(db: Session, user_id, id_lider_superior):
+    """Vuelve a sumar a un usuario reactivado (y su subárbol) en sus superiores.
+
+    Mientras estuvo inactivo las cadenas de ancestros se cortaban en él, así
+    que solo su propia fila quedó desactualizada: se recalcula con su
+    subárbol y luego se aplica como un movimiento desde ninguna parte."""
+    db.flush()
+    red = subordinados_select(user_id).subquery()
+    personas_directas, personas_red = db.query(
+        func.count(case((PersonaModel.id_lider_responsable == user_id, 1))),
+        func.count(PersonaModel.id),
+    ).filter(PersonaModel.activo == True, PersonaModel.id_lider_responsable.in_(select(red.c.id))).one()
+    lideres_red = db.execute(select(func.count()).select_from(red)).scalar() - 1
+    _asegurar_filas(db, [user_id])
+    db.query(ContadorRedModel).filter(ContadorRedModel.id_usuario == user_id).update({
+        ContadorRedModel.personas_directas: personas_directas,
+        ContadorRedModel.personas_red: personas_red,
+        ContadorRedModel.lideres_red: lideres_red,
+    }, synchronize_session=False)
+    mover_subarbol(db, user_id, None, id_lider_superior)
+    _invalidar_arbol_al_commit(db)
+
+
+def reconstruir_contadores(db: Session) -> int:
+    """Recalcula todos los contadores desde las tablas base. Devuelve filas escritas."""
+    db.flush()
+    arbol = cargar_arbol(db)
+    db.query(ContadorRedModel).delete(synchronize_session=False)
+    db.bulk_insert_mappings(ContadorRedModel, [
+        {
+            "id_usuario": uid,
+            "personas_directas": arbol.personas_directas[uid],
+            "personas_red": arbol.personas_red[uid],
+            "lideres_red": arbol.lideres_red[uid],
+        }
+        for uid in arbol.usuarios
+    ])
+    _invalidar_arbol_al_commit(db)
+    return len(arbol.usuarios)
+
+
+def verificar_contadores(db: Session) -> list:
+    """Compara los contadores guardados contra un recálculo completo."""
+    arbol = cargar_arbol(db)
+    guardados = {c.id_usuario: c for c in db.query(ContadorRedModel).all()}
+    diferencias = []
+    for uid in arbol.usuarios:
+        esperado = (arbol.personas_directas[uid], arbol.personas_red[uid], arbol.lideres_red[uid])
+        fila = guardados.get(uid)
+        actual = (fila.personas_directas, fila.personas_red, fila.lideres_red) if fila else None
+        if actual != esperado:
+            diferencias.append({"id_usuario": uid, "esperado": esperado, "actual": actual})
+    return diferencias
+
+
+def inicializar_contadores(db: Session):
+    """Llena la tabla la primera vez (arranque con tabla vacía)."""
+    if db.query(ContadorRedModel.id_usuario).first() is None:
+        filas = reconstruir_contadores(db)
+        db.commit()
+        logger.info(f"Contadores de red inicializados para {filas} usuarios")
@@ -1,33 +1,82 @@
+import importlib.util
 import os
-from sqlalchemy import create_engine
+import logging
+from sqlalchemy import create_engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from dotenv import load_dotenv
 
+from .perfil_sqlite import configurar_sqlite
+from .pool_conexiones import opciones_pool, repartir_pool
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Configuración de base de datos
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Sesión asíncrona (asyncpg en PostgreSQL, aiosqlite en local) para los
+# endpoints más concurridos: las consultas no bloquean el event loop.
+# Con ASYNC_DB=0, o si falta el driver, get_async_db entrega la sesión
+# síncrona envuelta en SesionSincrona (mismo comportamiento que antes).
+ASYNC_DB = os.getenv("ASYNC_DB", "1") == "1"
+
+DRIVERS_ASYNC = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+MODULOS_ASYNC = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+
+def _normalizar_url(url):
+    if url.startswith("postgres://"):
+        # Render usa postgres:// pero SQLAlchemy necesita postgresql://
+        url = url.replace("postgres://", "postgresql://", 1)
+    return url
+
+
+def _con_async(url) -> bool:
+    """Si habrá engine asíncrono para esta URL (para repartir el pool entre los dos)."""
+    backend = make_url(url).get_backend_name()
+    return ASYNC_DB and backend in DRIVERS_ASYNC and all(
+        importlib.util.find_spec(m) is not None for m in ("greenlet", MODULOS_ASYNC[backend]))
+
+
+def _crear_engine(url):
+    url = _normalizar_url(url)
+    (tamano, overflow), _ = repartir_pool(_con_async(url))
+    if url.startswith("sqlite"):
+        nuevo = create_engine(url, connect_args={"check_same_thread": False},
+                              **opciones_pool(QueuePool, tamano, overflow))
+        configurar_sqlite(nuevo)
+        return nuevo
+    return create_engine(url, **opciones_pool(QueuePool, tamano, overflow))
+
+
 if DATABASE_URL is None:
     # Desarrollo local con SQLite
     SQLALCHEMY_DATABASE_URL = "sqlite:///./red_ciudadana.db"
-    engine = create_engine(
-        SQLALCHEMY_DATABASE_URL, 
-        connect_args={"check_same_thread": False}
-    )
-elif DATABASE_URL.startswith("postgres://"):
-    # Render usa postgres:// pero SQLAlchemy necesita postgresql://
-    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
-    engine = create_engine(DATABASE_URL)
+    engine = _crear_engine(SQLALCHEMY_DATABASE_URL)
 else:
-    # Para otros casos de PostgreSQL
-    engine = create_engine(DATABASE_URL)
+    engine = _crear_engine(DATABASE_URL)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+
+def insert_sin_conflicto(conn, tabla):
+    """INSERT que ignora las filas cuya clave ya existe (ON CONFLICT DO NOTHING).
+
+    Para escrituras que pueden repetir varios workers a la vez."""
+    if conn.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif conn.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy import insert
+        return insert(tabla)
+    return insert(tabla).on_conflict_do_nothing()
+
 def get_db():
     db = SessionLocal()
     try:
@@ -35,5 +84,88 @@ def get_db():
     finally:
         db.close()
 
+
+# Engine asíncrono: ver ASYNC_DB arriba
+async_engine = None
+AsyncSessionLocal = None
+
+
+def _crear_engine_async(engine_sync):
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+    import greenlet  # noqa: F401  requerido por sqlalchemy.ext.asyncio
+
+    url = engine_sync.url
+    connect_args = {}
+    if url.get_backend_name() == "postgresql":
+        # asyncpg no entiende sslmode en la URL; se pasa como ssl
+        sslmode = url.query.get("sslmode")
+        if sslmode:
+            connect_args["ssl"] = sslmode
+            url = url.difference_update_query(["sslmode"])
+    # El pool se reparte con el del engine síncrono (repartir_pool)
+    _, (tamano, overflow) = repartir_pool(True)
+    nuevo = create_async_engine(
+        url.set(drivername=DRIVERS_ASYNC[url.get_backend_name()]),
+        connect_args=connect_args,
+        **opciones_pool(AsyncAdaptedQueuePool, tamano, overflow)
+    )
+    configurar_sqlite(nuevo.sync_engine)
+    return nuevo, async_sessionmaker(nuevo, expire_on_commit=False)
+
+
+if ASYNC_DB and engine.url.get_backend_name() in DRIVERS_ASYNC:
+    try:
+        async_engine, AsyncSessionLocal = _crear_engine_async(engine)
+    except ImportError as e:
+        logger.warning(f"Sesión asíncrona no disponible ({e}); se usará la sesión síncrona")
+
+
+class SesionSincrona:
+    """Expone una Session síncrona con la interfaz awaitable de AsyncSession."""
+
+    _SIN_AWAIT = {"add", "add_all", "expunge", "get_bind"}
+
+    def __init__(self, db):
+        self.sync_session = db
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self.sync_session, nombre)
+        if nombre in self._SIN_AWAIT or not callable(atributo):
+            return atributo
+
+        async def llamada(*args, **kwargs):
+            return atributo(*args, **kwargs)
+        return llamada
+
+
+async def get_async_db():
+    if AsyncSessionLocal is None:
+        db = SessionLocal()
+        try:
+            yield SesionSincrona(db)
+        finally:
+            db.close()
+        return
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+
+# Réplica de solo lectura (opcional). Qué sesiones la usan se decide en replica.py.
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+
+replica_engine = None
+ReplicaSessionLocal = None
+async_replica_engine = None
+AsyncReplicaSessionLocal = None
+
+if DATABASE_REPLICA_URL:
+    replica_engine = _crear_engine(DATABASE_REPLICA_URL)
+    ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+    if async_engine is not None:
+        async_replica_engine, AsyncReplicaSessionLocal = _crear_engine_async(replica_engine)
+
 # Exportar SessionLocal para uso directo
-__all__ = ['engine', 'get_db', 'SessionLocal', 'Base']
\ No newline at end of file
+__all__ = ['engine', 'get_db', 'SessionLocal', 'Base', 'async_engine', 'get_async_db', 'AsyncSessionLocal',
+           'replica_engine', 'ReplicaSessionLocal', 'async_replica_engine', 'AsyncReplicaSessionLocal']
\ No newline at end of file
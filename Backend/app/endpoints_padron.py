@@ -1,15 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query, Request
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import and_, or_, func, select
 from typing import List, Optional
-import pandas as pd
 import io
-import dbf
 from datetime import datetime
 import asyncio
 import threading
 
 from .database import get_db
+from .replica import get_async_db_lectura
 from .models_padron import PadronElectoral
 from .schemas_padron import (
     PadronElectoral as PadronElectoralSchema,
@@ -19,7 +19,7 @@ from .schemas_padron import (
     AsignacionPadronResponse,
     EstadisticasPadron
 )
-from .auth import get_current_active_user, require_admin
+from .auth import get_current_active_user, get_current_active_user_async, require_admin
 from .models import Usuario
 
 router = APIRouter()
@@ -60,6 +60,7 @@ async def test_dbf_upload(
         
         # Procesar DBF con manejo de errores mejorado
         try:
+            import dbf
             with io.BytesIO(content) as f:
                 table = dbf.Table(f)
                 print(f"🗂️ Tabla DBF abierta: {len(table)} registros")
@@ -153,6 +154,7 @@ async def importar_padron_dbf(
         
         # Procesar DBF con manejo de errores mejorado
         try:
+            import dbf
             with io.BytesIO(content) as f:
                 table = dbf.Table(f)
                 print(f"🗂️ Tabla DBF abierta: {len(table)} registros")
@@ -261,12 +263,12 @@ async def importar_padron_dbf(
 @router.post("/padron/buscar", response_model=PadronSearchResponse)
 async def buscar_padron(
     request: PadronSearchRequest,
-    db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db_lectura),
+    current_user: Usuario = Depends(get_current_active_user_async)
 ):
     """Buscar en el padrón electoral"""
     try:
-        query = db.query(PadronElectoral).filter(PadronElectoral.activo == True)
+        query = select(PadronElectoral).filter(PadronElectoral.activo == True)
         
         # Aplicar filtros
         if request.elector:
@@ -294,10 +296,10 @@ async def buscar_padron(
             query = query.filter(PadronElectoral.distrito == request.distrito)
         
         # Contar total
-        total = query.count()
+        total = await db.scalar(select(func.count()).select_from(query.subquery()))
         
         # Aplicar paginación
-        registros = query.offset(request.offset).limit(request.limit).all()
+        registros = (await db.scalars(query.offset(request.offset).limit(request.limit))).all()
         
         total_paginas = (total + request.limit - 1) // request.limit
         pagina_actual = (request.offset // request.limit) + 1
@@ -318,17 +320,19 @@ async def buscar_padron(
 @router.get("/padron/verificar-elector/{elector}")
 async def verificar_elector(
     elector: str,
-    db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db_lectura),
+    current_user: Usuario = Depends(get_current_active_user_async)
 ):
     """Verificar si una clave de elector existe en el padrón"""
     try:
-        registro = db.query(PadronElectoral).filter(
+        registro = await db.scalar(select(PadronElectoral).options(
+            selectinload(PadronElectoral.lider_asignado)
+        ).filter(
             and_(
                 PadronElectoral.elector == elector,
                 PadronElectoral.activo == True
             )
-        ).first()
+        ).limit(1))
         
         if not registro:
             return {
@@ -417,30 +421,27 @@ async def asignar_padron(
 
 @router.get("/padron/estadisticas", response_model=EstadisticasPadron)
 async def obtener_estadisticas_padron(
-    db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db_lectura),
+    current_user: Usuario = Depends(get_current_active_user_async)
 ):
     """Obtener estadísticas del padrón electoral"""
     try:
-        # Estadísticas generales
-        total_registros = db.query(PadronElectoral).filter(PadronElectoral.activo == True).count()
-        registros_asignados = db.query(PadronElectoral).filter(
-            and_(
-                PadronElectoral.activo == True,
-                PadronElectoral.id_lider_asignado.isnot(None)
-            )
-        ).count()
+        # Estadísticas generales (un solo recorrido)
+        total_registros, registros_asignados = (await db.execute(select(
+            func.count(PadronElectoral.id),
+            func.count(PadronElectoral.id_lider_asignado)
+        ).filter(PadronElectoral.activo == True))).one()
         registros_disponibles = total_registros - registros_asignados
         
         # Estadísticas por líder
-        asignaciones_por_lider = db.query(
+        asignaciones_por_lider = (await db.execute(select(
             Usuario.nombre,
             func.count(PadronElectoral.id).label('total_asignaciones')
         ).join(
             PadronElectoral, Usuario.id == PadronElectoral.id_lider_asignado
         ).filter(
             PadronElectoral.activo == True
-        ).group_by(Usuario.id, Usuario.nombre).all()
+        ).group_by(Usuario.id, Usuario.nombre))).all()
         
         total_lideres = len(asignaciones_por_lider)
         
@@ -471,6 +472,7 @@ async def descargar_template_padron():
         # Crear un archivo DBF de ejemplo con la estructura correcta
         import tempfile
         import os
+        import dbf
         
         # Crear archivo temporal
         with tempfile.NamedTemporaryFile(suffix='.dbf', delete=False) as temp_file:
@@ -941,6 +943,7 @@ async def importar_excel(
         
         # Leer archivo
         content = await file.read()
+        import pandas as pd
         
         # Procesar según el tipo de archivo
         if file_extension == 'csv':
@@ -1050,6 +1053,7 @@ async def importar_datos_masivos(
     """Importar datos del padrón desde texto copiado de Excel"""
     try:
         print(f"📋 IMPORTAR DATOS MASIVOS - Iniciando")
+        import pandas as pd
         
         # Leer el texto del request body
         datos_texto = await request.body()
@@ -0,0 +1,101 @@
+"""Exportación en streaming (CSV / XLSX) para los reportes.
+
+Las filas se leen con ``yield_per`` (cursor del lado del servidor en
+PostgreSQL) dentro de una sesión propia, porque el cuerpo de la respuesta se
+genera después de que termina el endpoint. Starlette itera los generadores
+síncronos en un hilo aparte, así que la exportación no bloquea el event loop.
+
+- CSV: se envía por bloques de EXPORTACION_LOTE filas conforme se leen.
+- XLSX: se escribe con un workbook ``write_only`` (memoria constante) a un
+  archivo temporal y después se envía por bloques; el formato zip no permite
+  empezar a enviar antes de terminar el archivo.
+
+El encabezado ``X-Total-Filas`` permite mostrar progreso en el cliente.
+"""
+import csv
+import io
+import os
+import tempfile
+from datetime import date, datetime
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from .replica import sesion_lectura, usuario_en_curso
+
+EXPORTACION_LOTE = int(os.getenv("EXPORTACION_LOTE", "1000"))
+TAMANO_BLOQUE = 64 * 1024
+
+FORMATOS = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def leer_en_lotes(db, stmt):
+    """Itera las filas de un SELECT sin cargarlas todas en memoria."""
+    return db.execute(stmt.execution_options(yield_per=EXPORTACION_LOTE))
+
+
+def _con_sesion(generar_filas):
+    db = sesion_lectura(usuario_en_curso.get())
+    try:
+        yield from generar_filas(db)
+    finally:
+        db.close()
+
+
+def _csv(columnas, filas):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")  # BOM para que Excel detecte UTF-8
+    writer.writerow(columnas)
+    for i, fila in enumerate(filas, 1):
+        writer.writerow(fila)
+        if i % EXPORTACION_LOTE == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def _celda(valor):
+    return valor if valor is None or isinstance(valor, (int, float, str, date)) else str(valor)
+
+
+def _xlsx(columnas, filas, hoja):
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=hoja[:31])
+    ws.append(columnas)
+    for fila in filas:
+        ws.append([_celda(v) for v in fila])
+
+    fd, ruta = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        wb.save(ruta)
+        with open(ruta, "rb") as archivo:
+            while bloque := archivo.read(TAMANO_BLOQUE):
+                yield bloque
+    finally:
+        os.remove(ruta)
+
+
+def respuesta_exportacion(formato: str, nombre: str, columnas: list, generar_filas, total: int | None = None):
+    """StreamingResponse con las filas de ``generar_filas(db)`` en el formato pedido.
+
+    ``generar_filas`` recibe una sesión nueva y debe producir tuplas en el orden
+    de ``columnas``.
+    """
+    formato = (formato or "").lower()
+    if formato not in FORMATOS:
+        raise HTTPException(status_code=400, detail=f"Formato no soportado: {formato}. Use csv o xlsx")
+
+    filas = _con_sesion(generar_filas)
+    cuerpo = _csv(columnas, filas) if formato == "csv" else _xlsx(columnas, filas, nombre)
+    headers = {"Content-Disposition": f'attachment; filename="{nombre}_{datetime.utcnow():%Y%m%d_%H%M}.{formato}"'}
+    if total is not None:
+        headers["X-Total-Filas"] = str(total)
+    return StreamingResponse(cuerpo, media_type=FORMATOS[formato], headers=headers)
@@ -0,0 +1,152 @@
+"""Carga en bloque de la estructura jerárquica de usuarios y sus totales de red."""
+import os
+from collections import defaultdict
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from .cache import TTLCache
+from .models import Usuario as UsuarioModel
+from .models import Persona as PersonaModel
+from .models import ContadorRed as ContadorRedModel
+
+ESTRUCTURA_CACHE_TTL = float(os.getenv("ESTRUCTURA_CACHE_TTL", "30"))
+
+_cache_arbol = TTLCache(ttl=ESTRUCTURA_CACHE_TTL, maxsize=1)
+
+
+class ArbolJerarquico:
+    """Árbol de usuarios activos con totales acumulados por subárbol.
+
+    Se construye a partir de dos consultas (usuarios activos y conteo de
+    personas por líder) y calcula los totales en memoria en O(N).
+    """
+
+    def __init__(self, usuarios, personas_por_lider: dict):
+        self.usuarios = {u.id: u for u in usuarios}
+        self.hijos = defaultdict(list)
+        self.raices = []
+        for u in usuarios:
+            if u.id_lider_superior is None:
+                self.raices.append(u.id)
+            elif u.id_lider_superior in self.usuarios:
+                self.hijos[u.id_lider_superior].append(u.id)
+
+        self.personas_directas = {uid: personas_por_lider.get(uid, 0) for uid in self.usuarios}
+        self.personas_red = {}
+        self.lideres_red = {}
+        self._acumular()
+
+    def _acumular(self):
+        # Recorrido post-orden iterativo: cada nodo se cierra después de sus hijos.
+        visitados = set()
+        for inicio in self.usuarios:
+            if inicio in visitados:
+                continue
+            pila = [(inicio, False)]
+            while pila:
+                uid, cerrar = pila.pop()
+                if cerrar:
+                    hijos = self.hijos.get(uid, [])
+                    self.personas_red[uid] = self.personas_directas[uid] + sum(
+                        self.personas_red.get(h, 0) for h in hijos
+                    )
+                    self.lideres_red[uid] = len(hijos) + sum(self.lideres_red.get(h, 0) for h in hijos)
+                    continue
+                if uid in visitados:
+                    continue
+                visitados.add(uid)
+                pila.append((uid, True))
+                pila.extend((h, False) for h in self.hijos.get(uid, []) if h not in visitados)
+
+    def __contains__(self, user_id):
+        return user_id in self.usuarios
+
+    def subordinados_ids(self, user_id: int) -> list:
+        """IDs del usuario y de toda su red descendente."""
+        ids = [user_id]
+        vistos = {user_id}
+        i = 0
+        while i < len(ids):
+            for h in self.hijos.get(ids[i], []):
+                if h not in vistos:
+                    vistos.add(h)
+                    ids.append(h)
+            i += 1
+        return ids
+
+    def nodo(self, user_id: int, _camino=None) -> dict:
+        """Nodo serializado con la forma que devuelve /reportes/estructura-jerarquica."""
+        camino = (_camino or set()) | {user_id}
+        u = self.usuarios[user_id]
+        hijos = [h for h in self.hijos.get(user_id, []) if h not in camino]
+        return {
+            "id": u.id,
+            "nombre": u.nombre,
+            "rol": u.rol,
+            "total_personas": self.personas_directas[user_id],
+            "total_subordinados": len(hijos),
+            "total_personas_red": self.personas_red[user_id],
+            "subordinados": [self.nodo(h, camino) for h in hijos],
+        }
+
+
+def subordinados_select(user_id: int):
+    """SELECT (CTE recursivo) con el ID del usuario y los de toda su red activa.
+
+    Equivale al antiguo get_subordinate_ids pero en una sola consulta, y puede
+    usarse directamente dentro de un ``in_()``.
+    """
+    base = select(UsuarioModel.id).where(UsuarioModel.id == user_id).cte(name="red", recursive=True)
+    hijos = select(UsuarioModel.id).where(
+        UsuarioModel.id_lider_superior == base.c.id, UsuarioModel.activo == True
+    )
+    red = base.union(hijos)
+    return select(red.c.id)
+
+
+def superiores_select(user_id: int):
+    """SELECT (CTE recursivo) con el ID del usuario y los de todos sus superiores."""
+    base = select(UsuarioModel.id, UsuarioModel.id_lider_superior).where(
+        UsuarioModel.id == user_id
+    ).cte(name="cadena", recursive=True)
+    padres = select(UsuarioModel.id, UsuarioModel.id_lider_superior).where(
+        UsuarioModel.id == base.c.id_lider_superior
+    )
+    cadena = base.union(padres)
+    return select(cadena.c.id)
+
+
+def cargar_arbol(db: Session) -> ArbolJerarquico:
+    """Construye el árbol completo con dos consultas."""
+    usuarios = db.query(
+        UsuarioModel.id, UsuarioModel.nombre, UsuarioModel.rol, UsuarioModel.id_lider_superior
+    ).filter(UsuarioModel.activo == True).order_by(UsuarioModel.id).all()
+
+    personas_por_lider = dict(
+        db.query(PersonaModel.id_lider_responsable, func.count(PersonaModel.id))
+        .filter(PersonaModel.activo == True)
+        .group_by(PersonaModel.id_lider_responsable)
+        .all()
+    )
+    return ArbolJerarquico(usuarios, personas_por_lider)
+
+
+def cargar_arbol_contadores(db: Session) -> ArbolJerarquico:
+    """Construye el árbol con una consulta, leyendo las personas directas de contadores_red."""
+    filas = db.query(
+        UsuarioModel.id, UsuarioModel.nombre, UsuarioModel.rol, UsuarioModel.id_lider_superior,
+        ContadorRedModel.personas_directas,
+    ).outerjoin(
+        ContadorRedModel, ContadorRedModel.id_usuario == UsuarioModel.id
+    ).filter(UsuarioModel.activo == True).order_by(UsuarioModel.id).all()
+    return ArbolJerarquico(filas, {f.id: f.personas_directas or 0 for f in filas})
+
+
+def obtener_arbol(db: Session) -> ArbolJerarquico:
+    """Árbol (según contadores_red) cacheado durante ESTRUCTURA_CACHE_TTL segundos."""
+    return _cache_arbol.get_or_set("arbol", lambda: cargar_arbol_contadores(db))
+
+
+def invalidar_arbol():
+    _cache_arbol.invalidate()
@@ -5,98 +5,46 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+import time
+_inicio_importacion = time.perf_counter()
+
 from fastapi import FastAPI, Depends, HTTPException, status, Request, Form, File, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
-from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from contextlib import asynccontextmanager
+import asyncio
+import hmac
 import uvicorn
-import psycopg2
 import os
-from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 
-from .database import engine, get_db, SessionLocal
-from .models import Base
-from .auth import get_password_hash
+from .database import engine, async_engine, async_replica_engine, replica_engine, get_db, SessionLocal
+from .auth import cola_hash, es_token_admin, get_password_hash, require_admin
+from .contadores_red import inicializar_contadores
+from .medicion_consultas import medir_consultas
+from .metricas_prometheus import METRICAS_PUBLICAS, METRICAS_TOKEN, MiddlewareMetricas, exposicion
+from .perfilador import MiddlewarePerfilador
+from .perfil_sqlite import EscrituraOcupada, MiddlewareEscritorUnico
+from .migraciones import MOVER_FOTOS_BASE64, aplicar_migraciones, iniciar_mover_fotos_base64
+from .perfil_arranque import PERFIL_ARRANQUE, paso, resumen as resumen_arranque, tiempos as tiempos_arranque
+from .pool_conexiones import estado_pool
+from .replica import get_async_db_lectura
+from .resumenes import RESUMENES_NOCTURNOS, programar_resumenes
+from .variantes_fotos import RELLENO_VARIANTES, iniciar_relleno_variantes
 from .models import Usuario as UsuarioModel
 from .models_noticias import Noticia as _NoticiaRegistro  # registra tabla noticias en Base.metadata
 from . import vehiculos, movilizaciones
 from . import endpoints_padron
+from . import perfilador
 
 
 # ---------------------------------------------------------------------------
 # Startup helpers
 # ---------------------------------------------------------------------------
 
-def verificar_y_crear_columnas():
-    """Ensure required columns exist."""
-    for tabla, col, ddl in [
-        ("reportes_ciudadanos", "es_publico", "ALTER TABLE reportes_ciudadanos ADD COLUMN es_publico BOOLEAN DEFAULT true"),
-        ("reportes_ciudadanos", "contacto_email", "ALTER TABLE reportes_ciudadanos ADD COLUMN contacto_email VARCHAR(255)"),
-        ("noticias", "imagenes", "ALTER TABLE noticias ADD COLUMN imagenes TEXT"),
-        ("fotos_reportes", "contenido_base64", "ALTER TABLE fotos_reportes ADD COLUMN contenido_base64 TEXT"),
-        ("reportes_ciudadanos", "folio",       "ALTER TABLE reportes_ciudadanos ADD COLUMN folio TEXT"),
-        ("reportes_ciudadanos", "votos",       "ALTER TABLE reportes_ciudadanos ADD COLUMN votos INTEGER DEFAULT 0"),
-        ("reportes_ciudadanos", "vistas",      "ALTER TABLE reportes_ciudadanos ADD COLUMN vistas INTEGER DEFAULT 0"),
-        ("reportes_ciudadanos", "colonia",     "ALTER TABLE reportes_ciudadanos ADD COLUMN colonia TEXT"),
-        ("reportes_ciudadanos", "calle",       "ALTER TABLE reportes_ciudadanos ADD COLUMN calle TEXT"),
-        ("reportes_ciudadanos", "subtipo",     "ALTER TABLE reportes_ciudadanos ADD COLUMN subtipo TEXT"),
-        ("reportes_ciudadanos", "resuelto_en", "ALTER TABLE reportes_ciudadanos ADD COLUMN resuelto_en TIMESTAMP"),
-        ("usuarios", "opciones_app_usuario",  "ALTER TABLE usuarios ADD COLUMN opciones_app_usuario TEXT"),
-    ]:
-        db = SessionLocal()
-        try:
-            db.execute(text(f"SELECT {col} FROM {tabla} LIMIT 1"))
-        except Exception:
-            db.rollback()
-            try:
-                db.execute(text(ddl))
-                db.commit()
-                logger.info(f"Columna {tabla}.{col} creada")
-            except Exception as e:
-                logger.error(f"Error creando columna {tabla}.{col}: {e}")
-                db.rollback()
-        finally:
-            db.close()
-
-
-
-def migrate_foto_url_auto():
-    """Increase foto_url column size and make ciudadano_id nullable."""
-    database_url = os.getenv("DATABASE_URL")
-    if not database_url:
-        return
-    try:
-        conn = psycopg2.connect(database_url)
-        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
-        cur = conn.cursor()
-
-        cur.execute("""
-            SELECT character_maximum_length FROM information_schema.columns
-            WHERE table_name='reportes_ciudadanos' AND column_name='foto_url'
-        """)
-        row = cur.fetchone()
-        if row and (row[0] is None or row[0] < 50000):
-            cur.execute("ALTER TABLE reportes_ciudadanos ALTER COLUMN foto_url TYPE VARCHAR(50000)")
-            logger.info("foto_url ampliado a 50000")
-
-        cur.execute("""
-            SELECT is_nullable FROM information_schema.columns
-            WHERE table_name='reportes_ciudadanos' AND column_name='ciudadano_id'
-        """)
-        row = cur.fetchone()
-        if row and row[0] == "NO":
-            cur.execute("ALTER TABLE reportes_ciudadanos ALTER COLUMN ciudadano_id DROP NOT NULL")
-            logger.info("ciudadano_id ahora es nullable")
-
-        cur.close()
-        conn.close()
-    except Exception as e:
-        logger.error(f"Error en migrate_foto_url_auto: {e}")
-
-
 def create_initial_users():
     """Create default admin user if none exists."""
     db = SessionLocal()
@@ -132,14 +80,37 @@ def create_initial_users():
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Iniciando aplicacion Red Ciudadana...")
-    try:
-        Base.metadata.create_all(bind=engine)
-    except Exception as e:
-        logger.error(f"Error creando tablas: {e}")
-    verificar_y_crear_columnas()
-    migrate_foto_url_auto()
-    create_initial_users()
+    with paso("migraciones"):
+        try:
+            aplicadas = aplicar_migraciones(engine)
+            if aplicadas:
+                logger.info(f"Migraciones aplicadas: {aplicadas}")
+        except Exception as e:
+            logger.error(f"Error aplicando migraciones: {e}")
+    with paso("usuarios iniciales"):
+        create_initial_users()
+    with paso("contadores de red"):
+        db = SessionLocal()
+        try:
+            inicializar_contadores(db)
+        except Exception as e:
+            logger.error(f"Error inicializando contadores de red: {e}")
+            db.rollback()
+        finally:
+            db.close()
+    tarea_resumenes = asyncio.create_task(programar_resumenes()) if RESUMENES_NOCTURNOS else None
+    if MOVER_FOTOS_BASE64:
+        iniciar_mover_fotos_base64(engine)
+    if RELLENO_VARIANTES:
+        iniciar_relleno_variantes()
+    if PERFIL_ARRANQUE:
+        logger.info(f"Perfil de arranque: {resumen_arranque()}")
     yield
+    if tarea_resumenes:
+        tarea_resumenes.cancel()
+    for engine_async in (async_engine, async_replica_engine):
+        if engine_async is not None:
+            await engine_async.dispose()
     logger.info("Cerrando aplicacion Red Ciudadana...")
 
 
@@ -179,6 +150,24 @@ async def add_private_network_header(request: Request, call_next):
     response.headers["Access-Control-Allow-Private-Network"] = "true"
     return response
 
+# Conteo de consultas por petición y log de consultas lentas
+app.middleware("http")(medir_consultas)
+
+# Perfil de peticiones marcadas con X-Perfilar (ver perfilador.py)
+app.add_middleware(MiddlewarePerfilador)
+
+# Dueño de las escrituras a SQLite: la petición (ver perfil_sqlite.py)
+app.add_middleware(MiddlewareEscritorUnico)
+
+# Métricas por ruta para /metrics (va por fuera de todo: mide la petición completa)
+app.add_middleware(MiddlewareMetricas)
+
+
+@app.exception_handler(EscrituraOcupada)
+async def escritura_ocupada(request: Request, exc: EscrituraOcupada):
+    return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content={"detail": str(exc)},
+                        headers={"Retry-After": "1"})
+
 # Static files
 os.makedirs("uploads", exist_ok=True)
 os.makedirs("static", exist_ok=True)
@@ -192,12 +181,13 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 app.include_router(vehiculos.router)
 app.include_router(movilizaciones.router)
 app.include_router(endpoints_padron.router, prefix="/api", tags=["padron"])
+app.include_router(perfilador.router)
 
 from .routers import (
     auth_routes, usuarios, perfiles, ubicaciones,
     eventos, asistencias, personas, reportes,
     noticias, reportes_ciudadanos, tipos_reporte,
-    invitaciones, uploads, incentivos, duplicados,
+    invitaciones, uploads, incentivos, duplicados, fotos,
 )
 app.include_router(auth_routes.router)
 app.include_router(usuarios.router)
@@ -214,6 +204,7 @@ app.include_router(invitaciones.router)
 app.include_router(uploads.router)
 app.include_router(incentivos.router)
 app.include_router(duplicados.router)
+app.include_router(fotos.router)
 
 # Admin database routes
 try:
@@ -239,7 +230,7 @@ async def reportes_publicos_alias(
     estado: _Optional[str] = None,
     fecha_inicio: _Optional[str] = None,
     fecha_fin: _Optional[str] = None,
-    db=Depends(get_db)
+    db=Depends(get_async_db_lectura)
 ):
     return await _rp_handler(skip=skip, limit=limit, tipo=tipo, estado=estado, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, db=db)
 
@@ -284,10 +275,47 @@ async def health_check_detailed():
     }
 
 
+@app.get("/health/pool")
+async def health_pool(current_user=Depends(require_admin)):
+    """Uso del pool de conexiones de este proceso (para dimensionar workers y pool)."""
+    return {
+        "pid": os.getpid(),
+        "sync": estado_pool(engine),
+        "async": estado_pool(async_engine.sync_engine) if async_engine is not None else None,
+        "replica": estado_pool(replica_engine) if replica_engine is not None else None,
+        "replica_async": estado_pool(async_replica_engine.sync_engine) if async_replica_engine is not None else None,
+    }
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """Métricas de este proceso en formato de texto de Prometheus."""
+    if not METRICAS_PUBLICAS:
+        autorizacion = request.headers.get("authorization", "")
+        token = autorizacion.removeprefix("Bearer ") if autorizacion.startswith("Bearer ") else None
+        if METRICAS_TOKEN:
+            valido = token is not None and hmac.compare_digest(token, METRICAS_TOKEN)
+        else:
+            valido = token is not None and await run_in_threadpool(es_token_admin, token)
+        if not valido:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token de métricas inválido",
+                                headers={"WWW-Authenticate": "Bearer"})
+    engines = {
+        "sync": engine,
+        "async": async_engine.sync_engine if async_engine is not None else None,
+        "replica": replica_engine,
+        "replica_async": async_replica_engine.sync_engine if async_replica_engine is not None else None,
+    }
+    return PlainTextResponse(exposicion(engines, cola_hash()), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/cors-test")
 async def cors_test():
     return {"cors": "working", "status": "OK"}
 
 
+tiempos_arranque["importar app.main"] = time.perf_counter() - _inicio_importacion
+
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
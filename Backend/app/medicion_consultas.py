@@ -0,0 +1,133 @@
+"""Medición de consultas SQL: log de consultas lentas y conteo por petición.
+
+Los eventos se registran en la clase Engine, así que cubren el engine
+síncrono, el asíncrono y la réplica.
+- Cada sentencia que tarda más de CONSULTA_LENTA_MS (200) se escribe en el
+  log con el SQL normalizado (literales y listas de IN colapsados) y la ruta
+  que la originó.
+- El middleware ``medir_consultas`` cuenta consultas y tiempo de cada
+  petición. Si pasa de CONSULTAS_POR_PETICION_AVISO (50) lo avisa en el log
+  (señal típica de N+1); con DEBUG_CONSULTAS=1 la respuesta lleva además
+  ``X-DB-Queries`` y ``X-DB-Time`` (ms).
+- ``presupuesto_consultas(n)`` falla si el bloque ejecuta más de n consultas;
+  sirve en pruebas con TestClient para fijar cuántas consultas hace un endpoint.
+"""
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+CONSULTA_LENTA_MS = float(os.getenv("CONSULTA_LENTA_MS", "200"))
+CONSULTAS_POR_PETICION_AVISO = int(os.getenv("CONSULTAS_POR_PETICION_AVISO", "50"))
+DEBUG_CONSULTAS = os.getenv("DEBUG_CONSULTAS", "0") == "1"
+
+
+class ConsultasPeticion:
+    """Consultas y segundos en base de datos de una petición."""
+
+    __slots__ = ("request", "consultas", "tiempo")
+
+    def __init__(self, request: Optional[Request] = None):
+        self.request = request
+        self.consultas = 0
+        self.tiempo = 0.0
+
+    def ruta(self) -> str:
+        if self.request is None:
+            return "-"
+        # Plantilla de la ruta (/personas/{persona_id}) si ya se resolvió
+        route = self.request.scope.get("route")
+        return f"{self.request.method} {getattr(route, 'path', self.request.url.path)}"
+
+
+# Contador de la petición en curso; lo fija el middleware. Es mutable para
+# que lo que sumen el threadpool y los greenlets de la sesión asíncrona
+# (que corren con una copia del contexto) llegue al middleware.
+_peticion: ContextVar[Optional[ConsultasPeticion]] = ContextVar("consultas_peticion", default=None)
+
+# Listas que reciben cada sentencia mientras corre un presupuesto_consultas
+_colectores = []
+_colectores_lock = threading.Lock()
+
+
+_LITERALES = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LISTAS = re.compile(r"\(\s*(?:\?|%\(\w+\)s|:\w+|\$\d+)(?:\s*,\s*(?:\?|%\(\w+\)s|:\w+|\$\d+))*\s*\)")
+
+
+def normalizar_sql(statement: str) -> str:
+    """Una línea, literales como ? y listas de parámetros como (...), para agrupar en el log."""
+    sql = " ".join(statement.split())
+    sql = _LITERALES.sub("?", sql)
+    return _LISTAS.sub("(...)", sql)
+
+
+def _antes_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    conn.info["inicio_consulta"] = time.perf_counter()
+
+
+def _despues_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    duracion = time.perf_counter() - conn.info["inicio_consulta"]
+    peticion = _peticion.get()
+    if peticion is not None:
+        peticion.consultas += 1
+        peticion.tiempo += duracion
+    if _colectores:
+        with _colectores_lock:
+            for colector in _colectores:
+                colector.append(statement)
+    if duracion * 1000 >= CONSULTA_LENTA_MS:
+        ruta = peticion.ruta() if peticion is not None else "-"
+        logger.warning(f"Consulta lenta ({duracion * 1000:.0f} ms) [{ruta}]: {normalizar_sql(statement)[:1000]}")
+
+
+event.listen(Engine, "before_cursor_execute", _antes_de_ejecutar)
+event.listen(Engine, "after_cursor_execute", _despues_de_ejecutar)
+
+
+async def medir_consultas(request: Request, call_next):
+    peticion = ConsultasPeticion(request)
+    token = _peticion.set(peticion)
+    try:
+        response = await call_next(request)
+    finally:
+        _peticion.reset(token)
+    if peticion.consultas > CONSULTAS_POR_PETICION_AVISO:
+        logger.warning(f"{peticion.ruta()} hizo {peticion.consultas} consultas "
+                       f"({peticion.tiempo * 1000:.0f} ms en base de datos)")
+    if DEBUG_CONSULTAS:
+        response.headers["X-DB-Queries"] = str(peticion.consultas)
+        response.headers["X-DB-Time"] = f"{peticion.tiempo * 1000:.1f}"
+    return response
+
+
+@contextmanager
+def presupuesto_consultas(maximo: int):
+    """Falla con AssertionError si el bloque ejecuta más de ``maximo`` consultas.
+
+        with presupuesto_consultas(5):
+            client.get("/reportes/dashboard", headers=headers)
+
+    Cuenta todas las sentencias del proceso mientras dura el bloque, también
+    las del hilo de TestClient; no usarlo con peticiones concurrentes.
+    """
+    sentencias = []
+    with _colectores_lock:
+        _colectores.append(sentencias)
+    try:
+        yield sentencias
+    finally:
+        with _colectores_lock:
+            _colectores.remove(sentencias)
+    if len(sentencias) > maximo:
+        detalle = "\n".join(f"  {normalizar_sql(s)[:200]}" for s in sentencias)
+        raise AssertionError(f"{len(sentencias)} consultas (presupuesto {maximo}):\n{detalle}")
@@ -0,0 +1,96 @@
+"""Métricas de asistencia y movilización para un conjunto de eventos.
+
+Todas las cifras se calculan con consultas agregadas sobre el conjunto completo
+de eventos, de modo que un reporte cuesta un número fijo de consultas sin
+importar cuántos eventos incluya.
+"""
+from collections import defaultdict
+
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+
+from .models import Asistencia as AsistenciaModel
+from .models import Evento as EventoModel
+from .models import AsignacionMovilizacion as AsignacionMovilizacionModel
+
+
+def _vacio():
+    return {
+        "asignados": 0,
+        "registros": 0,
+        "asistieron": 0,
+        "movilizados": 0,
+        "movilizados_asistieron": 0,
+        "ultimas_asistencias": [],
+    }
+
+
+def _sumar_si(condicion):
+    return func.coalesce(func.sum(case((condicion, 1), else_=0)), 0)
+
+
+def calcular_metricas(db: Session, eventos_ids, ultimas: int = 0) -> dict:
+    """Devuelve {id_evento: métricas} para los eventos indicados.
+
+    ``eventos_ids`` puede ser una lista de IDs o un SELECT de IDs (se usa dentro
+    de ``IN``). Métricas por evento:
+    - asignados: filas en asignaciones_movilizacion
+    - registros: filas en asistencias
+    - asistieron / movilizados: asistencias con asistio / movilizado
+    - movilizados_asistieron: asistencias con asistio y movilizado
+    - ultimas_asistencias: los ``ultimas`` check-ins más recientes (asistio=True)
+    """
+    metricas = defaultdict(_vacio)
+
+    asistencias = db.query(
+        AsistenciaModel.id_evento,
+        func.count(AsistenciaModel.id),
+        _sumar_si(AsistenciaModel.asistio == True),
+        _sumar_si(AsistenciaModel.movilizado == True),
+        _sumar_si((AsistenciaModel.asistio == True) & (AsistenciaModel.movilizado == True)),
+    ).filter(AsistenciaModel.id_evento.in_(eventos_ids)).group_by(AsistenciaModel.id_evento).all()
+    for id_evento, registros, asistieron, movilizados, movilizados_asistieron in asistencias:
+        m = metricas[id_evento]
+        m["registros"] = registros
+        m["asistieron"] = int(asistieron)
+        m["movilizados"] = int(movilizados)
+        m["movilizados_asistieron"] = int(movilizados_asistieron)
+
+    asignaciones = db.query(
+        AsignacionMovilizacionModel.id_evento, func.count(AsignacionMovilizacionModel.id)
+    ).filter(
+        AsignacionMovilizacionModel.id_evento.in_(eventos_ids)
+    ).group_by(AsignacionMovilizacionModel.id_evento).all()
+    for id_evento, total in asignaciones:
+        metricas[id_evento]["asignados"] = total
+
+    if ultimas > 0:
+        posicion = func.row_number().over(
+            partition_by=AsistenciaModel.id_evento,
+            order_by=AsistenciaModel.hora_checkin.desc(),
+        ).label("posicion")
+        recientes = select(
+            AsistenciaModel.id,
+            AsistenciaModel.id_evento,
+            AsistenciaModel.hora_checkin,
+            AsistenciaModel.movilizado,
+            posicion,
+        ).where(
+            AsistenciaModel.asistio == True, AsistenciaModel.id_evento.in_(eventos_ids)
+        ).subquery()
+        filas = db.execute(
+            select(recientes).where(recientes.c.posicion <= ultimas).order_by(recientes.c.id_evento, recientes.c.posicion)
+        ).all()
+        for fila in filas:
+            metricas[fila.id_evento]["ultimas_asistencias"].append({
+                "id": fila.id,
+                "hora_checkin": fila.hora_checkin.isoformat() if fila.hora_checkin else None,
+                "movilizado": fila.movilizado,
+            })
+
+    return metricas
+
+
+def ids_de(query):
+    """SELECT de IDs a partir de una consulta ORM de eventos (para usar en IN)."""
+    return query.with_entities(EventoModel.id).order_by(None).statement
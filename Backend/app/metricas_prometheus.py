@@ -0,0 +1,167 @@
+"""Métricas del proceso en formato de texto de Prometheus (GET /metrics).
+
+``MiddlewareMetricas`` es un middleware ASGI puro (sin BaseHTTPMiddleware):
+por petición toma dos marcas de tiempo, suma los bytes enviados y actualiza
+unos contadores en memoria. Todo corre en el event loop, así que no hay
+candados. Cada serie se etiqueta con el método y la plantilla de la ruta
+(/personas/{persona_id}), no con la URL, para que no crezcan sin límite.
+
+Al generar /metrics se agregan también el pool de conexiones, el threadpool
+de los endpoints síncronos y la cola de hashes de contraseña: cuando
+``threadpool_waiting`` o la cola crecen, los workers están saturados.
+
+Los valores son por proceso; con varios workers Prometheus debe raspar cada
+uno o sumar. /metrics pide ``Authorization: Bearer <METRICAS_TOKEN>`` o,
+si METRICAS_TOKEN no está definido, el access token de un administrador. Con
+METRICAS_PUBLICAS=1 queda abierto (solo si el puerto no es público).
+"""
+import math
+import os
+import time
+from bisect import bisect_left
+
+from anyio import to_thread
+
+from .pool_conexiones import estado_pool
+
+METRICAS_TOKEN = os.getenv("METRICAS_TOKEN")
+METRICAS_PUBLICAS = os.getenv("METRICAS_PUBLICAS", "0") == "1"
+
+LIMITES_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LIMITES_TAMANO = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+SIN_RUTA = "sin_ruta"
+
+
+class Histograma:
+    __slots__ = ("limites", "cubetas", "suma", "cuenta")
+
+    def __init__(self, limites):
+        self.limites = limites
+        self.cubetas = [0] * (len(limites) + 1)  # la última es +Inf
+        self.suma = 0.0
+        self.cuenta = 0
+
+    def observar(self, valor):
+        self.cubetas[bisect_left(self.limites, valor)] += 1
+        self.suma += valor
+        self.cuenta += 1
+
+    def lineas(self, nombre, etiquetas):
+        acumulado = 0
+        for limite, n in zip(self.limites + (math.inf,), self.cubetas):
+            acumulado += n
+            le = "+Inf" if limite == math.inf else str(limite)
+            yield f'{nombre}_bucket{{{etiquetas},le="{le}"}} {acumulado}'
+        yield f"{nombre}_sum{{{etiquetas}}} {self.suma:.6f}"
+        yield f"{nombre}_count{{{etiquetas}}} {self.cuenta}"
+
+
+class MetricasRuta:
+    __slots__ = ("latencia", "tamano", "por_estado")
+
+    def __init__(self):
+        self.latencia = Histograma(LIMITES_LATENCIA)
+        self.tamano = Histograma(LIMITES_TAMANO)
+        self.por_estado = {}
+
+
+# (método, ruta) -> MetricasRuta
+_rutas = {}
+_en_curso = 0
+
+
+def _registrar(metodo, ruta, estado, duracion, enviados):
+    metricas = _rutas.get((metodo, ruta))
+    if metricas is None:
+        metricas = _rutas[(metodo, ruta)] = MetricasRuta()
+    metricas.latencia.observar(duracion)
+    metricas.tamano.observar(enviados)
+    metricas.por_estado[estado] = metricas.por_estado.get(estado, 0) + 1
+
+
+class MiddlewareMetricas:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _en_curso
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        respuesta = [500, 0]  # estado, bytes del cuerpo
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                respuesta[0] = mensaje["status"]
+            elif mensaje["type"] == "http.response.body":
+                respuesta[1] += len(mensaje.get("body", b""))
+            await send(mensaje)
+
+        inicio = time.perf_counter()
+        _en_curso += 1
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _en_curso -= 1
+            # El router deja la ruta resuelta en el scope
+            ruta = getattr(scope.get("route"), "path", SIN_RUTA)
+            _registrar(scope["method"], ruta, respuesta[0], time.perf_counter() - inicio, respuesta[1])
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _etiquetas(**valores) -> str:
+    return ",".join(f'{clave}="{_escapar(valor)}"' for clave, valor in valores.items())
+
+
+def _encabezado(nombre, tipo, ayuda):
+    return [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} {tipo}"]
+
+
+def exposicion(engines: dict, cola_hash: int) -> str:
+    """Texto para /metrics. ``engines``: nombre -> engine síncrono (o None)."""
+    lineas = _encabezado("http_requests_total", "counter", "Peticiones por método, ruta y estado.")
+    for (metodo, ruta), metricas in _rutas.items():
+        for estado, n in metricas.por_estado.items():
+            lineas.append(f"http_requests_total{{{_etiquetas(method=metodo, route=ruta, status=estado)}}} {n}")
+
+    lineas += _encabezado("http_request_duration_seconds", "histogram", "Latencia de las peticiones.")
+    for (metodo, ruta), metricas in _rutas.items():
+        lineas.extend(metricas.latencia.lineas("http_request_duration_seconds", _etiquetas(method=metodo, route=ruta)))
+
+    lineas += _encabezado("http_response_size_bytes", "histogram", "Bytes del cuerpo de las respuestas.")
+    for (metodo, ruta), metricas in _rutas.items():
+        lineas.extend(metricas.tamano.lineas("http_response_size_bytes", _etiquetas(method=metodo, route=ruta)))
+
+    lineas += _encabezado("http_requests_in_progress", "gauge", "Peticiones en curso.")
+    lineas.append(f"http_requests_in_progress {_en_curso}")
+
+    pools = {nombre: estado_pool(engine) for nombre, engine in engines.items() if engine is not None}
+    for clave, nombre, tipo, ayuda in (
+        ("tamano", "db_pool_size", "gauge", "Conexiones fijas del pool."),
+        ("en_uso", "db_pool_checked_out", "gauge", "Conexiones entregadas."),
+        ("libres", "db_pool_checked_in", "gauge", "Conexiones libres en el pool."),
+        ("overflow", "db_pool_overflow", "gauge", "Conexiones de overflow abiertas."),
+        ("checkouts", "db_pool_checkouts_total", "counter", "Conexiones entregadas desde el arranque."),
+        ("timeouts", "db_pool_timeouts_total", "counter", "Esperas por conexión que agotaron DB_POOL_TIMEOUT."),
+        ("espera_p95_ms", "db_pool_wait_p95_milliseconds", "gauge", "p95 de la espera por conexión (últimos checkouts)."),
+    ):
+        lineas += _encabezado(nombre, tipo, ayuda)
+        for engine, estado in pools.items():
+            if clave in estado:
+                lineas.append(f"{nombre}{{{_etiquetas(engine=engine)}}} {estado[clave]}")
+
+    limitador = to_thread.current_default_thread_limiter()
+    lineas += _encabezado("threadpool_busy", "gauge", "Hilos ocupados con endpoints síncronos.")
+    lineas.append(f"threadpool_busy {limitador.borrowed_tokens}")
+    lineas += _encabezado("threadpool_size", "gauge", "Hilos disponibles para endpoints síncronos.")
+    lineas.append(f"threadpool_size {limitador.total_tokens:g}")
+    lineas += _encabezado("threadpool_waiting", "gauge", "Tareas esperando un hilo libre.")
+    lineas.append(f"threadpool_waiting {limitador.statistics().tasks_waiting}")
+    lineas += _encabezado("password_hash_queue", "gauge", "Hashes de contraseña esperando en la cola.")
+    lineas.append(f"password_hash_queue {cola_hash}")
+    return "\n".join(lineas) + "\n"
@@ -0,0 +1,220 @@
+"""Migraciones versionadas del esquema.
+
+La tabla ``schema_version`` guarda qué migraciones ya se aplicaron. Al
+arrancar, ``aplicar_migraciones`` hace una sola consulta (la versión máxima);
+si la base está al día no hace nada más. Si faltan migraciones, las aplica en
+orden dentro de una transacción con bloqueo (advisory lock en PostgreSQL,
+BEGIN IMMEDIATE en SQLite), así que con varios workers arrancando a la vez
+solo uno ejecuta el DDL y los demás esperan y encuentran la versión nueva.
+
+Para cambiar el esquema se agrega una función al final de MIGRACIONES con la
+versión siguiente; nunca se modifica una migración ya publicada.
+"""
+import logging
+import os
+import threading
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, inspect, insert, select, update
+from sqlalchemy.exc import DBAPIError
+
+from .database import Base
+from . import models, models_noticias, models_padron  # noqa: F401  registran las tablas en Base.metadata
+
+logger = logging.getLogger(__name__)
+
+# Clave del pg_advisory_xact_lock (cualquier entero fijo de 64 bits)
+LOCK_MIGRACIONES = 7305202401
+
+schema_version = Table(
+    "schema_version", MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("descripcion", String(200), nullable=False),
+    Column("aplicada_en", DateTime, nullable=False),
+)
+
+Migracion = namedtuple("Migracion", "version descripcion aplicar")
+
+
+# --- Migraciones -------------------------------------------------------------
+
+# Columnas que se agregaron a tablas existentes antes de tener migraciones
+COLUMNAS_AGREGADAS = [
+    ("reportes_ciudadanos", "es_publico", "ALTER TABLE reportes_ciudadanos ADD COLUMN es_publico BOOLEAN DEFAULT true"),
+    ("reportes_ciudadanos", "contacto_email", "ALTER TABLE reportes_ciudadanos ADD COLUMN contacto_email VARCHAR(255)"),
+    ("noticias", "imagenes", "ALTER TABLE noticias ADD COLUMN imagenes TEXT"),
+    ("fotos_reportes", "contenido_base64", "ALTER TABLE fotos_reportes ADD COLUMN contenido_base64 TEXT"),
+    ("reportes_ciudadanos", "folio", "ALTER TABLE reportes_ciudadanos ADD COLUMN folio TEXT"),
+    ("reportes_ciudadanos", "votos", "ALTER TABLE reportes_ciudadanos ADD COLUMN votos INTEGER DEFAULT 0"),
+    ("reportes_ciudadanos", "vistas", "ALTER TABLE reportes_ciudadanos ADD COLUMN vistas INTEGER DEFAULT 0"),
+    ("reportes_ciudadanos", "colonia", "ALTER TABLE reportes_ciudadanos ADD COLUMN colonia TEXT"),
+    ("reportes_ciudadanos", "calle", "ALTER TABLE reportes_ciudadanos ADD COLUMN calle TEXT"),
+    ("reportes_ciudadanos", "subtipo", "ALTER TABLE reportes_ciudadanos ADD COLUMN subtipo TEXT"),
+    ("reportes_ciudadanos", "resuelto_en", "ALTER TABLE reportes_ciudadanos ADD COLUMN resuelto_en TIMESTAMP"),
+    ("usuarios", "opciones_app_usuario", "ALTER TABLE usuarios ADD COLUMN opciones_app_usuario TEXT"),
+    ("usuarios", "token_version", "ALTER TABLE usuarios ADD COLUMN token_version INTEGER NOT NULL DEFAULT 0"),
+]
+
+
+def _v1_esquema_base(conn):
+    """Tablas del modelo y columnas que antes se probaban en cada arranque."""
+    Base.metadata.create_all(bind=conn)
+    inspector = inspect(conn)
+    for tabla, columna, ddl in COLUMNAS_AGREGADAS:
+        if columna not in {c["name"] for c in inspector.get_columns(tabla)}:
+            conn.exec_driver_sql(ddl)
+            logger.info(f"Columna {tabla}.{columna} creada")
+
+
+def _v2_reportes_ciudadanos(conn):
+    """foto_url de 50000 caracteres y ciudadano_id opcional (solo PostgreSQL;
+    SQLite no limita el largo de VARCHAR y no permite ALTER COLUMN)."""
+    if conn.dialect.name != "postgresql":
+        return
+    columnas = {c["name"]: c for c in inspect(conn).get_columns("reportes_ciudadanos")}
+    largo = getattr(columnas["foto_url"]["type"], "length", None)
+    if largo is not None and largo < 50000:
+        conn.exec_driver_sql("ALTER TABLE reportes_ciudadanos ALTER COLUMN foto_url TYPE VARCHAR(50000)")
+        logger.info("foto_url ampliado a 50000")
+    if not columnas["ciudadano_id"]["nullable"]:
+        conn.exec_driver_sql("ALTER TABLE reportes_ciudadanos ALTER COLUMN ciudadano_id DROP NOT NULL")
+        logger.info("ciudadano_id ahora es nullable")
+
+
+def _v3_fotos_al_almacen(conn):
+    """Tabla fotos_almacen (almacén de fotos en la base, ALMACEN_FOTOS=base).
+
+    Las fotos en base64 no se mueven aquí, dentro del bloqueo de arranque: lo
+    hace mover_fotos_base64 en lotes (ver abajo)."""
+    models.FotoAlmacen.__table__.create(conn, checkfirst=True)
+
+
+MIGRACIONES = [
+    Migracion(1, "Esquema base y columnas agregadas antes de las migraciones", _v1_esquema_base),
+    Migracion(2, "reportes_ciudadanos: foto_url VARCHAR(50000) y ciudadano_id nullable", _v2_reportes_ciudadanos),
+    Migracion(3, "Tabla fotos_almacen del almacén de fotos", _v3_fotos_al_almacen),
+]
+
+VERSION_ESQUEMA = MIGRACIONES[-1].version
+
+
+# --- Fotos en base64 al almacén ----------------------------------------------
+
+LOTE_FOTOS = int(os.getenv("LOTE_FOTOS", "100"))
+MOVER_FOTOS_BASE64 = os.getenv("MOVER_FOTOS_BASE64", "1") == "1"
+
+
+def _mover_lote(conn, tabla, columna, filtro, valores, ultimo: int) -> tuple:
+    """Mueve hasta LOTE_FOTOS filas con id > ``ultimo``; devuelve (último id visto o None, movidas)."""
+    from .almacen_fotos import AlmacenBase, almacen, decodificar_base64, guardar_foto
+    destino_conn = conn if isinstance(almacen(), AlmacenBase) else None
+    filas = conn.execute(select(tabla.c.id, columna).where(filtro, tabla.c.id > ultimo)
+                         .order_by(tabla.c.id).limit(LOTE_FOTOS)).all()
+    if not filas:
+        return None, 0
+    movidas = 0
+    for id_, contenido in filas:
+        try:
+            datos, tipo = decodificar_base64(contenido)
+        except ValueError as e:
+            logger.warning(f"{tabla.name} {id_}: {e}")
+            continue
+        url = guardar_foto(datos, tipo, conn=destino_conn)
+        conn.execute(update(tabla).where(tabla.c.id == id_).values(**valores(url, datos)))
+        movidas += 1
+    return filas[-1].id, movidas
+
+
+def mover_fotos_base64(engine) -> int:
+    """Fotos en base64 (fotos_reportes.contenido_base64 y data URIs en
+    reportes_ciudadanos.foto_url) al almacén de fotos; en la fila queda la
+    URL /fotos/<hash>. Las que no son base64 válido se dejan como estaban.
+
+    Cada lote de LOTE_FOTOS filas es una transacción: los demás escritores no
+    esperan a que terminen todas. Con el almacén en la base (AlmacenBase) la
+    foto se escribe en la misma transacción que borra el base64: o quedan las
+    dos cosas o ninguna. Varios procesos a la vez no se estorban (el almacén
+    ignora las fotos repetidas)."""
+    fotos = models.FotoReporte.__table__
+    reportes = models.ReporteCiudadano.__table__
+    tareas = [
+        (fotos, fotos.c.contenido_base64, fotos.c.contenido_base64.isnot(None),
+         lambda url, datos: {"url": url, "tamaño": len(datos), "contenido_base64": None}),
+        (reportes, reportes.c.foto_url, reportes.c.foto_url.like("data:%"),
+         lambda url, datos: {"foto_url": url}),
+    ]
+    total = 0
+    for tarea in tareas:
+        ultimo = 0
+        while ultimo is not None:
+            with engine.begin() as conn:
+                ultimo, movidas = _mover_lote(conn, *tarea, ultimo)
+            total += movidas
+    return total
+
+
+def _mover_de_fondo(engine):
+    try:
+        movidas = mover_fotos_base64(engine)
+        if movidas:
+            logger.info(f"{movidas} fotos en base64 movidas al almacén de fotos")
+    except Exception as e:
+        logger.error(f"Error moviendo fotos en base64 al almacén: {e}")
+
+
+def iniciar_mover_fotos_base64(engine):
+    """Lanza ``mover_fotos_base64`` en un hilo de fondo si el almacén es duradero.
+
+    Si no lo es (disco sin FOTOS_DIR_PERSISTENTE=1) no se toca ninguna fila:
+    el base64 sigue siendo la única copia que sobrevive a un redespliegue. Se
+    pueden mover después con mover_fotos_base64.py."""
+    from .almacen_fotos import ALMACEN_FOTOS, almacen_duradero
+    if not almacen_duradero():
+        logger.warning(f"Almacén de fotos '{ALMACEN_FOTOS}' no duradero: las fotos en base64 se quedan en la base")
+        return
+    threading.Thread(target=_mover_de_fondo, args=(engine,), name="mover-fotos-base64", daemon=True).start()
+
+
+# --- Ejecución ---------------------------------------------------------------
+
+def version_esquema(conn):
+    """Versión aplicada, 0 sin migraciones, o None si no existe schema_version."""
+    try:
+        return conn.execute(select(func.max(schema_version.c.version))).scalar() or 0
+    except DBAPIError:
+        conn.rollback()
+        return None
+
+
+def _bloquear(conn):
+    if conn.dialect.name == "postgresql":
+        conn.exec_driver_sql(f"SELECT pg_advisory_xact_lock({LOCK_MIGRACIONES})")
+    elif conn.dialect.name == "sqlite":
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def aplicar_migraciones(engine) -> list:
+    """Aplica las migraciones pendientes y devuelve las versiones aplicadas."""
+    with engine.connect() as conn:
+        if version_esquema(conn) == VERSION_ESQUEMA:
+            return []
+
+    with engine.connect() as conn:
+        _bloquear(conn)
+        schema_version.create(conn, checkfirst=True)
+        actual = version_esquema(conn) or 0
+        aplicadas = []
+        for migracion in MIGRACIONES:
+            if migracion.version <= actual:
+                continue
+            logger.info(f"Aplicando migración {migracion.version}: {migracion.descripcion}")
+            migracion.aplicar(conn)
+            conn.execute(insert(schema_version).values(
+                version=migracion.version,
+                descripcion=migracion.descripcion,
+                aplicada_en=datetime.utcnow(),
+            ))
+            aplicadas.append(migracion.version)
+        conn.commit()
+    return aplicadas
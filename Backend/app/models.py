@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Boolean, Date, DateTime, Float, ForeignKey, LargeBinary
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -20,6 +20,7 @@ class Usuario(Base):
     fecha_registro = Column(DateTime, default=func.now())
     activo = Column(Boolean, default=True)
     opciones_app_usuario = Column(Text, nullable=True)  # JSON — override personal de opciones de app
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")  # incrementar revoca todos sus tokens
 
     # Relaciones
     subordinados = relationship("Usuario", backref="lider_superior", remote_side=[id])
@@ -27,6 +28,16 @@ class Usuario(Base):
     personas_registradas_por_mi = relationship("Persona", foreign_keys="Persona.id_usuario_registro")
     eventos_organizados = relationship("Evento", back_populates="lider_organizador")
 
+class ContadorRed(Base):
+    """Totales de red por líder, mantenidos al escribir personas/usuarios (ver contadores_red.py)."""
+    __tablename__ = "contadores_red"
+
+    id_usuario = Column(Integer, ForeignKey("usuarios.id"), primary_key=True)
+    personas_directas = Column(Integer, nullable=False, default=0)
+    personas_red = Column(Integer, nullable=False, default=0)
+    lideres_red = Column(Integer, nullable=False, default=0)
+    fecha_actualizacion = Column(DateTime, default=func.now(), onupdate=func.now())
+
 class Persona(Base):
     __tablename__ = "personas"
 
@@ -141,6 +152,32 @@ class AsignacionMovilizacion(Base):
     vehiculo = relationship("Vehiculo")
     persona = relationship("Persona")
 
+class ResumenEvento(Base):
+    """Métricas congeladas de un evento ya pasado (ver resumenes.py)."""
+    __tablename__ = "resumen_eventos"
+
+    id_evento = Column(Integer, ForeignKey("eventos.id"), primary_key=True)
+    fecha_evento = Column(DateTime, nullable=False, index=True)
+    asignados = Column(Integer, nullable=False, default=0)
+    registros = Column(Integer, nullable=False, default=0)
+    asistieron = Column(Integer, nullable=False, default=0)
+    movilizados = Column(Integer, nullable=False, default=0)
+    movilizados_asistieron = Column(Integer, nullable=False, default=0)
+    fecha_corte = Column(DateTime, default=func.now())
+
+class ResumenLiderDiario(Base):
+    """Totales de red y asistencia de un líder al cierre de un día (ver resumenes.py)."""
+    __tablename__ = "resumen_lideres_diario"
+
+    fecha = Column(Date, primary_key=True)
+    id_usuario = Column(Integer, ForeignKey("usuarios.id"), primary_key=True, index=True)
+    personas_directas = Column(Integer, nullable=False, default=0)
+    personas_red = Column(Integer, nullable=False, default=0)
+    lideres_red = Column(Integer, nullable=False, default=0)
+    asistencias = Column(Integer, nullable=False, default=0)
+    movilizados = Column(Integer, nullable=False, default=0)
+    fecha_corte = Column(DateTime, default=func.now())
+
 class ConfiguracionPerfil(Base):
     __tablename__ = "configuraciones_perfiles"
     
@@ -254,6 +291,15 @@ class FotoReporte(Base):
     # Relaciones
     reporte = relationship("ReporteCiudadano", back_populates="fotos")
 
+class FotoAlmacen(Base):
+    """Bytes de una foto del almacén por su hash, o de una variante (ver almacen_fotos.py)."""
+    __tablename__ = "fotos_almacen"
+
+    clave = Column(String(100), primary_key=True)
+    contenido = Column(LargeBinary, nullable=False)
+    tamano = Column(Integer, nullable=False)
+    fecha_creacion = Column(DateTime, default=func.now())
+
 # 🆕 NUEVOS MODELOS: Sistema de Permisos Individuales
 class Permiso(Base):
     __tablename__ = "permisos"
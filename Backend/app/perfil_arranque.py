@@ -0,0 +1,97 @@
+"""Perfil del arranque en frío.
+
+- ``python -m app.perfil_arranque`` (desde Backend/): importa app.main con
+  ``-X importtime`` en un proceso aparte y muestra los módulos de la app y
+  las dependencias que más tardan; después importa la app y corre el lifespan
+  (contra DATABASE_URL, como un arranque normal) midiendo cada paso.
+- ``PERFIL_ARRANQUE=1`` al arrancar el servidor: el lifespan escribe en el log
+  cuánto tomó importar app.main y cada paso del arranque.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+PERFIL_ARRANQUE = os.getenv("PERFIL_ARRANQUE", "0") == "1"
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Paso del arranque -> segundos, en el orden en que se ejecutaron
+tiempos = {}
+
+
+@contextmanager
+def paso(nombre: str):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        tiempos[nombre] = time.perf_counter() - inicio
+
+
+def resumen() -> str:
+    return ", ".join(f"{nombre} {segundos * 1000:.0f} ms" for nombre, segundos in tiempos.items())
+
+
+def tiempos_importacion(modulo: str = "app.main") -> list:
+    """Filas (nombre, propio_us, acumulado_us) de ``python -X importtime -c 'import modulo'``."""
+    proceso = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        capture_output=True, text=True, cwd=RAIZ,
+    )
+    filas = []
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith("import time:") or "[us]" in linea:
+            continue
+        propio, acumulado, nombre = linea[len("import time:"):].split("|")
+        filas.append((nombre.strip(), int(propio), int(acumulado)))
+    if not any(nombre == modulo for nombre, _, _ in filas):
+        raise RuntimeError(f"No se pudo importar {modulo}:\n{proceso.stderr[-2000:]}")
+    return filas
+
+
+def _imprimir(titulo, filas, top):
+    print(f"\n{titulo}")
+    for nombre, propio, acumulado in sorted(filas, key=lambda f: f[2], reverse=True)[:top]:
+        print(f"  {acumulado / 1000:8.1f} ms  (propio {propio / 1000:6.1f} ms)  {nombre}")
+
+
+async def _correr_lifespan(app):
+    async with app.router.lifespan_context(app):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--sin-lifespan", action="store_true", help="solo medir importaciones")
+    args = parser.parse_args()
+
+    filas = tiempos_importacion()
+    total = next(acumulado for nombre, _, acumulado in filas if nombre == "app.main")
+    print(f"Importar app.main: {total / 1000:.1f} ms")
+    _imprimir("Módulos de la app (acumulado incluye lo que importan por primera vez):",
+              [f for f in filas if f[0].startswith("app.")], args.top)
+    _imprimir("Dependencias (paquetes de primer nivel):",
+              [f for f in filas if "." not in f[0] and f[0] not in ("app", "site")], args.top)
+
+    if args.sin_lifespan:
+        return
+    sys.path.insert(0, RAIZ)
+    logging.disable(logging.INFO)
+    from app.main import app
+    from app import perfil_arranque  # con -m este archivo es __main__; main.py registra en el módulo importado
+    asyncio.run(_correr_lifespan(app))
+    print("\nArranque (en este proceso):")
+    for nombre, segundos in perfil_arranque.tiempos.items():
+        print(f"  {segundos * 1000:8.1f} ms  {nombre}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""Perfil de rendimiento para SQLite (despliegues locales o sin conexión).
+
+Con SQLITE_OPTIMIZADO=1 (por defecto) cada conexión a una base SQLite usa:
+- journal_mode=WAL: los lectores no bloquean al escritor ni al revés.
+- synchronous (SQLITE_SYNCHRONOUS, NORMAL): con WAL la base sigue siendo
+  consistente; un corte de energía puede perder las últimas transacciones.
+- cache_size (SQLITE_CACHE_MB, 64) y mmap_size (SQLITE_MMAP_MB, 256).
+- busy_timeout (SQLITE_BUSY_TIMEOUT_MS, 5000).
+
+Con SQLITE_ESCRITOR_UNICO=1 (por defecto) además se serializan las
+escrituras a cada archivo: la primera sentencia que escribe toma un candado
+que se libera cuando la conexión vuelve al pool (después del commit o
+rollback). Los escritores hacen fila en vez de reintentar con las esperas
+crecientes del busy handler de SQLite, que es lo que termina en "database is
+locked". El engine síncrono y el asíncrono comparten el candado.
+
+El dueño del candado es la petición (``MiddlewareEscritorUnico`` la marca en
+un ContextVar, que run_in_threadpool copia a sus hilos); fuera de una
+petición, la tarea del event loop o el hilo. Otra sesión de la misma petición
+(``es_token_admin``, el almacén de fotos, los contadores) no espera a la
+primera; dos peticiones nunca escriben a la vez aunque compartan hilo. Cómo
+se espera el turno:
+- en un hilo sin event loop: bloqueando, hasta busy_timeout;
+- con el engine asíncrono: cediendo el event loop, hasta busy_timeout;
+- con una Session síncrona en el hilo del event loop (endpoints ``async def``
+  con ``get_db``) no se espera: bloquearía a todas las peticiones.
+Si no se obtiene el turno se lanza ``EscrituraOcupada`` (la app responde 503
+con Retry-After); nunca se escribe sin candado.
+
+Una sentencia escribe si SQLAlchemy la compiló como INSERT, UPDATE, DELETE o
+DDL; el SQL crudo (``text``) y los CTE con escrituras se reconocen por el
+texto.
+
+WAL necesita que el archivo esté en un disco local (no en carpetas de red).
+"""
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.util import await_only
+
+logger = logging.getLogger(__name__)
+
+SQLITE_OPTIMIZADO = os.getenv("SQLITE_OPTIMIZADO", "1") == "1"
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").upper()
+SQLITE_CACHE_MB = int(os.getenv("SQLITE_CACHE_MB", "64"))
+SQLITE_MMAP_MB = int(os.getenv("SQLITE_MMAP_MB", "256"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_ESCRITOR_UNICO = os.getenv("SQLITE_ESCRITOR_UNICO", "1") == "1"
+
+if SQLITE_SYNCHRONOUS not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+    raise ValueError(f"SQLITE_SYNCHRONOUS inválido: {SQLITE_SYNCHRONOUS}")
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}",
+    f"PRAGMA cache_size=-{SQLITE_CACHE_MB * 1024}",  # negativo = KiB
+    f"PRAGMA mmap_size={SQLITE_MMAP_MB * 1024 * 1024}",
+    f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+)
+
+_ESCRITURA = re.compile(
+    r"^\s*(?:(?:INSERT|UPDATE|DELETE|REPLACE|CREATE|DROP|ALTER)\b|BEGIN\s+(?:IMMEDIATE|EXCLUSIVE)\b"
+    r"|WITH\b.*\b(?:INSERT|UPDATE|DELETE|REPLACE)\b)",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+def es_escritura(statement: str, context) -> bool:
+    compilado = getattr(context, "compiled", None)
+    if compilado is not None and (compilado.is_ddl or compilado.isinsert or compilado.isupdate or compilado.isdelete):
+        return True
+    return _ESCRITURA.match(statement) is not None
+
+
+class EscrituraOcupada(Exception):
+    """Otro escritor tiene la base y no se obtuvo el turno."""
+
+
+# Petición en curso (un objeto por petición); ver MiddlewareEscritorUnico
+_peticion: ContextVar = ContextVar("peticion_escritora", default=None)
+
+
+class MiddlewareEscritorUnico:
+    """Marca cada petición como dueña de sus escrituras, también en los hilos
+    que lanza con run_in_threadpool (copian el contexto)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            _peticion.set(object())
+        await self.app(scope, receive, send)
+
+
+def _dueno_actual() -> tuple:
+    """(dueño, en el hilo del event loop)."""
+    try:
+        asyncio.get_running_loop()
+        en_loop = True
+    except RuntimeError:
+        en_loop = False
+    dueno = _peticion.get()
+    if dueno is None:
+        dueno = (asyncio.current_task() if en_loop else None) or threading.get_ident()
+    return dueno, en_loop
+
+
+class EscritorUnico:
+    """Candado de escritura de un archivo SQLite, reentrante por dueño (petición, tarea o hilo)."""
+
+    def __init__(self):
+        self._candado = threading.Lock()
+        self._estado = threading.Lock()
+        self._dueno = None
+        self._cuenta = 0
+        self._espera = SQLITE_BUSY_TIMEOUT_MS / 1000
+
+    def adquirir(self, asincrono: bool):
+        """Espera el turno (ver el docstring del módulo) o lanza EscrituraOcupada.
+
+        Si el dueño ya lo tiene, no espera."""
+        dueno, en_loop = _dueno_actual()
+        with self._estado:
+            if self._cuenta and self._dueno == dueno:
+                self._cuenta += 1
+                return
+        if asincrono:
+            tomado = self._candado.acquire(blocking=False)
+            limite = time.monotonic() + self._espera
+            pausa = 0.001
+            while not tomado and time.monotonic() < limite:
+                await_only(asyncio.sleep(pausa))
+                pausa = min(pausa * 2, 0.05)
+                tomado = self._candado.acquire(blocking=False)
+        elif en_loop:
+            tomado = self._candado.acquire(blocking=False)
+        else:
+            tomado = self._candado.acquire(timeout=self._espera)
+        if not tomado:
+            raise EscrituraOcupada("La base SQLite está ocupada por otro escritor")
+        with self._estado:
+            self._dueno, self._cuenta = dueno, 1
+
+    def liberar(self):
+        with self._estado:
+            self._cuenta -= 1
+            if self._cuenta:
+                return
+            self._dueno = None
+        self._candado.release()
+
+
+# Un escritor por archivo, compartido por todos los engines que lo abren
+_escritores = {}
+_escritores_lock = threading.Lock()
+
+
+def _escritor_de(engine) -> EscritorUnico:
+    base = engine.url.database
+    clave = os.path.abspath(base) if base and base != ":memory:" else id(engine)
+    with _escritores_lock:
+        return _escritores.setdefault(clave, EscritorUnico())
+
+
+def _aplicar_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma in PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+
+def _serializar_escrituras(engine):
+    escritor = _escritor_de(engine)
+    asincrono = engine.dialect.is_async
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+        if "candado_escritura" not in conn.info and es_escritura(statement, context):
+            escritor.adquirir(asincrono)
+            conn.info["candado_escritura"] = escritor
+
+    def _liberar(connection_record):
+        candado = connection_record.info.pop("candado_escritura", None) if connection_record else None
+        if candado is not None:
+            candado.liberar()
+
+    event.listen(engine, "checkin", lambda dbapi_connection, connection_record: _liberar(connection_record))
+    event.listen(engine, "invalidate", lambda dbapi_connection, connection_record, exception: _liberar(connection_record))
+
+
+def configurar_sqlite(engine):
+    """Aplica el perfil a un engine síncrono (o al ``sync_engine`` de uno asíncrono)."""
+    if engine.url.get_backend_name() != "sqlite" or not SQLITE_OPTIMIZADO:
+        return
+    event.listen(engine, "connect", _aplicar_pragmas)
+    if SQLITE_ESCRITOR_UNICO:
+        _serializar_escrituras(engine)
@@ -0,0 +1,168 @@
+"""Perfilador por muestreo para un worker en producción (solo administradores).
+
+Un hilo toma las pilas de los demás hilos (``sys._current_frames``) cada
+``intervalo_ms`` y cuenta cuántas veces aparece cada pila. El resultado va en
+formato "collapsed"/"folded" (``hilo;funcion (archivo:linea);... N``), que
+abren directamente flamegraph.pl, inferno y speedscope.
+
+- ``POST /admin/perfilador?segundos=10``: perfila todo el worker que atienda
+  la petición durante N segundos y devuelve el perfil.
+- Cabecera ``X-Perfilar: 1`` en cualquier petición con token de admin: se
+  perfila mientras dura esa petición (hilo del event loop y threadpool; si el
+  worker atiende otras peticiones a la vez, también aparecen). La respuesta
+  trae ``X-Perfil-Id`` y el perfil se descarga de
+  ``GET /admin/perfilador/{perfil_id}`` durante PERFILADOR_TTL segundos (600).
+
+Sin perfil en curso no corre ningún hilo; el middleware solo busca la
+cabecera. Hay un perfil a la vez por worker.
+"""
+import asyncio
+import os
+import sys
+import threading
+import uuid
+from collections import Counter
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+
+from .auth import es_token_admin, require_admin
+from .cache import TTLCache
+
+PERFILADOR_MAX_SEGUNDOS = float(os.getenv("PERFILADOR_MAX_SEGUNDOS", "60"))
+PERFILADOR_TTL = float(os.getenv("PERFILADOR_TTL", "600"))
+INTERVALO_MS = float(os.getenv("PERFILADOR_INTERVALO_MS", "5"))
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+router = APIRouter(prefix="/admin/perfilador", tags=["admin"])
+
+_perfiles = TTLCache(ttl=PERFILADOR_TTL, maxsize=20)
+_en_curso = threading.Lock()
+_etiquetas = {}
+
+
+def _etiqueta(codigo) -> str:
+    etiqueta = _etiquetas.get(codigo)
+    if etiqueta is None:
+        archivo = codigo.co_filename
+        if archivo.startswith(RAIZ):
+            archivo = os.path.relpath(archivo, RAIZ)
+        elif "site-packages" in archivo:
+            archivo = archivo.split("site-packages" + os.sep, 1)[1]
+        else:
+            archivo = os.path.basename(archivo)
+        etiqueta = _etiquetas[codigo] = f"{codigo.co_name} ({archivo}:{codigo.co_firstlineno})".replace(";", ",")
+    return etiqueta
+
+
+class Muestreador:
+    """Cuenta pilas de los hilos elegidos (``hilos(ident, nombre)``; todos si es None)."""
+
+    def __init__(self, intervalo_ms: float = INTERVALO_MS, hilos=None):
+        self.intervalo = intervalo_ms / 1000
+        self.hilos = hilos
+        self.pilas = Counter()
+        self.muestras = 0
+        self._fin = threading.Event()
+        self._hilo = threading.Thread(target=self._correr, name="perfilador", daemon=True)
+
+    def iniciar(self):
+        self._hilo.start()
+
+    def detener(self) -> str:
+        self._fin.set()
+        self._hilo.join()
+        return self.folded()
+
+    def _correr(self):
+        propio = threading.get_ident()
+        while not self._fin.wait(self.intervalo):
+            nombres = {hilo.ident: hilo.name for hilo in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                nombre = nombres.get(ident, str(ident))
+                if ident == propio or (self.hilos is not None and not self.hilos(ident, nombre)):
+                    continue
+                pila = []
+                while frame is not None:
+                    pila.append(_etiqueta(frame.f_code))
+                    frame = frame.f_back
+                pila.append(nombre.replace(";", ","))
+                self.pilas[";".join(reversed(pila))] += 1
+            self.muestras += 1
+
+    def folded(self) -> str:
+        return "".join(f"{pila} {n}\n" for pila, n in self.pilas.most_common())
+
+
+@router.post("", response_class=PlainTextResponse)
+async def perfilar_worker(
+    segundos: float = Query(10, gt=0),
+    intervalo_ms: float = Query(INTERVALO_MS, ge=1, le=1000),
+    current_user=Depends(require_admin),
+):
+    """Perfil de todos los hilos de este worker durante ``segundos`` (formato folded)."""
+    if segundos > PERFILADOR_MAX_SEGUNDOS:
+        raise HTTPException(status_code=400, detail=f"Máximo {PERFILADOR_MAX_SEGUNDOS:g} segundos")
+    if not _en_curso.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="Ya hay un perfil en curso en este worker")
+    try:
+        muestreador = Muestreador(intervalo_ms)
+        muestreador.iniciar()
+        await asyncio.sleep(segundos)
+        perfil = await run_in_threadpool(muestreador.detener)
+    finally:
+        _en_curso.release()
+    return PlainTextResponse(perfil, headers={"X-Perfil-Muestras": str(muestreador.muestras), "X-Perfil-Pid": str(os.getpid())})
+
+
+@router.get("/{perfil_id}", response_class=PlainTextResponse)
+async def obtener_perfil(perfil_id: str, current_user=Depends(require_admin)):
+    """Perfil de una petición marcada con X-Perfilar (formato folded)."""
+    perfil = _perfiles.get(perfil_id)
+    if perfil is None:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado o expirado (¿lo generó otro worker?)")
+    return PlainTextResponse(perfil)
+
+
+def _hilos_de_peticion(loop_ident):
+    return lambda ident, nombre: ident == loop_ident or nombre.startswith("AnyIO worker thread")
+
+
+class MiddlewarePerfilador:
+    """Perfila las peticiones que traen X-Perfilar con un token de administrador."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        cabeceras = dict(scope["headers"])
+        if b"x-perfilar" not in cabeceras:
+            await self.app(scope, receive, send)
+            return
+
+        autorizacion = cabeceras.get(b"authorization", b"").decode("latin-1")
+        token = autorizacion[7:] if autorizacion.lower().startswith("bearer ") else ""
+        if not token or not await run_in_threadpool(es_token_admin, token) or not _en_curso.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        perfil_id = uuid.uuid4().hex
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                mensaje["headers"] = list(mensaje.get("headers", [])) + [(b"x-perfil-id", perfil_id.encode())]
+            await send(mensaje)
+
+        muestreador = Muestreador(hilos=_hilos_de_peticion(threading.get_ident()))
+        muestreador.iniciar()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            perfil = await run_in_threadpool(muestreador.detener)
+            _en_curso.release()
+            _perfiles.set(perfil_id, perfil)
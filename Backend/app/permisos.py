@@ -0,0 +1,194 @@
+"""Permisos efectivos por usuario, precalculados y cacheados.
+
+La configuración de menús es la del rol (``configuraciones_perfiles``, o los
+valores por defecto de abajo si el rol no tiene fila), con el override
+personal ``Usuario.opciones_app_usuario`` en lugar de opciones_app.
+
+Los permisos salen solo de los ``perfiles_permisos`` habilitados del perfil
+del rol: las opciones de menú deciden qué se muestra, no qué se autoriza (el
+override personal lo edita cualquiera con acceso a usuarios, y los valores
+por defecto incluyen "admin-perfiles"). El rol admin tiene todos.
+
+El resultado se guarda por usuario, así que ``has_permission`` es una búsqueda
+en un frozenset sin consultas. Por ahora solo lo usan los endpoints de
+perfiles.py; el resto de los routers sigue comparando ``current_user.rol``
+directamente. Los endpoints que modifican perfiles, y los que cambian el rol,
+desactivan o revocan los tokens de un usuario, llaman a ``invalidar_permisos``.
+"""
+import json
+import logging
+import os
+from typing import Optional
+
+from fastapi import Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from .auth import get_current_active_user
+from .cache import TTLCache
+from .database import get_db
+from .models import ConfiguracionDashboard as ConfiguracionDashboardModel
+from .models import ConfiguracionPerfil as ConfiguracionPerfilModel
+from .models import PerfilPermiso as PerfilPermisoModel
+from .models import Permiso as PermisoModel
+from .models import Usuario as UsuarioModel
+
+logger = logging.getLogger(__name__)
+
+PERMISOS_CACHE_TTL = float(os.getenv("PERMISOS_CACHE_TTL", "300"))
+
+CONFIGURACION_PERFIL_POR_DEFECTO = {
+    "admin": {
+        "opciones_web": ["dashboard", "usuarios", "personas", "eventos", "eventos-historicos", "movilizacion", "reportes", "estructura-red", "checkin", "perfil", "admin-perfiles", "admin-database", "seguimiento", "noticias", "reportes_ciudadanos", "seguimiento_reportes"],
+        "opciones_app": ["dashboard", "register", "reassign", "pase-lista", "movilizacion", "estructura-red", "eventos-historicos", "reportes", "noticias", "reportes_ciudadanos", "seguimiento_reportes", "seguimiento", "perfil"]
+    },
+    "presidente": {
+        "opciones_web": ["dashboard", "personas", "eventos", "eventos-historicos", "movilizacion", "reportes", "estructura-red", "checkin", "perfil", "seguimiento", "noticias", "reportes_ciudadanos"],
+        "opciones_app": ["dashboard", "register", "reassign", "estructura-red", "pase-lista", "eventos-historicos", "movilizacion", "reportes", "perfil", "seguimiento", "movilizador-seguimiento", "noticias"]
+    },
+    "lider_estatal": {
+        "opciones_web": ["dashboard", "personas", "eventos", "eventos-historicos", "movilizacion", "reportes", "estructura-red", "checkin", "perfil", "seguimiento", "noticias", "reportes_ciudadanos"],
+        "opciones_app": ["dashboard", "register", "reassign", "estructura-red", "pase-lista", "eventos-historicos", "movilizacion", "reportes", "perfil", "seguimiento", "movilizador-seguimiento", "noticias"]
+    },
+    "lider_regional": {
+        "opciones_web": ["dashboard", "personas", "eventos", "eventos-historicos", "movilizacion", "reportes", "estructura-red", "checkin", "perfil", "noticias"],
+        "opciones_app": ["dashboard", "register", "reassign", "estructura-red", "pase-lista", "eventos-historicos", "movilizacion", "reportes", "perfil", "movilizador-seguimiento", "noticias"]
+    },
+    "lider_municipal": {
+        "opciones_web": ["dashboard", "personas", "eventos", "eventos-historicos", "movilizacion", "reportes", "estructura-red", "checkin", "perfil", "seguimiento", "noticias", "reportes_ciudadanos"],
+        "opciones_app": ["dashboard", "register", "reassign", "estructura-red", "pase-lista", "eventos-historicos", "movilizacion", "reportes", "perfil", "seguimiento", "movilizador-seguimiento", "noticias"]
+    },
+    "lider_zona": {
+        "opciones_web": ["dashboard", "personas", "eventos", "eventos-historicos", "movilizacion", "reportes", "estructura-red", "checkin", "perfil", "noticias"],
+        "opciones_app": ["dashboard", "register", "reassign", "estructura-red", "pase-lista", "eventos-historicos", "movilizacion", "reportes", "perfil", "movilizador-seguimiento", "noticias"]
+    },
+    "capturista": {
+        "opciones_web": ["dashboard", "personas", "eventos", "checkin", "perfil", "noticias"],
+        "opciones_app": ["dashboard", "register", "pase-lista", "perfil", "noticias"]
+    },
+    "ciudadano": {
+        "opciones_web": ["dashboard", "noticias", "reportes_ciudadanos", "perfil"],
+        "opciones_app": ["dashboard", "noticias", "reportes_ciudadanos", "perfil"]
+    }
+}
+
+CONFIGURACION_PERFIL_SIN_ROL = {"opciones_web": ["dashboard", "perfil"], "opciones_app": ["dashboard", "perfil"]}
+
+WIDGETS_DASHBOARD_POR_DEFECTO = {
+    "admin": ["total-personas", "total-eventos", "lideres-activos", "secciones-cubiertas",
+              "movilizacion-vehiculos", "asistencias-tiempo-real", "eventos-historicos",
+              "top-secciones", "top-lideres", "estructura-red"],
+    "presidente": ["total-personas", "total-eventos", "lideres-activos", "secciones-cubiertas",
+                   "movilizacion-vehiculos", "asistencias-tiempo-real", "eventos-historicos",
+                   "top-secciones", "top-lideres", "estructura-red"],
+    "lider_estatal": ["total-personas", "total-eventos", "lideres-activos", "secciones-cubiertas",
+                      "movilizacion-vehiculos", "asistencias-tiempo-real", "eventos-historicos",
+                      "top-secciones", "top-lideres", "estructura-red"],
+    "lider_regional": ["total-personas", "total-eventos", "secciones-cubiertas",
+                       "top-secciones", "top-lideres", "estructura-red"],
+    "lider_municipal": ["total-personas", "total-eventos", "lideres-activos", "secciones-cubiertas",
+                        "movilizacion-vehiculos", "asistencias-tiempo-real", "eventos-historicos",
+                        "top-secciones", "top-lideres", "estructura-red"],
+    "lider_zona": ["total-personas", "total-eventos", "secciones-cubiertas",
+                   "top-secciones", "top-lideres", "estructura-red"],
+    "capturista": ["total-personas", "total-eventos", "secciones-cubiertas"],
+    "ciudadano": ["total-eventos", "estructura-red"]
+}
+
+_cache_roles = TTLCache(ttl=PERMISOS_CACHE_TTL, maxsize=64)
+_cache_usuarios = TTLCache(ttl=PERMISOS_CACHE_TTL, maxsize=4096)
+
+
+def _cargar_json(valor, por_defecto):
+    try:
+        return json.loads(valor) if isinstance(valor, str) else (valor if valor is not None else por_defecto)
+    except (json.JSONDecodeError, TypeError):
+        return por_defecto
+
+
+class PermisosEfectivos:
+    """Configuración y permisos ya resueltos de un usuario."""
+
+    def __init__(self, rol: str, opciones_web: list, opciones_app: list, widgets: list,
+                 permisos_perfil: dict, es_override_usuario: bool = False):
+        self.rol = rol
+        self.opciones_web = opciones_web
+        self.opciones_app = opciones_app
+        self.widgets = widgets
+        self.es_override_usuario = es_override_usuario
+        self.permisos = frozenset(codigo for codigo, habilitado in permisos_perfil.items() if habilitado)
+
+    def tiene(self, codigo: str) -> bool:
+        return self.rol == "admin" or codigo in self.permisos
+
+    def configuracion(self) -> dict:
+        configuracion = {"opciones_web": self.opciones_web, "opciones_app": self.opciones_app}
+        if self.es_override_usuario:
+            configuracion["es_override_usuario"] = True
+        return configuracion
+
+
+def _cargar_rol(db: Session, rol: str) -> dict:
+    config = db.query(ConfiguracionPerfilModel).filter(ConfiguracionPerfilModel.rol == rol).first()
+    if config:
+        opciones = {"opciones_web": json.loads(config.opciones_web), "opciones_app": json.loads(config.opciones_app)}
+        permisos_perfil = dict(
+            db.query(PermisoModel.codigo, PerfilPermisoModel.habilitado)
+            .join(PerfilPermisoModel, PerfilPermisoModel.id_permiso == PermisoModel.id)
+            .filter(PerfilPermisoModel.id_perfil == config.id, PermisoModel.activo == True)
+            .all()
+        )
+    else:
+        opciones = CONFIGURACION_PERFIL_POR_DEFECTO.get(rol, CONFIGURACION_PERFIL_SIN_ROL)
+        permisos_perfil = {}
+
+    dashboard = db.query(ConfiguracionDashboardModel).filter(ConfiguracionDashboardModel.rol == rol).first()
+    widgets = _cargar_json(dashboard.widgets, []) if dashboard else WIDGETS_DASHBOARD_POR_DEFECTO.get(rol, [])
+    return {"opciones": opciones, "widgets": widgets, "permisos_perfil": permisos_perfil}
+
+
+def configuracion_rol(db: Session, rol: str) -> dict:
+    """Configuración (de BD o por defecto) de un rol, cacheada."""
+    return _cache_roles.get_or_set(rol, lambda: _cargar_rol(db, rol))
+
+
+def obtener_permisos(db: Session, usuario: UsuarioModel) -> PermisosEfectivos:
+    """Permisos efectivos del usuario; solo consulta la base la primera vez por rol."""
+    def resolver():
+        rol = configuracion_rol(db, usuario.rol)
+        opciones_app = rol["opciones"]["opciones_app"]
+        override = usuario.opciones_app_usuario
+        if override:
+            opciones_app = _cargar_json(override, opciones_app)
+        return PermisosEfectivos(
+            rol=usuario.rol,
+            opciones_web=rol["opciones"]["opciones_web"],
+            opciones_app=opciones_app,
+            widgets=rol["widgets"],
+            permisos_perfil=rol["permisos_perfil"],
+            es_override_usuario=bool(override),
+        )
+    return _cache_usuarios.get_or_set(usuario.id, resolver)
+
+
+def invalidar_permisos(usuario_id: Optional[int] = None):
+    """Invalida los permisos de un usuario, o de todos (y de los roles) si usuario_id es None."""
+    if usuario_id is None:
+        _cache_roles.invalidate()
+        _cache_usuarios.invalidate()
+    else:
+        _cache_usuarios.invalidate(usuario_id)
+
+
+def has_permission(codigo: str):
+    """Dependencia: exige que el usuario actual tenga el permiso ``codigo`` (admin siempre lo tiene)."""
+    async def verificar(
+        db: Session = Depends(get_db),
+        current_user: UsuarioModel = Depends(get_current_active_user)
+    ):
+        if not obtener_permisos(db, current_user).tiene(codigo):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"No tienes el permiso '{codigo}'"
+            )
+        return current_user
+    return verificar
@@ -0,0 +1,129 @@
+"""Configuración del pool de conexiones y métricas de uso.
+
+Cada despliegue ajusta el pool con variables de entorno:
+- DB_POOL_SIZE (5) y DB_MAX_OVERFLOW (10): conexiones fijas y extra por proceso.
+- DB_POOL_TIMEOUT (30 s): espera máxima por una conexión libre.
+- DB_POOL_RECYCLE (1800 s, -1 para no reciclar): evita conexiones que el
+  servidor o un proxy ya cerraron por inactividad.
+- DB_POOL_PRE_PING (1): verifica la conexión antes de entregarla.
+- DB_POOL_PARTE_ASYNC (0.5): con sesión asíncrona, fracción del pool y del
+  overflow que va al engine asíncrono; el síncrono recibe el resto. Los dos
+  juntos no pasan de DB_POOL_SIZE + DB_MAX_OVERFLOW conexiones (salvo el
+  mínimo de una fija para cada uno).
+
+Los pools registran cuánto espera cada checkout; ``estado_pool`` junta eso
+con las conexiones en uso y de overflow (GET /health/pool). Los valores son
+por proceso: con varios workers hay que sumar lo de cada uno.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+DB_POOL_PARTE_ASYNC = float(os.getenv("DB_POOL_PARTE_ASYNC", "0.5"))
+
+MUESTRAS_ESPERA = 1000
+
+
+class MetricasPool:
+    """Tiempos de espera de checkout (totales y de los últimos MUESTRAS_ESPERA)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._esperas = deque(maxlen=MUESTRAS_ESPERA)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.espera_total = 0.0
+        self.espera_max = 0.0
+
+    def registrar(self, espera: float, timeout: bool = False):
+        with self._lock:
+            if timeout:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.espera_total += espera
+            self.espera_max = max(self.espera_max, espera)
+            self._esperas.append(espera)
+
+    def resumen(self) -> dict:
+        with self._lock:
+            recientes = sorted(self._esperas)
+            total = self.checkouts + self.timeouts
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "espera_promedio_ms": round(self.espera_total / total * 1000, 3) if total else 0,
+                "espera_max_ms": round(self.espera_max * 1000, 3),
+                "espera_p95_ms": round(recientes[int(len(recientes) * 0.95) - 1] * 1000, 3) if recientes else 0,
+            }
+
+
+def pool_medido(pool_cls):
+    """Subclase de ``pool_cls`` que mide la espera de cada checkout.
+
+    Las métricas viven en la clase para sobrevivir a ``pool.recreate()``.
+    """
+    class PoolMedido(pool_cls):
+        metricas = MetricasPool()
+
+        def _do_get(self):
+            inicio = time.perf_counter()
+            try:
+                conexion = super()._do_get()
+            except PoolTimeoutError:
+                self.metricas.registrar(time.perf_counter() - inicio, timeout=True)
+                raise
+            self.metricas.registrar(time.perf_counter() - inicio)
+            return conexion
+
+    PoolMedido.__name__ = f"{pool_cls.__name__}Medido"
+    return PoolMedido
+
+
+def repartir_pool(con_async: bool) -> tuple:
+    """((tamaño, overflow) del engine síncrono, (tamaño, overflow) del asíncrono).
+
+    Sin engine asíncrono el síncrono recibe todo el pool."""
+    if not con_async:
+        return (DB_POOL_SIZE, DB_MAX_OVERFLOW), (0, 0)
+    # pool_size=0 en QueuePool significa "sin límite": cada uno tiene al menos una
+    tamano_async = max(1, min(DB_POOL_SIZE - 1, round(DB_POOL_SIZE * DB_POOL_PARTE_ASYNC)))
+    overflow_async = round(DB_MAX_OVERFLOW * DB_POOL_PARTE_ASYNC)
+    return ((max(1, DB_POOL_SIZE - tamano_async), DB_MAX_OVERFLOW - overflow_async),
+            (tamano_async, overflow_async))
+
+
+def opciones_pool(pool_cls, tamano: int = DB_POOL_SIZE, overflow: int = DB_MAX_OVERFLOW) -> dict:
+    """Argumentos de create_engine / create_async_engine para el pool configurado."""
+    return {
+        "poolclass": pool_medido(pool_cls),
+        "pool_size": tamano,
+        "max_overflow": overflow,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def estado_pool(engine) -> dict:
+    """Conexiones en uso, overflow y esperas del pool de un engine (síncrono)."""
+    pool = engine.pool
+    estado = {
+        "pool": type(pool).__name__,
+        "tamano": pool.size(),
+        "max_overflow": pool._max_overflow,
+        "en_uso": pool.checkedout(),
+        "libres": pool.checkedin(),
+        "overflow": max(0, pool.overflow()),
+    }
+    if isinstance(getattr(pool, "metricas", None), MetricasPool):
+        estado.update(pool.metricas.resumen())
+    return estado
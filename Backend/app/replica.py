@@ -0,0 +1,169 @@
+"""Enrutamiento de lecturas a una réplica de la base de datos.
+
+Los reportes (/reportes/*), la búsqueda del padrón y el mapa público leen con
+``get_db_lectura`` / ``get_async_db_lectura``. Si DATABASE_REPLICA_URL está
+definida esas sesiones van a la réplica, salvo que:
+- la réplica no responda: se usa la primaria y no se vuelve a intentar
+  durante REPLICA_REINTENTO_SEGUNDOS (30);
+- el usuario de la petición haya hecho commit de una escritura en los últimos
+  LECTURA_PROPIA_SEGUNDOS (10): la réplica puede ir atrasada y no mostrarle
+  su propio cambio ("read-your-writes").
+
+Sin réplica configurada las dependencias equivalen a get_db / get_async_db.
+Las escrituras recientes se recuerdan por proceso.
+"""
+import logging
+import os
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import Request
+from jose import JWTError, jwt
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from . import database
+from .cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+LECTURA_PROPIA_SEGUNDOS = float(os.getenv("LECTURA_PROPIA_SEGUNDOS", "10"))
+REPLICA_REINTENTO_SEGUNDOS = float(os.getenv("REPLICA_REINTENTO_SEGUNDOS", "30"))
+
+# Usuario (sub del token) de la petición en curso; lo fija get_current_user
+usuario_en_curso: ContextVar[Optional[str]] = ContextVar("usuario_en_curso", default=None)
+
+_escrituras_recientes = TTLCache(ttl=LECTURA_PROPIA_SEGUNDOS, maxsize=10000)
+_replica_caida_hasta = 0.0
+
+
+def _usuario_de(request: Request) -> Optional[str]:
+    """sub del token Bearer, sin verificar la firma.
+
+    Solo decide entre réplica y primaria; la autenticación la hace
+    get_current_user. Un token falso a lo sumo manda la lectura a la primaria.
+    """
+    autorizacion = request.headers.get("authorization", "")
+    if not autorizacion.lower().startswith("bearer "):
+        return None
+    try:
+        return jwt.get_unverified_claims(autorizacion[7:]).get("sub")
+    except JWTError:
+        return None
+
+
+def marcar_replica_caida(error):
+    global _replica_caida_hasta
+    _replica_caida_hasta = time.monotonic() + REPLICA_REINTENTO_SEGUNDOS
+    logger.warning(f"Réplica no disponible ({error}); lecturas a la primaria por {REPLICA_REINTENTO_SEGUNDOS:.0f} s")
+
+
+def usar_replica(usuario: Optional[str] = None) -> bool:
+    if database.ReplicaSessionLocal is None or time.monotonic() < _replica_caida_hasta:
+        return False
+    return usuario is None or _escrituras_recientes.get(usuario) is None
+
+
+def sesion_lectura(usuario: Optional[str] = None):
+    """Session síncrona para consultas de solo lectura (réplica o primaria)."""
+    if usar_replica(usuario):
+        db = database.ReplicaSessionLocal()
+        try:
+            db.connection()
+            return db
+        except DBAPIError as e:
+            db.close()
+            marcar_replica_caida(e)
+    return database.SessionLocal()
+
+
+def get_db_lectura(request: Request):
+    db = sesion_lectura(_usuario_de(request))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db_lectura(request: Request):
+    usuario = _usuario_de(request)
+    if database.AsyncSessionLocal is None:
+        db = sesion_lectura(usuario)
+        try:
+            yield database.SesionSincrona(db)
+        finally:
+            db.close()
+        return
+    if usar_replica(usuario) and database.AsyncReplicaSessionLocal is not None:
+        db = database.AsyncReplicaSessionLocal()
+        try:
+            await db.connection()
+        except DBAPIError as e:
+            await db.close()
+            marcar_replica_caida(e)
+        else:
+            try:
+                yield db
+            finally:
+                await db.close()
+            return
+    async with database.AsyncSessionLocal() as db:
+        yield db
+
+
+def sesion_en_replica(db) -> bool:
+    """True si la sesión (Session, AsyncSession o SesionSincrona) lee de la réplica."""
+    if database.replica_engine is None or db is None:
+        return False
+    db = getattr(db, "sync_session", db)
+    if not isinstance(db, Session):
+        return False
+    bind = db.get_bind()
+    return bind is database.replica_engine or (
+        database.async_replica_engine is not None and bind is database.async_replica_engine.sync_engine
+    )
+
+
+# --- Escrituras recientes y caídas de la réplica ----------------------------
+
+def _marcar_escritura(session):
+    session.info["escritura"] = True
+
+
+def _antes_de_flush(session, flush_context, instances):
+    if session.new or session.dirty or session.deleted:
+        _marcar_escritura(session)
+
+
+def _ejecucion_orm(orm_execute_state):
+    # query.update() / query.delete() en bloque no pasan por el flush
+    if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+        _marcar_escritura(orm_execute_state.session)
+
+
+def _despues_de_commit(session):
+    if session.info.pop("escritura", False):
+        usuario = usuario_en_curso.get()
+        if usuario is not None:
+            _escrituras_recientes.set(usuario, True)
+
+
+def _despues_de_rollback(session, previous_transaction):
+    session.info.pop("escritura", None)
+
+
+def _error_en_replica(contexto):
+    if contexto.is_disconnect:
+        marcar_replica_caida(contexto.original_exception)
+
+
+if database.replica_engine is not None:
+    event.listen(Session, "before_flush", _antes_de_flush)
+    event.listen(Session, "do_orm_execute", _ejecucion_orm)
+    event.listen(Session, "after_commit", _despues_de_commit)
+    event.listen(Session, "after_soft_rollback", _despues_de_rollback)
+    event.listen(database.replica_engine, "handle_error", _error_en_replica)
+    if database.async_replica_engine is not None:
+        event.listen(database.async_replica_engine.sync_engine, "handle_error", _error_en_replica)
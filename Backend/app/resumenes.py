@@ -0,0 +1,205 @@
+"""Resúmenes diarios congelados para reportes históricos.
+
+Un evento que ya pasó no cambia, así que sus métricas se calculan una sola vez
+y se guardan en ``resumen_eventos``; los reportes históricos leen esa tabla y
+solo calculan en vivo los eventos que todavía no tienen resumen (los del día).
+``resumen_lideres_diario`` guarda, por día, los contadores de red de cada líder
+y la asistencia de sus personas a los eventos de ese día.
+
+El trabajo corre cada noche (ver ``programar_resumenes``), bajo demanda desde
+POST /reportes/resumenes/generar, o desde cron con ``python -m app.resumenes``.
+Cada worker de uvicorn agenda su propia corrida: un advisory lock en
+PostgreSQL, o BEGIN IMMEDIATE en SQLite, hace que se ejecuten de una en una, y
+la que llega después ve que el resumen de líderes de ayer ya existe y no hace
+nada más (POST /reportes/resumenes/generar sí vuelve a buscar eventos
+pendientes). En todas las bases los INSERT ignoran las filas que otro worker ya
+guardó. Si el trabajo no corrió algunos días, la siguiente corrida llena
+el resumen de líderes de cada día faltante desde el último guardado.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+
+from .database import insert_sin_conflicto
+from .metricas_eventos import calcular_metricas, ids_de
+from .models import Asistencia as AsistenciaModel
+from .models import ContadorRed as ContadorRedModel
+from .models import Evento as EventoModel
+from .models import Persona as PersonaModel
+from .models import ResumenEvento as ResumenEventoModel
+from .models import ResumenLiderDiario as ResumenLiderDiarioModel
+
+logger = logging.getLogger(__name__)
+
+RESUMENES_NOCTURNOS = os.getenv("RESUMENES_NOCTURNOS", "1") == "1"
+RESUMENES_HORA_UTC = int(os.getenv("RESUMENES_HORA_UTC", "9"))  # 3:00 en hora del centro de México
+
+# Clave del pg_advisory_xact_lock (cualquier entero fijo de 64 bits)
+LOCK_RESUMENES = 7305202402
+
+CAMPOS_METRICAS = ["asignados", "registros", "asistieron", "movilizados", "movilizados_asistieron"]
+
+
+def _inicio_del_dia(ahora: datetime) -> datetime:
+    return datetime.combine(ahora.date(), time.min)
+
+
+def _resumir_eventos(db: Session, corte: datetime, recalcular: bool) -> int:
+    pendientes = select(EventoModel.id).where(EventoModel.fecha < corte)
+    if recalcular:
+        db.query(ResumenEventoModel).delete(synchronize_session=False)
+    else:
+        pendientes = pendientes.where(EventoModel.id.not_in(select(ResumenEventoModel.id_evento)))
+
+    fechas = dict(db.execute(pendientes.add_columns(EventoModel.fecha)).all())
+    if not fechas:
+        return 0
+    metricas = calcular_metricas(db, pendientes)
+    db.execute(insert_sin_conflicto(db.connection(), ResumenEventoModel.__table__), [
+        {"id_evento": id_evento, "fecha_evento": fecha, **{c: metricas[id_evento][c] for c in CAMPOS_METRICAS}}
+        for id_evento, fecha in fechas.items()
+    ])
+    return len(fechas)
+
+
+def _resumir_lideres_dia(db: Session, dia, contadores: list) -> int:
+    inicio = datetime.combine(dia, time.min)
+    filas = {
+        c.id_usuario: {
+            "fecha": dia, "id_usuario": c.id_usuario, "personas_directas": c.personas_directas,
+            "personas_red": c.personas_red, "lideres_red": c.lideres_red, "asistencias": 0, "movilizados": 0,
+        }
+        for c in contadores
+    }
+    asistencias_dia = db.query(
+        PersonaModel.id_lider_responsable,
+        func.count(AsistenciaModel.id),
+        func.coalesce(func.sum(case((AsistenciaModel.movilizado == True, 1), else_=0)), 0),
+    ).join(
+        PersonaModel, PersonaModel.id == AsistenciaModel.id_persona
+    ).join(
+        EventoModel, EventoModel.id == AsistenciaModel.id_evento
+    ).filter(
+        AsistenciaModel.asistio == True,
+        EventoModel.fecha >= inicio,
+        EventoModel.fecha < inicio + timedelta(days=1),
+    ).group_by(PersonaModel.id_lider_responsable).all()
+    for id_lider, asistencias, movilizados in asistencias_dia:
+        if id_lider in filas:
+            filas[id_lider]["asistencias"] = asistencias
+            filas[id_lider]["movilizados"] = int(movilizados)
+
+    if filas:
+        db.execute(insert_sin_conflicto(db.connection(), ResumenLiderDiarioModel.__table__), list(filas.values()))
+    return len(filas)
+
+
+def _resumir_lideres(db: Session, corte: datetime, recalcular: bool) -> int:
+    """Resumen de líderes de ayer y de los días sin resumen desde el último guardado.
+
+    La asistencia es la de cada día; los totales de red (ContadorRed) son los
+    del momento en que corre el trabajo, porque no hay historial de la red:
+    en un día recuperado tarde son los del corte (``fecha_corte``)."""
+    ayer = (corte - timedelta(days=1)).date()
+    if recalcular:
+        db.query(ResumenLiderDiarioModel).filter(ResumenLiderDiarioModel.fecha == ayer).delete(synchronize_session=False)
+        dias = [ayer]
+    else:
+        ultimo = db.query(func.max(ResumenLiderDiarioModel.fecha)).scalar()
+        desde = ultimo + timedelta(days=1) if ultimo is not None else ayer
+        dias = [desde + timedelta(days=n) for n in range((ayer - desde).days + 1)]
+    if not dias:
+        return 0
+
+    contadores = db.query(ContadorRedModel).all()
+    return sum(_resumir_lideres_dia(db, dia, contadores) for dia in dias)
+
+
+def _bloquear(db: Session):
+    """Hasta el commit: otro worker espera y luego ya no encuentra pendientes."""
+    conn = db.connection()
+    if conn.dialect.name == "postgresql":
+        conn.execute(select(func.pg_advisory_xact_lock(LOCK_RESUMENES)))
+    elif conn.dialect.name == "sqlite" and not conn.connection.dbapi_connection.in_transaction:
+        # Toma el candado de escritura antes de leer qué falta (si ya hay una
+        # transacción de escritura abierta, ya lo tiene)
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def _ya_corrio(db: Session, corte: datetime) -> bool:
+    """True si el resumen de líderes de ayer ya está guardado (otro worker ya corrió hoy)."""
+    ultimo = db.query(func.max(ResumenLiderDiarioModel.fecha)).scalar()
+    return ultimo is not None and ultimo >= (corte - timedelta(days=1)).date()
+
+
+def generar_resumenes(db: Session, recalcular: bool = False, ahora: datetime | None = None,
+                      una_vez_al_dia: bool = False) -> dict:
+    """Congela los eventos anteriores a hoy y el resumen de líderes de ayer
+    (y de los días anteriores que falten).
+
+    Sin ``recalcular`` solo agrega lo que falta; con ``recalcular`` rehace todos
+    los resúmenes de eventos y el de líderes de ayer. Con ``una_vez_al_dia``
+    (la corrida agendada) no hace nada si el de líderes de ayer ya está
+    guardado. No hace commit.
+    """
+    corte = _inicio_del_dia(ahora or datetime.utcnow())
+    _bloquear(db)
+    if una_vez_al_dia and not recalcular and _ya_corrio(db, corte):
+        return {"eventos": 0, "lideres": 0}
+    return {
+        "eventos": _resumir_eventos(db, corte, recalcular),
+        "lideres": _resumir_lideres(db, corte, recalcular),
+    }
+
+
+def metricas_historicas(db: Session, query) -> dict:
+    """Métricas (forma de calcular_metricas) para los eventos de una consulta ORM.
+
+    Lee ``resumen_eventos`` y calcula en vivo solo los eventos sin resumen.
+    """
+    congeladas = db.query(ResumenEventoModel).filter(ResumenEventoModel.id_evento.in_(ids_de(query))).all()
+    sin_resumen = query.filter(EventoModel.id.not_in(select(ResumenEventoModel.id_evento)))
+    metricas = calcular_metricas(db, ids_de(sin_resumen))
+    for r in congeladas:
+        metricas[r.id_evento].update({c: getattr(r, c) for c in CAMPOS_METRICAS})
+    return metricas
+
+
+def ejecutar_resumenes(recalcular: bool = False) -> dict:
+    from .database import SessionLocal
+    db = SessionLocal()
+    try:
+        resultado = generar_resumenes(db, recalcular=recalcular, una_vez_al_dia=True)
+        db.commit()
+        logger.info(f"Resúmenes generados: {resultado}")
+        return resultado
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+async def programar_resumenes():
+    """Tarea de fondo: corre los resúmenes al arrancar y cada día a RESUMENES_HORA_UTC."""
+    while True:
+        try:
+            await asyncio.to_thread(ejecutar_resumenes)
+        except Exception as e:
+            logger.error(f"Error generando resúmenes: {e}")
+        ahora = datetime.utcnow()
+        siguiente = datetime.combine(ahora.date(), time(hour=RESUMENES_HORA_UTC))
+        if siguiente <= ahora:
+            siguiente += timedelta(days=1)
+        await asyncio.sleep((siguiente - ahora).total_seconds())
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Genera los resúmenes diarios de reportes")
+    parser.add_argument("--recalcular", action="store_true")
+    print(ejecutar_resumenes(recalcular=parser.parse_args().recalcular))
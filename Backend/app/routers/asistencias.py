@@ -1,12 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from datetime import datetime
 import logging
 
-from ..database import get_db
-from ..auth import get_current_active_user
-from ..models import Usuario as UsuarioModel
+from ..database import get_async_db
+from ..auth import get_current_active_user_async
+from ..jerarquia import subordinados_select
 from ..models import Evento as EventoModel
 from ..models import Persona as PersonaModel
 from ..models import Asistencia as AsistenciaModel
@@ -17,67 +18,54 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/asistencias", tags=["asistencias"])
 
 
-def _get_subordinate_ids(user_id, db):
-    subs = db.query(UsuarioModel).filter(
-        UsuarioModel.id_lider_superior == user_id, UsuarioModel.activo == True
-    ).all()
-    ids = [user_id]
-    for sub in subs:
-        ids.extend(_get_subordinate_ids(sub.id, db))
-    return ids
-
-
 @router.get("/", response_model=List[Asistencia])
 async def list_asistencias(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Usuario = Depends(get_current_active_user_async)
 ):
-    query = db.query(AsistenciaModel)
+    query = select(AsistenciaModel)
     if current_user.rol == "admin":
-        asistencias = query.offset(skip).limit(limit).all()
+        pass
     elif current_user.rol in ["lider_estatal", "lider_regional", "lider_municipal", "lider_zona"]:
-        ids = _get_subordinate_ids(current_user.id, db)
-        eventos_ids = db.query(EventoModel.id).filter(EventoModel.id_lider_organizador.in_(ids)).all()
-        eventos_ids = [e[0] for e in eventos_ids]
-        asistencias = query.filter(AsistenciaModel.id_evento.in_(eventos_ids)).offset(skip).limit(limit).all()
+        eventos_ids = select(EventoModel.id).filter(EventoModel.id_lider_organizador.in_(subordinados_select(current_user.id)))
+        query = query.filter(AsistenciaModel.id_evento.in_(eventos_ids))
     else:
-        eventos_ids = db.query(EventoModel.id).filter(EventoModel.id_lider_organizador == current_user.id).all()
-        eventos_ids = [e[0] for e in eventos_ids]
-        asistencias = query.filter(AsistenciaModel.id_evento.in_(eventos_ids)).offset(skip).limit(limit).all()
-    return asistencias
+        eventos_ids = select(EventoModel.id).filter(EventoModel.id_lider_organizador == current_user.id)
+        query = query.filter(AsistenciaModel.id_evento.in_(eventos_ids))
+    return (await db.scalars(query.offset(skip).limit(limit))).all()
 
 
 @router.get("/buscar/", response_model=List[Asistencia])
 async def buscar_asistencias(
     id_evento: int = None,
     id_persona: int = None,
-    db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Usuario = Depends(get_current_active_user_async)
 ):
-    query = db.query(AsistenciaModel)
+    query = select(AsistenciaModel)
     if id_evento:
         query = query.filter(AsistenciaModel.id_evento == id_evento)
     if id_persona:
         query = query.filter(AsistenciaModel.id_persona == id_persona)
-    return query.all()
+    return (await db.scalars(query)).all()
 
 
 @router.get("/buscar-por-clave/")
 async def buscar_asistencia_por_clave(
     clave_elector: str,
     id_evento: int,
-    db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Usuario = Depends(get_current_active_user_async)
 ):
-    persona = db.query(PersonaModel).filter(PersonaModel.clave_elector == clave_elector).first()
+    persona = await db.scalar(select(PersonaModel).filter(PersonaModel.clave_elector == clave_elector).limit(1))
     if not persona:
         raise HTTPException(status_code=404, detail="Persona no encontrada con esa clave elector")
-    asistencia = db.query(AsistenciaModel).filter(
+    asistencia = await db.scalar(select(AsistenciaModel).filter(
         AsistenciaModel.id_evento == id_evento,
         AsistenciaModel.id_persona == persona.id
-    ).first()
+    ).limit(1))
     return {
         "persona": {"id": persona.id, "nombre": persona.nombre, "clave_elector": persona.clave_elector},
         "asistencia": asistencia
@@ -87,10 +75,10 @@ async def buscar_asistencia_por_clave(
 @router.get("/{asistencia_id}", response_model=Asistencia)
 async def get_asistencia(
     asistencia_id: int,
-    db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Usuario = Depends(get_current_active_user_async)
 ):
-    asistencia = db.query(AsistenciaModel).filter(AsistenciaModel.id == asistencia_id).first()
+    asistencia = await db.get(AsistenciaModel, asistencia_id)
     if not asistencia:
         raise HTTPException(status_code=404, detail="Asistencia no encontrada")
     return asistencia
@@ -99,13 +87,13 @@ async def get_asistencia(
 @router.post("/", response_model=Asistencia)
 async def create_asistencia(
     asistencia: AsistenciaCreate,
-    db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Usuario = Depends(get_current_active_user_async)
 ):
     db_asistencia = AsistenciaModel(**asistencia.dict())
     db.add(db_asistencia)
-    db.commit()
-    db.refresh(db_asistencia)
+    await db.commit()
+    await db.refresh(db_asistencia)
     return db_asistencia
 
 
@@ -113,10 +101,10 @@ async def create_asistencia(
 async def update_asistencia(
     asistencia_id: int,
     asistencia_update: AsistenciaUpdate,
-    db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Usuario = Depends(get_current_active_user_async)
 ):
-    asistencia = db.query(AsistenciaModel).filter(AsistenciaModel.id == asistencia_id).first()
+    asistencia = await db.get(AsistenciaModel, asistencia_id)
     if not asistencia:
         raise HTTPException(status_code=404, detail="Asistencia no encontrada")
     update_data = asistencia_update.dict(exclude_unset=True)
@@ -124,47 +112,45 @@ async def update_asistencia(
         setattr(asistencia, field, value)
     # Sync to AsignacionMovilizacion
     if "asistio" in update_data:
-        asignacion = db.query(AsignacionMovilizacionModel).filter(
+        asignacion = await db.scalar(select(AsignacionMovilizacionModel).filter(
             AsignacionMovilizacionModel.id_evento == asistencia.id_evento,
             AsignacionMovilizacionModel.id_persona == asistencia.id_persona
-        ).first()
+        ).limit(1))
         if asignacion:
             asignacion.asistio = update_data["asistio"]
-    db.commit()
-    db.refresh(asistencia)
+    await db.commit()
+    await db.refresh(asistencia)
     return asistencia
 
 
 @router.delete("/{asistencia_id}", response_model=Asistencia)
 async def delete_asistencia(
     asistencia_id: int,
-    db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Usuario = Depends(get_current_active_user_async)
 ):
-    asistencia = db.query(AsistenciaModel).filter(AsistenciaModel.id == asistencia_id).first()
+    asistencia = await db.get(AsistenciaModel, asistencia_id)
     if not asistencia:
         raise HTTPException(status_code=404, detail="Asistencia no encontrada")
-    db.delete(asistencia)
-    db.commit()
+    await db.delete(asistencia)
+    await db.commit()
     return asistencia
 
 
 @router.post("/{asignacion_id}/checkin", response_model=Asistencia)
 async def checkin_asistencia(
     asignacion_id: int,
-    db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Usuario = Depends(get_current_active_user_async)
 ):
-    asignacion = db.query(AsignacionMovilizacionModel).filter(
-        AsignacionMovilizacionModel.id == asignacion_id
-    ).first()
+    asignacion = await db.get(AsignacionMovilizacionModel, asignacion_id)
     if not asignacion:
         raise HTTPException(status_code=404, detail="Asignacion no encontrada")
 
-    asistencia = db.query(AsistenciaModel).filter(
+    asistencia = await db.scalar(select(AsistenciaModel).filter(
         AsistenciaModel.id_evento == asignacion.id_evento,
         AsistenciaModel.id_persona == asignacion.id_persona
-    ).first()
+    ).limit(1))
 
     if asistencia:
         asistencia.asistio = True
@@ -181,6 +167,6 @@ async def checkin_asistencia(
         db.add(asistencia)
 
     asignacion.asistio = True
-    db.commit()
-    db.refresh(asistencia)
+    await db.commit()
+    await db.refresh(asistencia)
     return asistencia
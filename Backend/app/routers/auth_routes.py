@@ -1,7 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from datetime import timedelta
 import logging
 
 try:
@@ -14,8 +13,13 @@ except ImportError:
     RATE_LIMITING = False
 
 from ..database import get_db
-from ..auth import authenticate_user, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
-from ..schemas import Token, Login
+from ..auth import (
+    authenticate_user_async, crear_tokens, renovar_tokens, revocar_tokens, invalidar_usuario,
+    get_current_active_user,
+)
+from ..models import Usuario as UsuarioModel
+from ..permisos import invalidar_permisos
+from ..schemas import Token, Login, RefreshTokenRequest
 
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["auth"])
@@ -28,7 +32,7 @@ async def login_for_access_token(
     db: Session = Depends(get_db)
 ):
     try:
-        user = authenticate_user(db, form_data.username, form_data.password)
+        user = await authenticate_user_async(db, form_data.username, form_data.password)
     except Exception as e:
         logger.error(f"Error en authenticate_user: {type(e).__name__}: {e}")
         raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
@@ -39,12 +43,8 @@ async def login_for_access_token(
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
-    )
     logger.info(f"Login successful for: {user.email}")
-    return {"access_token": access_token, "token_type": "bearer"}
+    return crear_tokens(user)
 
 
 @router.options("/login")
@@ -58,16 +58,42 @@ async def login_json(
     login_data: Login,
     db: Session = Depends(get_db)
 ):
-    user = authenticate_user(db, login_data.identificador, login_data.password)
+    user = await authenticate_user_async(db, login_data.identificador, login_data.password)
     if not user:
         logger.warning(f"Login failed for: {login_data.identificador}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
         )
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
-    )
     logger.info(f"Login successful for: {user.email}")
-    return {"access_token": access_token, "token_type": "bearer"}
+    return crear_tokens(user)
+
+
+@router.post("/token/refresh", response_model=Token)
+async def refresh_access_token(
+    data: RefreshTokenRequest,
+    db: Session = Depends(get_db)
+):
+    """Canjea un refresh token por un access token nuevo, sin volver a verificar la contraseña."""
+    tokens = renovar_tokens(db, data.refresh_token)
+    if tokens is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token invalido o revocado",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return tokens
+
+
+@router.post("/token/revocar")
+async def revoke_my_tokens(
+    db: Session = Depends(get_db),
+    current_user: UsuarioModel = Depends(get_current_active_user)
+):
+    """Cierra todas las sesiones del usuario actual (access y refresh tokens)."""
+    revocar_tokens(db, current_user)
+    db.commit()
+    invalidar_usuario(current_user.email)
+    invalidar_permisos(current_user.id)
+    logger.info(f"Tokens revocados para: {current_user.email}")
+    return {"ok": True}
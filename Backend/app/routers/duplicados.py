@@ -8,6 +8,7 @@ import logging
 
 from ..database import get_db
 from ..auth import get_current_active_user
+from ..contadores_red import registrar_persona
 from ..models import (
     ProbableDuplicado as DupModel,
     Persona as PersonaModel,
@@ -205,8 +206,9 @@ async def resolver_duplicado(
         # Soft-delete a la persona perdedora
         id_perdedora = dup.id_persona_2 if id_persona_ganadora == dup.id_persona_1 else dup.id_persona_1
         perdedora = db.query(PersonaModel).filter(PersonaModel.id == id_perdedora).first()
-        if perdedora:
+        if perdedora and perdedora.activo:
             perdedora.activo = False
+            registrar_persona(db, perdedora.id_lider_responsable, -1)
 
         # Marcar otros pares pendientes con la misma perdedora como descartados
         db.query(DupModel).filter(
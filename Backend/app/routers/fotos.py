@@ -0,0 +1,73 @@
+import mimetypes
+import os
+import re
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, Response
+from starlette.concurrency import run_in_threadpool
+
+from ..almacen_fotos import CLAVE, almacen, extension
+from ..variantes_fotos import FORMATOS, TAMANOS, encolar_variantes
+
+router = APIRouter(tags=["fotos"])
+
+# El contenido de una URL nunca cambia (es el hash)
+CACHE_FOTOS = "public, max-age=31536000, immutable"
+# Original servido en lugar de una variante: la URL puede cambiar de contenido
+CACHE_SUSTITUTO = "no-cache"
+
+CLAVE_VARIANTE = re.compile(r"^([0-9a-f]{64})_(\w+)$")
+
+
+def _coincide_etag(if_none_match: str, etag: str) -> bool:
+    etiquetas = [e.strip().removeprefix("W/") for e in if_none_match.split(",")]
+    return "*" in etiquetas or etag in etiquetas
+
+
+def _tipo_por_contenido(ruta, datos) -> str:
+    """Tipo MIME de un original (su clave no lleva extensión) por sus primeros bytes."""
+    if datos is None:
+        with open(ruta, "rb") as f:
+            datos = f.read(16)
+    return mimetypes.guess_type("foto" + extension(datos))[0] or "application/octet-stream"
+
+
+async def _responder(clave: str, request: Request, tipo=None, cache: str = CACHE_FOTOS):
+    """La foto ``clave`` con ETag, If-None-Match y Range, o None si no está en el almacén.
+
+    Sin ``tipo`` se deduce del contenido."""
+    origen = almacen()
+    ruta = origen.ruta(clave)
+    if ruta is None and not await run_in_threadpool(origen.existe, clave):
+        return None
+    etag = f'"{clave}"'
+    cabeceras = {"ETag": etag, "Cache-Control": cache}
+    if _coincide_etag(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=cabeceras)
+    if ruta is not None:
+        # FileResponse atiende Range/If-Range y envía el archivo por partes
+        return FileResponse(ruta, media_type=tipo or _tipo_por_contenido(ruta, None), headers=cabeceras)
+    datos = await run_in_threadpool(origen.leer, clave)
+    return Response(datos, media_type=tipo or _tipo_por_contenido(None, datos), headers=cabeceras)
+
+
+@router.get("/fotos/{nombre}")
+async def servir_foto(nombre: str, request: Request):
+    """Foto del almacén (o una variante, /fotos/<hash>_mini.webp) con ETag, If-None-Match y Range."""
+    raiz, ext = os.path.splitext(nombre)
+    variante = CLAVE_VARIANTE.match(raiz)
+    tipo = mimetypes.guess_type(nombre)[0] or "application/octet-stream"
+    respuesta = None
+    if CLAVE.match(raiz):
+        respuesta = await _responder(raiz, request, tipo)
+    elif variante and variante.group(2) in TAMANOS and ext in FORMATOS:
+        respuesta = await _responder(nombre, request, tipo)
+        if respuesta is None:
+            # Variante que todavía no existe (foto anterior, recién subida o que no
+            # es una imagen legible): va el original y la variante se agenda
+            respuesta = await _responder(variante.group(1), request, cache=CACHE_SUSTITUTO)
+            if respuesta is not None:
+                encolar_variantes(variante.group(1))
+    if respuesta is None:
+        raise HTTPException(status_code=404, detail="Foto no encontrada")
+    return respuesta
@@ -8,10 +8,11 @@ import logging
 from jose import jwt
 
 from ..database import get_db
-from ..auth import get_current_active_user, get_password_hash
+from ..auth import get_current_active_user, get_password_hash_async
 from ..schemas import Usuario, Persona
 from ..models import Usuario as UsuarioModel, Persona as PersonaModel
 from ..config import INVITATION_SECRET, INVITATION_EXP_MINUTES
+from ..contadores_red import registrar_lider, registrar_persona
 
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["invitaciones"])
@@ -126,7 +127,7 @@ async def registro_invitacion(data: InvitacionRegistro, db: Session = Depends(ge
             suffix += 1
             candidate = f"{base}{suffix}"
 
-        hashed_password = get_password_hash(data.password)
+        hashed_password = await get_password_hash_async(data.password)
         db_user = UsuarioModel(
             username=candidate,
             nombre=data.nombre,
@@ -140,6 +141,8 @@ async def registro_invitacion(data: InvitacionRegistro, db: Session = Depends(ge
             id_lider_superior=payload["id_lider_superior"]
         )
         db.add(db_user)
+        db.flush()
+        registrar_lider(db, db_user.id, db_user.id_lider_superior)
         db.commit()
         db.refresh(db_user)
         logger.info(f"Usuario registrado por invitacion: {db_user.email}")
@@ -197,6 +200,7 @@ async def registro_persona_invitacion(data: PersonaInvitacionRegistro, db: Sessi
 
     db_persona = PersonaModel(**persona_data)
     db.add(db_persona)
+    registrar_persona(db, db_persona.id_lider_responsable)
     db.commit()
     db.refresh(db_persona)
     return db_persona
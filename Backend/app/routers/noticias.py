@@ -8,6 +8,7 @@ from ..auth import get_current_active_user, require_admin
 from ..schemas import Usuario
 from ..schemas_noticias import NoticiaResponse as Noticia, NoticiaCreate, NoticiaUpdate
 from ..models_noticias import Noticia as NoticiaModel
+from ..variantes_fotos import url_variante
 from ..models import Comentario as ComentarioModel, Usuario as UsuarioModel
 from ..schemas import Comentario, ComentarioCreate, ComentarioUpdate
 
@@ -97,6 +98,7 @@ async def obtener_noticias_banner(
                 "titulo": n.titulo,
                 "descripcion_corta": n.descripcion_corta or "",
                 "imagen_url": n.imagen_url,
+                "imagen_media": url_variante(n.imagen_url, "media"),
                 "imagenes": _json.loads(n.imagenes) if n.imagenes else [],
                 "categoria": n.categoria or "general",
                 "destacada": n.destacada or False,
@@ -7,7 +7,8 @@ import json
 from datetime import datetime
 
 from ..database import get_db
-from ..auth import get_current_active_user, require_admin
+from ..auth import get_current_active_user, require_admin, invalidar_usuario
+from ..permisos import configuracion_rol, obtener_permisos, invalidar_permisos, has_permission, WIDGETS_DASHBOARD_POR_DEFECTO
 from ..models import ConfiguracionPerfil as ConfiguracionPerfilModel
 from ..models import ConfiguracionDashboard as ConfiguracionDashboardModel
 from ..models import Usuario as UsuarioModel
@@ -77,66 +78,12 @@ async def obtener_opciones_menu():
 async def obtener_configuracion_perfil(
     rol: str,
     db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_active_user)
+    current_user: Usuario = Depends(has_permission("admin-perfiles"))
 ):
     """Obtener la configuración de permisos para un rol específico"""
-    if current_user.rol != "admin":
-        raise HTTPException(status_code=403, detail="Solo administradores pueden ver configuraciones de perfiles")
-
-    # Buscar configuración en la base de datos
-    configuracion_db = db.query(ConfiguracionPerfilModel).filter(ConfiguracionPerfilModel.rol == rol).first()
-
-    if configuracion_db:
-        return {
-            "rol": rol,
-            "configuracion": {
-                "opciones_web": json.loads(configuracion_db.opciones_web),
-                "opciones_app": json.loads(configuracion_db.opciones_app)
-            }
-        }
-
-    # Configuraciones por defecto si no existe en BD
-    configuraciones_por_defecto = {
-        "admin": {
-            "opciones_web": ["dashboard", "usuarios", "personas", "eventos", "eventos-historicos", "movilizacion", "reportes", "estructura-red", "checkin", "perfil", "admin-perfiles", "admin-database", "seguimiento", "noticias", "reportes_ciudadanos", "seguimiento_reportes"],
-            "opciones_app": ["dashboard", "register", "reassign", "pase-lista", "movilizacion", "estructura-red", "eventos-historicos", "reportes", "noticias", "reportes_ciudadanos", "seguimiento_reportes", "seguimiento", "perfil"]
-        },
-        "presidente": {
-            "opciones_web": ["dashboard", "personas", "eventos", "eventos-historicos", "movilizacion", "reportes", "estructura-red", "checkin", "perfil", "seguimiento", "noticias", "reportes_ciudadanos"],
-            "opciones_app": ["dashboard", "register", "reassign", "estructura-red", "pase-lista", "eventos-historicos", "movilizacion", "reportes", "perfil", "seguimiento", "movilizador-seguimiento", "noticias"]
-        },
-        "lider_estatal": {
-            "opciones_web": ["dashboard", "personas", "eventos", "eventos-historicos", "movilizacion", "reportes", "estructura-red", "checkin", "perfil", "seguimiento", "noticias", "reportes_ciudadanos"],
-            "opciones_app": ["dashboard", "register", "reassign", "estructura-red", "pase-lista", "eventos-historicos", "movilizacion", "reportes", "perfil", "seguimiento", "movilizador-seguimiento", "noticias"]
-        },
-        "lider_regional": {
-            "opciones_web": ["dashboard", "personas", "eventos", "eventos-historicos", "movilizacion", "reportes", "estructura-red", "checkin", "perfil", "noticias"],
-            "opciones_app": ["dashboard", "register", "reassign", "estructura-red", "pase-lista", "eventos-historicos", "movilizacion", "reportes", "perfil", "movilizador-seguimiento", "noticias"]
-        },
-        "lider_municipal": {
-            "opciones_web": ["dashboard", "personas", "eventos", "eventos-historicos", "movilizacion", "reportes", "estructura-red", "checkin", "perfil", "seguimiento", "noticias", "reportes_ciudadanos"],
-            "opciones_app": ["dashboard", "register", "reassign", "estructura-red", "pase-lista", "eventos-historicos", "movilizacion", "reportes", "perfil", "seguimiento", "movilizador-seguimiento", "noticias"]
-        },
-        "lider_zona": {
-            "opciones_web": ["dashboard", "personas", "eventos", "eventos-historicos", "movilizacion", "reportes", "estructura-red", "checkin", "perfil", "noticias"],
-            "opciones_app": ["dashboard", "register", "reassign", "estructura-red", "pase-lista", "eventos-historicos", "movilizacion", "reportes", "perfil", "movilizador-seguimiento", "noticias"]
-        },
-        "capturista": {
-            "opciones_web": ["dashboard", "personas", "eventos", "checkin", "perfil", "noticias"],
-            "opciones_app": ["dashboard", "register", "pase-lista", "perfil", "noticias"]
-        },
-        "ciudadano": {
-            "opciones_web": ["dashboard", "noticias", "reportes_ciudadanos", "perfil"],
-            "opciones_app": ["dashboard", "noticias", "reportes_ciudadanos", "perfil"]
-        }
-    }
-
     return {
         "rol": rol,
-        "configuracion": configuraciones_por_defecto.get(rol, {
-            "opciones_web": ["dashboard", "perfil"],
-            "opciones_app": ["dashboard", "perfil"]
-        })
+        "configuracion": configuracion_rol(db, rol)["opciones"]
     }
 
 
@@ -146,75 +93,10 @@ async def obtener_mi_configuracion(
     db: Session = Depends(get_db)
 ):
     """Obtener la configuración de permisos del usuario actual"""
-    # 1. Primero: override personal del usuario (opciones_app_usuario)
-    if current_user.opciones_app_usuario:
-        opciones_app_personales = json.loads(current_user.opciones_app_usuario)
-        # Obtener opciones_web del rol
-        config_rol = db.query(ConfiguracionPerfilModel).filter(ConfiguracionPerfilModel.rol == current_user.rol).first()
-        opciones_web = json.loads(config_rol.opciones_web) if config_rol else []
-        return {
-            "rol": current_user.rol,
-            "configuracion": {
-                "opciones_web": opciones_web,
-                "opciones_app": opciones_app_personales,
-                "es_override_usuario": True
-            }
-        }
-
-    # 2. Segundo: configuración guardada por rol en BD
-    configuracion_db = db.query(ConfiguracionPerfilModel).filter(ConfiguracionPerfilModel.rol == current_user.rol).first()
-
-    if configuracion_db:
-        return {
-            "rol": current_user.rol,
-            "configuracion": {
-                "opciones_web": json.loads(configuracion_db.opciones_web),
-                "opciones_app": json.loads(configuracion_db.opciones_app)
-            }
-        }
-
-    # Configuraciones por defecto si no existe en BD
-    configuraciones_por_defecto = {
-        "admin": {
-            "opciones_web": ["dashboard", "usuarios", "personas", "eventos", "eventos-historicos", "movilizacion", "reportes", "estructura-red", "checkin", "perfil", "admin-perfiles", "admin-database", "seguimiento", "noticias", "reportes_ciudadanos", "seguimiento_reportes"],
-            "opciones_app": ["dashboard", "register", "reassign", "pase-lista", "movilizacion", "estructura-red", "eventos-historicos", "reportes", "noticias", "reportes_ciudadanos", "seguimiento_reportes", "seguimiento", "perfil"]
-        },
-        "presidente": {
-            "opciones_web": ["dashboard", "personas", "eventos", "eventos-historicos", "movilizacion", "reportes", "estructura-red", "checkin", "perfil", "seguimiento", "noticias", "reportes_ciudadanos"],
-            "opciones_app": ["dashboard", "register", "reassign", "estructura-red", "pase-lista", "eventos-historicos", "movilizacion", "reportes", "perfil", "seguimiento", "movilizador-seguimiento", "noticias"]
-        },
-        "lider_estatal": {
-            "opciones_web": ["dashboard", "personas", "eventos", "eventos-historicos", "movilizacion", "reportes", "estructura-red", "checkin", "perfil", "seguimiento", "noticias", "reportes_ciudadanos"],
-            "opciones_app": ["dashboard", "register", "reassign", "estructura-red", "pase-lista", "eventos-historicos", "movilizacion", "reportes", "perfil", "seguimiento", "movilizador-seguimiento", "noticias"]
-        },
-        "lider_regional": {
-            "opciones_web": ["dashboard", "personas", "eventos", "eventos-historicos", "movilizacion", "reportes", "estructura-red", "checkin", "perfil", "noticias"],
-            "opciones_app": ["dashboard", "register", "reassign", "estructura-red", "pase-lista", "eventos-historicos", "movilizacion", "reportes", "perfil", "movilizador-seguimiento", "noticias"]
-        },
-        "lider_municipal": {
-            "opciones_web": ["dashboard", "personas", "eventos", "eventos-historicos", "movilizacion", "reportes", "estructura-red", "checkin", "perfil", "seguimiento", "noticias", "reportes_ciudadanos"],
-            "opciones_app": ["dashboard", "register", "reassign", "estructura-red", "pase-lista", "eventos-historicos", "movilizacion", "reportes", "perfil", "seguimiento", "movilizador-seguimiento", "noticias"]
-        },
-        "lider_zona": {
-            "opciones_web": ["dashboard", "personas", "eventos", "eventos-historicos", "movilizacion", "reportes", "estructura-red", "checkin", "perfil", "noticias"],
-            "opciones_app": ["dashboard", "register", "reassign", "estructura-red", "pase-lista", "eventos-historicos", "movilizacion", "reportes", "perfil", "movilizador-seguimiento", "noticias"]
-        },
-        "capturista": {
-            "opciones_web": ["dashboard", "personas", "eventos", "checkin", "perfil", "noticias"],
-            "opciones_app": ["dashboard", "register", "pase-lista", "perfil", "noticias"]
-        },
-        "ciudadano": {
-            "opciones_web": ["dashboard", "noticias", "reportes_ciudadanos", "perfil"],
-            "opciones_app": ["dashboard", "noticias", "reportes_ciudadanos", "perfil"]
-        }
-    }
-
+    # Override personal (opciones_app_usuario) > configuración del rol en BD > valores por defecto
     return {
         "rol": current_user.rol,
-        "configuracion": configuraciones_por_defecto.get(current_user.rol, {
-            "opciones_web": ["dashboard", "perfil"],
-            "opciones_app": ["dashboard", "perfil"]
-        })
+        "configuracion": obtener_permisos(db, current_user).configuracion()
     }
 
 
@@ -223,12 +105,9 @@ async def actualizar_configuracion_perfil(
     rol: str,
     configuracion: dict,
     db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_active_user)
+    current_user: Usuario = Depends(require_admin)
 ):
     """Actualizar la configuración de permisos para un rol específico"""
-    if current_user.rol != "admin":
-        raise HTTPException(status_code=403, detail="Solo administradores pueden modificar configuraciones de perfiles")
-
     # Validar que el rol existe
     roles_validos = ["admin", "presidente", "lider_estatal", "lider_regional", "lider_municipal", "lider_zona", "capturista", "ciudadano"]
     if rol not in roles_validos:
@@ -256,6 +135,7 @@ async def actualizar_configuracion_perfil(
 
     db.commit()
     db.refresh(configuracion_db)
+    invalidar_permisos()
 
     return {
         "mensaje": f"Configuración actualizada para el rol {rol}",
@@ -267,12 +147,9 @@ async def actualizar_configuracion_perfil(
 @router.get("/perfiles/usuarios-por-rol")
 async def obtener_usuarios_por_rol(
     db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_active_user)
+    current_user: Usuario = Depends(has_permission("admin-perfiles"))
 ):
     """Obtener estadísticas de usuarios por rol"""
-    if current_user.rol != "admin":
-        raise HTTPException(status_code=403, detail="Solo administradores pueden ver estadísticas de usuarios")
-
     # Contar usuarios por rol
     usuarios_por_rol = db.query(
         UsuarioModel.rol,
@@ -290,12 +167,9 @@ async def obtener_usuarios_por_rol(
 @router.get("/perfiles/configuracion-dashboard")
 async def obtener_configuracion_dashboard(
     db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_active_user)
+    current_user: Usuario = Depends(has_permission("admin-perfiles"))
 ):
     """Obtener la configuración del dashboard para todos los roles"""
-    if current_user.rol != "admin":
-        raise HTTPException(status_code=403, detail="Solo administradores pueden ver configuraciones del dashboard")
-
     try:
         # Obtener configuraciones desde la base de datos
         configuraciones_db = db.query(ConfiguracionDashboardModel).all()
@@ -317,40 +191,7 @@ async def obtener_configuracion_dashboard(
         # Si no hay configuraciones en la BD, usar configuraciones por defecto
         if not configuraciones_dashboard:
             configuraciones_dashboard = {
-                "admin": {
-                    "widgets": ["total-personas", "total-eventos", "lideres-activos", "secciones-cubiertas",
-                                "movilizacion-vehiculos", "asistencias-tiempo-real", "eventos-historicos",
-                                "top-secciones", "top-lideres", "estructura-red"]
-                },
-                "presidente": {
-                    "widgets": ["total-personas", "total-eventos", "lideres-activos", "secciones-cubiertas",
-                                "movilizacion-vehiculos", "asistencias-tiempo-real", "eventos-historicos",
-                                "top-secciones", "top-lideres", "estructura-red"]
-                },
-                "lider_estatal": {
-                    "widgets": ["total-personas", "total-eventos", "lideres-activos", "secciones-cubiertas",
-                                "movilizacion-vehiculos", "asistencias-tiempo-real", "eventos-historicos",
-                                "top-secciones", "top-lideres", "estructura-red"]
-                },
-                "lider_regional": {
-                    "widgets": ["total-personas", "total-eventos", "secciones-cubiertas",
-                                "top-secciones", "top-lideres", "estructura-red"]
-                },
-                "lider_municipal": {
-                    "widgets": ["total-personas", "total-eventos", "lideres-activos", "secciones-cubiertas",
-                                "movilizacion-vehiculos", "asistencias-tiempo-real", "eventos-historicos",
-                                "top-secciones", "top-lideres", "estructura-red"]
-                },
-                "lider_zona": {
-                    "widgets": ["total-personas", "total-eventos", "secciones-cubiertas",
-                                "top-secciones", "top-lideres", "estructura-red"]
-                },
-                "capturista": {
-                    "widgets": ["total-personas", "total-eventos", "secciones-cubiertas"]
-                },
-                "ciudadano": {
-                    "widgets": ["total-eventos", "estructura-red"]
-                }
+                rol: {"widgets": widgets} for rol, widgets in WIDGETS_DASHBOARD_POR_DEFECTO.items()
             }
 
         logger.debug(f"Configuraciones del dashboard obtenidas: {configuraciones_dashboard}")
@@ -366,12 +207,9 @@ async def actualizar_configuracion_dashboard(
     rol: str,
     configuracion: dict = Body(...),
     db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_active_user)
+    current_user: Usuario = Depends(require_admin)
 ):
     """Actualizar la configuración del dashboard para un rol específico"""
-    if current_user.rol != "admin":
-        raise HTTPException(status_code=403, detail="Solo administradores pueden actualizar configuraciones del dashboard")
-
     # Validar que el rol existe
     roles_validos = ["admin", "presidente", "lider_estatal", "lider_regional", "lider_municipal", "lider_zona", "capturista", "ciudadano"]
     if rol not in roles_validos:
@@ -396,6 +234,7 @@ async def actualizar_configuracion_dashboard(
             logger.debug(f"Nueva configuración del dashboard creada para rol '{rol}': {configuracion}")
 
         db.commit()
+        invalidar_permisos()
 
         return {
             "mensaje": f"Configuración del dashboard actualizada para rol '{rol}'",
@@ -416,48 +255,10 @@ async def obtener_mi_configuracion_dashboard(
 ):
     """Obtener la configuración del dashboard para el usuario actual"""
     try:
-        # Obtener configuración desde la base de datos
-        config_db = db.query(ConfiguracionDashboardModel).filter(ConfiguracionDashboardModel.rol == current_user.rol).first()
-
-        if config_db:
-            # Parsear el JSON de widgets
-            try:
-                widgets = json.loads(config_db.widgets) if isinstance(config_db.widgets, str) else config_db.widgets
-            except (json.JSONDecodeError, TypeError):
-                widgets = []
-
-            configuracion = {
-                "rol": current_user.rol,
-                "widgets": widgets
-            }
-        else:
-            # Si no hay configuración en la BD, usar configuración por defecto
-            configuraciones_default = {
-                "admin": ["total-personas", "total-eventos", "lideres-activos", "secciones-cubiertas",
-                          "movilizacion-vehiculos", "asistencias-tiempo-real", "eventos-historicos",
-                          "top-secciones", "top-lideres", "estructura-red"],
-                "presidente": ["total-personas", "total-eventos", "lideres-activos", "secciones-cubiertas",
-                               "movilizacion-vehiculos", "asistencias-tiempo-real", "eventos-historicos",
-                               "top-secciones", "top-lideres", "estructura-red"],
-                "lider_estatal": ["total-personas", "total-eventos", "lideres-activos", "secciones-cubiertas",
-                                  "movilizacion-vehiculos", "asistencias-tiempo-real", "eventos-historicos",
-                                  "top-secciones", "top-lideres", "estructura-red"],
-                "lider_regional": ["total-personas", "total-eventos", "secciones-cubiertas",
-                                   "top-secciones", "top-lideres", "estructura-red"],
-                "lider_municipal": ["total-personas", "total-eventos", "lideres-activos", "secciones-cubiertas",
-                                    "movilizacion-vehiculos", "asistencias-tiempo-real", "eventos-historicos",
-                                    "top-secciones", "top-lideres", "estructura-red"],
-                "lider_zona": ["total-personas", "total-eventos", "secciones-cubiertas",
-                               "top-secciones", "top-lideres", "estructura-red"],
-                "capturista": ["total-personas", "total-eventos", "secciones-cubiertas"],
-                "ciudadano": ["total-eventos", "estructura-red"]
-            }
-
-            widgets = configuraciones_default.get(current_user.rol, [])
-            configuracion = {
-                "rol": current_user.rol,
-                "widgets": widgets
-            }
+        configuracion = {
+            "rol": current_user.rol,
+            "widgets": obtener_permisos(db, current_user).widgets
+        }
 
         logger.debug(f"Configuración del dashboard para {current_user.rol}: {configuracion}")
         return configuracion
@@ -555,6 +356,8 @@ async def actualizar_opciones_app_usuario(
         usuario.opciones_app_usuario = json.dumps(opciones)
 
     db.commit()
+    invalidar_usuario(usuario.email)
+    invalidar_permisos(usuario_id)
     return {"mensaje": "Opciones actualizadas", "usuario_id": usuario_id, "opciones_app": opciones}
 
 
@@ -574,4 +377,6 @@ async def resetear_opciones_app_usuario(
 
     usuario.opciones_app_usuario = None
     db.commit()
+    invalidar_usuario(usuario.email)
+    invalidar_permisos(usuario_id)
     return {"mensaje": "Opciones reseteadas al default del rol"}
@@ -1,14 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import and_, select
 from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel
-import requests
 import logging
 
-from ..database import get_db
-from ..auth import get_current_active_user
+from ..database import get_db, get_async_db
+from ..auth import get_current_active_user, get_current_active_user_async
+from ..contadores_red import registrar_persona, cambiar_persona
+from ..jerarquia import subordinados_select, superiores_select
 from ..models import Usuario as UsuarioModel
 from ..models import Persona as PersonaModel
 from ..models_padron import PadronElectoral
@@ -32,62 +34,54 @@ class GeocodificarResponse(BaseModel):
     direccion_formateada: str
 
 
-def _get_subordinate_ids(user_id, db):
-    subs = db.query(UsuarioModel).filter(
-        UsuarioModel.id_lider_superior == user_id, UsuarioModel.activo == True
-    ).all()
-    ids = [user_id]
-    for sub in subs:
-        ids.extend(_get_subordinate_ids(sub.id, db))
-    return ids
+LIDERES = ["lider_estatal", "lider_regional", "lider_municipal", "lider_zona", "lider"]
 
 
 def _is_in_hierarchy(persona, lider_id, db):
-    if persona.id_lider_responsable == lider_id:
-        return True
-    lider = db.query(UsuarioModel).filter(UsuarioModel.id == persona.id_lider_responsable).first()
-    if lider and lider.id_lider_superior:
-        return _is_in_hierarchy(persona, lider.id_lider_superior, db)
-    return False
+    """True si lider_id es el líder responsable de la persona o uno de sus superiores."""
+    return lider_id in {row[0] for row in db.execute(superiores_select(persona.id_lider_responsable))}
+
+
+async def _en_jerarquia(db: AsyncSession, persona, lider_id) -> bool:
+    return lider_id in (await db.scalars(superiores_select(persona.id_lider_responsable))).all()
 
 
 @router.get("/", response_model=List[Persona])
 async def list_personas(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Usuario = Depends(get_current_active_user_async)
 ):
-    query = db.query(PersonaModel).filter(PersonaModel.activo == True)
+    query = select(PersonaModel).options(selectinload(PersonaModel.lider_responsable)).filter(PersonaModel.activo == True)
     if current_user.rol == "admin":
-        personas = query.offset(skip).limit(limit).all()
-    elif current_user.rol in ["lider_estatal", "lider_regional", "lider_municipal", "lider_zona", "lider"]:
-        ids = _get_subordinate_ids(current_user.id, db)
-        personas = query.filter(PersonaModel.id_lider_responsable.in_(ids)).offset(skip).limit(limit).all()
+        pass
+    elif current_user.rol in LIDERES:
+        query = query.filter(PersonaModel.id_lider_responsable.in_(subordinados_select(current_user.id)))
     else:
-        personas = query.filter(PersonaModel.id_lider_responsable == current_user.id).offset(skip).limit(limit).all()
-    return personas
+        query = query.filter(PersonaModel.id_lider_responsable == current_user.id)
+    return (await db.scalars(query.offset(skip).limit(limit))).all()
 
 
 @router.get("/con-usuario-registro/", response_model=List[dict])
 async def list_personas_con_usuario_registro(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Usuario = Depends(get_current_active_user_async)
 ):
-    query = db.query(PersonaModel).filter(PersonaModel.activo == True)
+    query = select(PersonaModel).options(selectinload(PersonaModel.usuario_registro)).filter(PersonaModel.activo == True)
     if current_user.rol in ["admin", "presidente"]:
-        personas = query.offset(skip).limit(limit).all()
-    elif current_user.rol in ["lider_estatal", "lider_regional", "lider_municipal", "lider_zona", "lider"]:
-        ids = _get_subordinate_ids(current_user.id, db)
-        personas = query.filter(PersonaModel.id_lider_responsable.in_(ids)).offset(skip).limit(limit).all()
+        pass
+    elif current_user.rol in LIDERES:
+        query = query.filter(PersonaModel.id_lider_responsable.in_(subordinados_select(current_user.id)))
     else:
-        personas = query.filter(PersonaModel.id_usuario_registro == current_user.id).offset(skip).limit(limit).all()
+        query = query.filter(PersonaModel.id_usuario_registro == current_user.id)
+    personas = (await db.scalars(query.offset(skip).limit(limit))).all()
 
     resultado = []
     for persona in personas:
-        usuario_registro = db.query(UsuarioModel).filter(UsuarioModel.id == persona.id_usuario_registro).first()
+        usuario_registro = persona.usuario_registro
         resultado.append({
             "id": persona.id,
             "nombre": persona.nombre,
@@ -117,14 +111,16 @@ async def list_personas_con_usuario_registro(
 
 @router.get("/ubicaciones", response_model=List[PersonaUbicacion])
 async def obtener_ubicaciones_personas(
-    db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Usuario = Depends(get_current_active_user_async)
 ):
-    personas = db.query(PersonaModel).filter(
+    personas = await db.execute(select(
+        PersonaModel.id, PersonaModel.nombre, PersonaModel.latitud, PersonaModel.longitud
+    ).filter(
         PersonaModel.activo == True,
         PersonaModel.latitud.isnot(None),
         PersonaModel.longitud.isnot(None)
-    ).all()
+    ))
     return [PersonaUbicacion(id=p.id, nombre=p.nombre, latitud=p.latitud, longitud=p.longitud) for p in personas]
 
 
@@ -134,15 +130,14 @@ async def buscar_personas(
     seccion_electoral: str = None,
     colonia: str = None,
     id_lider_responsable: int = None,
-    db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Usuario = Depends(get_current_active_user_async)
 ):
-    query = db.query(PersonaModel).filter(PersonaModel.activo == True)
+    query = select(PersonaModel).options(selectinload(PersonaModel.lider_responsable)).filter(PersonaModel.activo == True)
     if current_user.rol in ["admin", "presidente"]:
         pass
-    elif current_user.rol in ["lider_estatal", "lider_regional", "lider_municipal", "lider_zona", "lider"]:
-        ids = _get_subordinate_ids(current_user.id, db)
-        query = query.filter(PersonaModel.id_lider_responsable.in_(ids))
+    elif current_user.rol in LIDERES:
+        query = query.filter(PersonaModel.id_lider_responsable.in_(subordinados_select(current_user.id)))
     else:
         query = query.filter(PersonaModel.id_usuario_registro == current_user.id)
 
@@ -154,19 +149,22 @@ async def buscar_personas(
         query = query.filter(PersonaModel.colonia == colonia)
     if id_lider_responsable:
         query = query.filter(PersonaModel.id_lider_responsable == id_lider_responsable)
-    return query.all()
+    return (await db.scalars(query)).all()
 
 
 @router.get("/{persona_id}", response_model=Persona)
 async def get_persona(
     persona_id: int,
-    db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Usuario = Depends(get_current_active_user_async)
 ):
-    persona = db.query(PersonaModel).filter(PersonaModel.id == persona_id, PersonaModel.activo == True).first()
+    persona = await db.scalar(
+        select(PersonaModel).options(selectinload(PersonaModel.lider_responsable))
+        .filter(PersonaModel.id == persona_id, PersonaModel.activo == True)
+    )
     if not persona:
         raise HTTPException(status_code=404, detail="Persona no encontrada")
-    if current_user.rol != "admin" and not _is_in_hierarchy(persona, current_user.id, db):
+    if current_user.rol != "admin" and not await _en_jerarquia(db, persona, current_user.id):
         raise HTTPException(status_code=403, detail="No tiene permisos para ver esta persona")
     return persona
 
@@ -220,6 +218,7 @@ async def create_persona(
     persona_data['id_usuario_registro'] = current_user.id
     db_persona = PersonaModel(**persona_data)
     db.add(db_persona)
+    registrar_persona(db, db_persona.id_lider_responsable)
     db.commit()
     db.refresh(db_persona)
 
@@ -245,8 +244,10 @@ async def update_persona(
         raise HTTPException(status_code=404, detail="Persona no encontrada")
     if current_user.rol != "admin" and not _is_in_hierarchy(persona, current_user.id, db):
         raise HTTPException(status_code=403, detail="No tiene permisos para modificar esta persona")
+    lider_anterior, activo_anterior = persona.id_lider_responsable, persona.activo
     for field, value in persona_update.dict(exclude_unset=True).items():
         setattr(persona, field, value)
+    cambiar_persona(db, lider_anterior, activo_anterior, persona.id_lider_responsable, persona.activo)
     db.commit()
     db.refresh(persona)
     return persona
@@ -264,6 +265,7 @@ async def deactivate_persona(
     if current_user.rol != "admin" and not _is_in_hierarchy(persona, current_user.id, db):
         raise HTTPException(status_code=403, detail="No tiene permisos para desactivar esta persona")
     persona.activo = False
+    registrar_persona(db, persona.id_lider_responsable, -1)
     db.commit()
     db.refresh(persona)
     return persona
@@ -273,22 +275,22 @@ async def deactivate_persona(
 async def list_personas_con_lider_info(
     skip: int = 0,
     limit: int = 500,
-    db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Usuario = Depends(get_current_active_user_async)
 ):
     """Lista personas incluyendo si su líder responsable está activo o no."""
-    query = db.query(PersonaModel).filter(PersonaModel.activo == True)
+    query = select(PersonaModel).options(selectinload(PersonaModel.lider_responsable)).filter(PersonaModel.activo == True)
     if current_user.rol == "admin":
-        personas = query.offset(skip).limit(limit).all()
-    elif current_user.rol in ["lider_estatal", "lider_regional", "lider_municipal", "lider_zona", "lider"]:
-        ids = _get_subordinate_ids(current_user.id, db)
-        personas = query.filter(PersonaModel.id_lider_responsable.in_(ids)).offset(skip).limit(limit).all()
+        pass
+    elif current_user.rol in LIDERES:
+        query = query.filter(PersonaModel.id_lider_responsable.in_(subordinados_select(current_user.id)))
     else:
-        personas = query.filter(PersonaModel.id_lider_responsable == current_user.id).offset(skip).limit(limit).all()
+        query = query.filter(PersonaModel.id_lider_responsable == current_user.id)
+    personas = (await db.scalars(query.offset(skip).limit(limit))).all()
 
     resultado = []
     for p in personas:
-        lider = db.query(UsuarioModel).filter(UsuarioModel.id == p.id_lider_responsable).first()
+        lider = p.lider_responsable
         resultado.append({
             "id": p.id,
             "nombre": p.nombre,
@@ -330,6 +332,7 @@ async def reubicar_persona(
 
     lider_anterior = persona.id_lider_responsable
     persona.id_lider_responsable = nuevo_lider_id
+    cambiar_persona(db, lider_anterior, True, nuevo_lider_id, True)
     db.commit()
     return {
         "ok": True,
@@ -357,6 +360,7 @@ async def geocodificar_direccion(request: GeocodificarRequest):
                 direccion_completa += f", {request.estado}"
             direccion_completa += ", Mexico"
 
+            import requests
             response = requests.get(
                 "https://nominatim.openstreetmap.org/search",
                 params={"q": direccion_completa, "format": "json", "limit": 1, "countrycodes": "mx"},
@@ -1,11 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from sqlalchemy import func, and_, select, union_all
 from datetime import datetime, timedelta
 import logging
+import os
 
+from ..cache import TTLCache
+from ..cache_reportes import cachear_reporte
 from ..database import get_db
-from ..auth import get_current_active_user
+from ..replica import get_db_lectura
+from ..auth import get_current_active_user, require_admin
+from ..contadores_red import reconstruir_contadores, verificar_contadores
+from ..jerarquia import obtener_arbol, invalidar_arbol, subordinados_select
+from ..exportacion import leer_en_lotes, respuesta_exportacion
+from ..metricas_eventos import calcular_metricas, ids_de
+from ..resumenes import generar_resumenes, metricas_historicas
 from ..schemas import ReportePersonas, ReporteEventos, Usuario
 from ..models import (
     Usuario as UsuarioModel,
@@ -14,76 +23,108 @@ from ..models import (
     Asistencia as AsistenciaModel,
     AsignacionMovilizacion as AsignacionMovilizacionModel,
     Vehiculo as VehiculoModel,
+    ContadorRed as ContadorRedModel,
+    ResumenEvento as ResumenEventoModel,
+    ResumenLiderDiario as ResumenLiderDiarioModel,
 )
 from ..models_padron import PadronElectoral
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/reportes", tags=["reportes"])
 
+METRICAS_MOVILIZACION_CACHE_TTL = float(os.getenv("METRICAS_MOVILIZACION_CACHE_TTL", "30"))
+
+_cache_metricas = TTLCache(ttl=METRICAS_MOVILIZACION_CACHE_TTL, maxsize=1)
+
 
 def get_subordinate_ids(user_id: int, db: Session):
-    subs = db.query(UsuarioModel).filter(
-        UsuarioModel.id_lider_superior == user_id, UsuarioModel.activo == True
-    ).all()
-    ids = [user_id]
-    for sub in subs:
-        ids.extend(get_subordinate_ids(sub.id, db))
-    return ids
+    return [row[0] for row in db.execute(subordinados_select(user_id)).all()]
+
+
+def _filtro_personas(current_user):
+    """Condiciones para limitar personas al alcance jerárquico del usuario."""
+    if current_user.rol == "admin":
+        return [PersonaModel.activo == True]
+    if current_user.rol in ["lider_estatal", "lider_regional", "lider_municipal", "lider_zona"]:
+        return [PersonaModel.activo == True, PersonaModel.id_lider_responsable.in_(subordinados_select(current_user.id))]
+    return [PersonaModel.activo == True, PersonaModel.id_lider_responsable == current_user.id]
+
+
+def _filtro_lideres(current_user):
+    """Condiciones sobre UsuarioModel equivalentes a _filtro_personas (líderes en alcance)."""
+    if current_user.rol == "admin":
+        return []
+    if current_user.rol in ["lider_estatal", "lider_regional", "lider_municipal", "lider_zona"]:
+        return [UsuarioModel.id.in_(subordinados_select(current_user.id))]
+    return [UsuarioModel.id == current_user.id]
 
 
 @router.get("/personas", response_model=ReportePersonas)
+@cachear_reporte("personas", "usuarios")
 async def reporte_personas(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_lectura),
     current_user: Usuario = Depends(get_current_active_user)
 ):
-    if current_user.rol == "admin":
-        personas = db.query(PersonaModel).filter(PersonaModel.activo == True).all()
-    elif current_user.rol in ["lider_estatal", "lider_regional", "lider_municipal", "lider_zona"]:
-        ids = get_subordinate_ids(current_user.id, db)
-        personas = db.query(PersonaModel).filter(
-            PersonaModel.id_lider_responsable.in_(ids), PersonaModel.activo == True
-        ).all()
-    else:
-        personas = db.query(PersonaModel).filter(
-            PersonaModel.id_lider_responsable == current_user.id, PersonaModel.activo == True
-        ).all()
+    filtro = _filtro_personas(current_user)
 
-    personas_por_seccion = {}
-    personas_por_colonia = {}
-    personas_por_lider = {}
+    def _conteo_por(columna):
+        return {
+            valor: total
+            for valor, total in db.query(columna, func.count(PersonaModel.id))
+            .filter(*filtro, columna.isnot(None), columna != "")
+            .group_by(columna)
+            .all()
+        }
+
+    personas_por_seccion = _conteo_por(PersonaModel.seccion_electoral)
+    personas_por_colonia = _conteo_por(PersonaModel.colonia)
 
-    for persona in personas:
-        if persona.seccion_electoral:
-            personas_por_seccion[persona.seccion_electoral] = personas_por_seccion.get(persona.seccion_electoral, 0) + 1
-        if persona.colonia:
-            personas_por_colonia[persona.colonia] = personas_por_colonia.get(persona.colonia, 0) + 1
-        lider = db.query(UsuarioModel).filter(UsuarioModel.id == persona.id_lider_responsable).first()
-        if lider:
-            personas_por_lider[lider.nombre] = personas_por_lider.get(lider.nombre, 0) + 1
+    total_personas = db.query(func.count(PersonaModel.id)).filter(*filtro).scalar()
+
+    # Personas activas por líder: las de líderes activos salen de contadores_red
+    # (sin agrupar personas). contadores_red no lleva a los líderes inactivos;
+    # solo el admin los tiene en su alcance (la red de un líder se corta en
+    # ellos), así que para él sus personas se agrupan aparte, en la misma consulta.
+    consulta = select(UsuarioModel.nombre, ContadorRedModel.personas_directas).join(
+        ContadorRedModel, ContadorRedModel.id_usuario == UsuarioModel.id
+    ).where(
+        UsuarioModel.activo == True, ContadorRedModel.personas_directas > 0, *_filtro_lideres(current_user)
+    )
+    if current_user.rol == "admin":
+        inactivos = select(UsuarioModel.nombre, func.count(PersonaModel.id)).join(
+            PersonaModel, PersonaModel.id_lider_responsable == UsuarioModel.id
+        ).where(UsuarioModel.activo.isnot(True), *filtro).group_by(UsuarioModel.id, UsuarioModel.nombre)
+        consulta = union_all(consulta, inactivos)
+    por_lider = db.execute(consulta).all()
+    personas_por_lider = {}
+    for nombre, total in por_lider:
+        personas_por_lider[nombre] = personas_por_lider.get(nombre, 0) + total
 
     return ReportePersonas(
-        total_personas=len(personas),
+        total_personas=total_personas,
         personas_por_seccion=personas_por_seccion,
         personas_por_colonia=personas_por_colonia,
         personas_por_lider=personas_por_lider
     )
 
 
+def _filtro_eventos_organizados(current_user):
+    """Condiciones para limitar eventos a los organizados dentro de la red del usuario."""
+    if current_user.rol == "admin":
+        return [EventoModel.activo == True]
+    if current_user.rol in ["lider_estatal", "lider_regional", "lider_municipal", "lider_zona"]:
+        return [EventoModel.activo == True, EventoModel.id_lider_organizador.in_(subordinados_select(current_user.id))]
+    return [EventoModel.activo == True, EventoModel.id_lider_organizador == current_user.id]
+
+
 @router.get("/eventos", response_model=ReporteEventos)
+@cachear_reporte("eventos", "asistencias", "usuarios")
 async def reporte_eventos(
     historicos: bool = False,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_lectura),
     current_user: Usuario = Depends(get_current_active_user)
 ):
-    query = db.query(EventoModel).filter(EventoModel.activo == True)
-
-    if current_user.rol == "admin":
-        pass
-    elif current_user.rol in ["lider_estatal", "lider_regional", "lider_municipal", "lider_zona"]:
-        ids = get_subordinate_ids(current_user.id, db)
-        query = query.filter(EventoModel.id_lider_organizador.in_(ids))
-    else:
-        query = query.filter(EventoModel.id_lider_organizador == current_user.id)
+    query = db.query(EventoModel).filter(*_filtro_eventos_organizados(current_user))
 
     ahora = datetime.utcnow()
     if historicos:
@@ -93,6 +134,7 @@ async def reporte_eventos(
         query = query.filter(EventoModel.fecha >= ahora - timedelta(hours=24))
         eventos = query.order_by(EventoModel.fecha.asc()).all()
 
+    metricas = calcular_metricas(db, ids_de(query)) if eventos else {}
     eventos_por_tipo = {}
     asistencias_por_evento = {}
     eficiencia_movilizacion = {}
@@ -100,13 +142,13 @@ async def reporte_eventos(
     for evento in eventos:
         if evento.tipo:
             eventos_por_tipo[evento.tipo] = eventos_por_tipo.get(evento.tipo, 0) + 1
-        asistencias = db.query(AsistenciaModel).filter(AsistenciaModel.id_evento == evento.id).all()
-        asistencias_por_evento[evento.nombre] = len(asistencias)
-        movilizados = sum(1 for a in asistencias if a.movilizado)
+        m = metricas[evento.id]
+        total, movilizados = m["registros"], m["movilizados"]
+        asistencias_por_evento[evento.nombre] = total
         eficiencia_movilizacion[evento.nombre] = {
-            "total": len(asistencias),
+            "total": total,
             "movilizados": movilizados,
-            "porcentaje": (movilizados / len(asistencias) * 100) if asistencias else 0
+            "porcentaje": (movilizados / total * 100) if total else 0
         }
 
     return ReporteEventos(
@@ -117,37 +159,30 @@ async def reporte_eventos(
     )
 
 
+def _filtro_eventos_historicos(current_user):
+    """Eventos pasados; para no-admin, solo aquellos con asistencia de personas de su red."""
+    filtro = [EventoModel.activo == True, EventoModel.fecha < datetime.utcnow() - timedelta(hours=24)]
+    if current_user.rol != "admin":
+        if current_user.rol in ["lider_estatal", "lider_regional", "lider_municipal", "lider_zona"]:
+            lideres = PersonaModel.id_lider_responsable.in_(subordinados_select(current_user.id))
+        else:
+            lideres = PersonaModel.id_lider_responsable == current_user.id
+        eventos_red = select(AsistenciaModel.id_evento).join(
+            PersonaModel, PersonaModel.id == AsistenciaModel.id_persona
+        ).where(lideres)
+        filtro.append(EventoModel.id.in_(eventos_red))
+    return filtro
+
+
 @router.get("/eventos-historicos")
+@cachear_reporte("eventos", "asistencias", "asignaciones_movilizacion", "personas", "usuarios")
 async def reporte_eventos_historicos(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_lectura),
     current_user: Usuario = Depends(get_current_active_user)
 ):
-    ahora = datetime.utcnow()
-    query = db.query(EventoModel).filter(EventoModel.activo == True)
-
-    if current_user.rol == "admin":
-        query = query.filter(EventoModel.fecha < ahora - timedelta(hours=24))
-    elif current_user.rol in ["lider_estatal", "lider_regional", "lider_municipal", "lider_zona"]:
-        ids_jerarquia = get_subordinate_ids(current_user.id, db)
-        personas_lider = db.query(PersonaModel).filter(PersonaModel.id_lider_responsable.in_(ids_jerarquia)).all()
-        ids_personas_lider = [p.id for p in personas_lider]
-        asistencias_lider = db.query(AsistenciaModel).filter(AsistenciaModel.id_persona.in_(ids_personas_lider)).all()
-        ids_eventos = list(set(a.id_evento for a in asistencias_lider))
-        if ids_eventos:
-            query = query.filter(EventoModel.id.in_(ids_eventos), EventoModel.fecha < ahora - timedelta(hours=24))
-        else:
-            query = query.filter(EventoModel.id == -1)
-    else:
-        personas_usuario = db.query(PersonaModel).filter(PersonaModel.id_lider_responsable == current_user.id).all()
-        ids_personas = [p.id for p in personas_usuario]
-        asistencias_usuario = db.query(AsistenciaModel).filter(AsistenciaModel.id_persona.in_(ids_personas)).all()
-        ids_eventos = list(set(a.id_evento for a in asistencias_usuario))
-        if ids_eventos:
-            query = query.filter(EventoModel.id.in_(ids_eventos), EventoModel.fecha < ahora - timedelta(hours=24))
-        else:
-            query = query.filter(EventoModel.id == -1)
-
+    query = db.query(EventoModel).filter(*_filtro_eventos_historicos(current_user))
     eventos = query.order_by(EventoModel.fecha.desc()).all()
+    metricas = metricas_historicas(db, query) if eventos else {}
     eventos_por_tipo = {}
     eventos_por_mes = {}
     eventos_detallados = []
@@ -158,11 +193,10 @@ async def reporte_eventos_historicos(
         mes = evento.fecha.strftime("%Y-%m")
         eventos_por_mes[mes] = eventos_por_mes.get(mes, 0) + 1
 
-        asistencias = db.query(AsistenciaModel).filter(AsistenciaModel.id_evento == evento.id).all()
-        asignaciones = db.query(AsignacionMovilizacionModel).filter(AsignacionMovilizacionModel.id_evento == evento.id).all()
-        total_asignados = len(asignaciones)
-        asistencias_confirmadas = sum(1 for a in asistencias if a.asistio)
-        movilizados = sum(1 for a in asistencias if a.movilizado)
+        m = metricas[evento.id]
+        total_asignados = m["asignados"]
+        asistencias_confirmadas = m["asistieron"]
+        movilizados = m["movilizados"]
 
         eventos_detallados.append({
             "id": evento.id,
@@ -171,7 +205,7 @@ async def reporte_eventos_historicos(
             "tipo": evento.tipo,
             "lugar": evento.lugar,
             "total_asignados": total_asignados,
-            "total_asistencias": len(asistencias),
+            "total_asistencias": m["registros"],
             "asistencias_confirmadas": asistencias_confirmadas,
             "movilizados": movilizados,
             "porcentaje_asistencia": round((asistencias_confirmadas / total_asignados * 100) if total_asignados > 0 else 0, 1),
@@ -193,35 +227,92 @@ async def reporte_eventos_historicos(
     }
 
 
+@router.get("/personas/exportar")
+async def exportar_personas(
+    formato: str = "csv",
+    db: Session = Depends(get_db_lectura),
+    current_user: Usuario = Depends(get_current_active_user)
+):
+    """Personas del alcance del usuario, una fila por persona, en CSV o XLSX."""
+    filtro = _filtro_personas(current_user)
+    total = db.query(func.count(PersonaModel.id)).filter(*filtro).scalar()
+    stmt = select(
+        PersonaModel.id, PersonaModel.nombre, PersonaModel.telefono, PersonaModel.clave_elector,
+        PersonaModel.seccion_electoral, PersonaModel.colonia, PersonaModel.municipio,
+        UsuarioModel.nombre, PersonaModel.fecha_registro,
+    ).outerjoin(
+        UsuarioModel, UsuarioModel.id == PersonaModel.id_lider_responsable
+    ).where(*filtro).order_by(PersonaModel.id)
+
+    return respuesta_exportacion(
+        formato, "personas",
+        ["ID", "Nombre", "Teléfono", "Clave de elector", "Sección", "Colonia", "Municipio", "Líder", "Fecha de registro"],
+        lambda sesion: leer_en_lotes(sesion, stmt),
+        total=total,
+    )
+
+
+@router.get("/eventos-historicos/exportar")
+async def exportar_eventos_historicos(
+    formato: str = "csv",
+    db: Session = Depends(get_db_lectura),
+    current_user: Usuario = Depends(get_current_active_user)
+):
+    """Detalle de eventos históricos (una fila por evento) en CSV o XLSX."""
+    filtro = _filtro_eventos_historicos(current_user)
+    total = db.query(func.count(EventoModel.id)).filter(*filtro).scalar()
+
+    def filas(sesion):
+        # Los eventos sin resumen congelado se calculan en vivo antes de empezar
+        en_vivo = calcular_metricas(sesion, select(EventoModel.id).where(
+            *filtro, EventoModel.id.not_in(select(ResumenEventoModel.id_evento))
+        ))
+        stmt = select(
+            EventoModel.id, EventoModel.nombre, EventoModel.fecha, EventoModel.tipo, EventoModel.lugar,
+            ResumenEventoModel.id_evento, ResumenEventoModel.asignados, ResumenEventoModel.registros,
+            ResumenEventoModel.asistieron, ResumenEventoModel.movilizados,
+        ).outerjoin(
+            ResumenEventoModel, ResumenEventoModel.id_evento == EventoModel.id
+        ).where(*filtro).order_by(EventoModel.fecha.desc())
+        for e in leer_en_lotes(sesion, stmt):
+            if e.id_evento is None:
+                m = en_vivo[e.id]
+                asignados, registros, asistieron, movilizados = (
+                    m["asignados"], m["registros"], m["asistieron"], m["movilizados"]
+                )
+            else:
+                asignados, registros, asistieron, movilizados = e.asignados, e.registros, e.asistieron, e.movilizados
+            yield (
+                e.id, e.nombre, e.fecha, e.tipo, e.lugar, asignados, registros, asistieron, movilizados,
+                round((asistieron / asignados * 100) if asignados > 0 else 0, 1),
+                round((movilizados / asistieron * 100) if asistieron > 0 else 0, 1),
+            )
+
+    return respuesta_exportacion(
+        formato, "eventos_historicos",
+        ["ID", "Evento", "Fecha", "Tipo", "Lugar", "Asignados", "Registros", "Asistencias confirmadas",
+         "Movilizados", "% asistencia", "% movilización"],
+        filas,
+        total=total,
+    )
+
+
 @router.get("/asistencias-tiempo-real")
+@cachear_reporte("eventos", "asistencias", "asignaciones_movilizacion", "usuarios")
 async def reporte_asistencias_tiempo_real(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_lectura),
     current_user: Usuario = Depends(get_current_active_user)
 ):
-    if current_user.rol == "admin":
-        eventos = db.query(EventoModel).filter(EventoModel.activo == True).all()
-    elif current_user.rol in ["lider_estatal", "lider_regional", "lider_municipal", "lider_zona"]:
-        ids = get_subordinate_ids(current_user.id, db)
-        eventos = db.query(EventoModel).filter(
-            EventoModel.id_lider_organizador.in_(ids), EventoModel.activo == True
-        ).all()
-    else:
-        eventos = db.query(EventoModel).filter(
-            EventoModel.id_lider_organizador == current_user.id, EventoModel.activo == True
-        ).all()
+    query = db.query(EventoModel).filter(*_filtro_eventos_organizados(current_user))
+    eventos = query.all()
+    metricas = calcular_metricas(db, ids_de(query), ultimas=5) if eventos else {}
 
     reporte_eventos = []
     for evento in eventos:
-        asignaciones = db.query(AsignacionMovilizacionModel).filter(AsignacionMovilizacionModel.id_evento == evento.id).all()
-        asistencias = db.query(AsistenciaModel).filter(
-            AsistenciaModel.id_evento == evento.id, AsistenciaModel.asistio == True
-        ).all()
-        total_asignados = len(asignaciones)
-        total_asistencias = len(asistencias)
-        movilizados = sum(1 for a in asistencias if a.movilizado)
-        ultimas = db.query(AsistenciaModel).filter(
-            AsistenciaModel.id_evento == evento.id, AsistenciaModel.asistio == True
-        ).order_by(AsistenciaModel.hora_checkin.desc()).limit(5).all()
+        m = metricas[evento.id]
+        total_asignados = m["asignados"]
+        total_asistencias = m["asistieron"]
+        movilizados = m["movilizados_asistieron"]
 
         reporte_eventos.append({
             "id": evento.id,
@@ -233,10 +324,7 @@ async def reporte_asistencias_tiempo_real(
             "porcentaje_asistencia": round((total_asistencias / total_asignados * 100) if total_asignados > 0 else 0, 1),
             "movilizados": movilizados,
             "porcentaje_movilizacion": round((movilizados / total_asistencias * 100) if total_asistencias > 0 else 0, 1),
-            "ultimas_asistencias": [
-                {"id": a.id, "hora_checkin": a.hora_checkin.isoformat() if a.hora_checkin else None, "movilizado": a.movilizado}
-                for a in ultimas
-            ]
+            "ultimas_asistencias": m["ultimas_asistencias"]
         })
 
     reporte_eventos.sort(key=lambda x: x["fecha"], reverse=True)
@@ -256,88 +344,203 @@ async def reporte_asistencias_tiempo_real(
 
 @router.get("/estructura-jerarquica")
 async def reporte_estructura_jerarquica(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_lectura),
     current_user: Usuario = Depends(get_current_active_user)
 ):
-    def build_node(user):
-        subordinados = db.query(UsuarioModel).filter(
-            UsuarioModel.id_lider_superior == user.id, UsuarioModel.activo == True
-        ).all()
-        total_personas = db.query(PersonaModel).filter(
-            PersonaModel.id_lider_responsable == user.id, PersonaModel.activo == True
-        ).count()
-        children = [build_node(sub) for sub in subordinados]
-        total_sub_personas = sum(c["total_personas"] for c in children)
-        return {
-            "id": user.id,
-            "nombre": user.nombre,
-            "rol": user.rol,
-            "total_personas": total_personas,
-            "total_subordinados": len(subordinados),
-            "total_personas_red": total_personas + total_sub_personas,
-            "subordinados": children
-        }
+    arbol = obtener_arbol(db)
+    if current_user.rol != "admin" and current_user.id not in arbol:
+        # Usuario creado después de cachear el árbol
+        invalidar_arbol()
+        arbol = obtener_arbol(db)
 
     if current_user.rol == "admin":
-        raiz_users = db.query(UsuarioModel).filter(
-            UsuarioModel.activo == True, UsuarioModel.id_lider_superior == None
-        ).all()
-        estructura = [build_node(u) for u in raiz_users]
+        estructura = [arbol.nodo(uid) for uid in arbol.raices]
     else:
-        estructura = [build_node(current_user)]
+        estructura = [arbol.nodo(current_user.id)] if current_user.id in arbol else []
 
     return {"estructura": estructura, "total_niveles": len(estructura)}
 
 
-@router.get("/metricas-movilizacion/", response_model=dict)
-async def obtener_metricas_movilizacion(
+@router.get("/mi-red")
+async def reporte_mi_red(
+    db: Session = Depends(get_db_lectura),
+    current_user: Usuario = Depends(get_current_active_user)
+):
+    """Tamaño de la red del usuario actual, leído de contadores_red."""
+    contador = db.query(ContadorRedModel).filter(ContadorRedModel.id_usuario == current_user.id).first()
+    return {
+        "id_usuario": current_user.id,
+        "total_personas": contador.personas_directas if contador else 0,
+        "total_personas_red": contador.personas_red if contador else 0,
+        "total_lideres_red": contador.lideres_red if contador else 0,
+    }
+
+
+@router.get("/contadores-red/verificar")
+async def verificar_contadores_red(
+    db: Session = Depends(get_db_lectura),
+    current_user: Usuario = Depends(require_admin)
+):
+    """Compara contadores_red contra un recálculo completo (no modifica nada)."""
+    diferencias = verificar_contadores(db)
+    return {"consistente": not diferencias, "total_diferencias": len(diferencias), "diferencias": diferencias[:100]}
+
+
+@router.post("/contadores-red/reconstruir")
+async def reconstruir_contadores_red(
     db: Session = Depends(get_db),
+    current_user: Usuario = Depends(require_admin)
+):
+    """Recalcula contadores_red desde personas y usuarios."""
+    try:
+        filas = reconstruir_contadores(db)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error reconstruyendo contadores: {str(e)}")
+    logger.info(f"Contadores de red reconstruidos por {current_user.email}: {filas} usuarios")
+    return {"ok": True, "usuarios": filas}
+
+
+@router.get("/red-historica")
+async def reporte_red_historica(
+    dias: int = 30,
+    db: Session = Depends(get_db_lectura),
     current_user: Usuario = Depends(get_current_active_user)
 ):
+    """Serie diaria del tamaño de la red del usuario (resúmenes congelados + hoy en vivo)."""
+    desde = (datetime.utcnow() - timedelta(days=max(1, min(dias, 366)))).date()
+    resumenes = db.query(ResumenLiderDiarioModel).filter(
+        ResumenLiderDiarioModel.id_usuario == current_user.id,
+        ResumenLiderDiarioModel.fecha >= desde
+    ).order_by(ResumenLiderDiarioModel.fecha).all()
+    serie = [
+        {
+            "fecha": r.fecha.isoformat(),
+            "total_personas": r.personas_directas,
+            "total_personas_red": r.personas_red,
+            "total_lideres_red": r.lideres_red,
+            "asistencias": r.asistencias,
+            "movilizados": r.movilizados,
+        }
+        for r in resumenes
+    ]
+    hoy = await reporte_mi_red(db=db, current_user=current_user)
+    serie.append({
+        "fecha": datetime.utcnow().date().isoformat(),
+        "total_personas": hoy["total_personas"],
+        "total_personas_red": hoy["total_personas_red"],
+        "total_lideres_red": hoy["total_lideres_red"],
+        "asistencias": None,
+        "movilizados": None,
+    })
+    return {"id_usuario": current_user.id, "serie": serie}
+
+
+@router.post("/resumenes/generar")
+async def generar_resumenes_historicos(
+    recalcular: bool = False,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(require_admin)
+):
+    """Congela bajo demanda los resúmenes de eventos pasados y de líderes de ayer."""
     try:
-        total_padron = db.query(PadronElectoral).filter(PadronElectoral.activo == True).count()
-        padron_asignado = db.query(PadronElectoral).filter(
-            and_(PadronElectoral.activo == True, PadronElectoral.id_lider_asignado.isnot(None))
-        ).count()
-        total_personas = db.query(PersonaModel).filter(PersonaModel.activo == True).count()
-        metricas_lideres = db.query(
-            UsuarioModel.nombre,
-            UsuarioModel.rol,
-            func.count(PersonaModel.id).label('personas_registradas'),
-            func.count(PadronElectoral.id).label('personas_padron_asignadas')
-        ).outerjoin(
-            PersonaModel, UsuarioModel.id == PersonaModel.id_lider_responsable
-        ).outerjoin(
-            PadronElectoral, UsuarioModel.id == PadronElectoral.id_lider_asignado
-        ).filter(
-            UsuarioModel.activo == True,
-            UsuarioModel.rol.in_(["lider_estatal", "lider_regional", "lider_municipal", "lider_zona"])
-        ).group_by(UsuarioModel.id, UsuarioModel.nombre, UsuarioModel.rol).all()
-        return {
-            "resumen_general": {
-                "total_padron_electoral": total_padron,
-                "padron_asignado": padron_asignado,
-                "padron_disponible": total_padron - padron_asignado,
-                "total_personas_registradas": total_personas,
-                "total_lideres_activos": len(metricas_lideres)
-            },
-            "metricas_por_lider": [
-                {
-                    "lider": m.nombre, "rol": m.rol,
-                    "personas_registradas": m.personas_registradas,
-                    "personas_padron_asignadas": m.personas_padron_asignadas,
-                    "total_movilizacion": m.personas_registradas + m.personas_padron_asignadas
-                }
+        resultado = generar_resumenes(db, recalcular=recalcular)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error generando resúmenes: {str(e)}")
+    logger.info(f"Resúmenes generados por {current_user.email}: {resultado}")
+    return {"ok": True, **resultado}
+
+
+def _calcular_metricas_movilizacion(db: Session) -> dict:
+    padron = db.query(
+        func.count(PadronElectoral.id),
+        func.count(PadronElectoral.id_lider_asignado),
+    ).filter(PadronElectoral.activo == True).one()
+    total_padron, padron_asignado = padron
+    total_personas = db.query(func.count(PersonaModel.id)).filter(PersonaModel.activo == True).scalar()
+
+    # Personas y padrón se agregan por líder cada uno en su propia subconsulta
+    # antes del join: unirlos directamente multiplica filas. Las personas
+    # registradas incluyen las inactivas, como siempre contó este reporte
+    # (contadores_red solo lleva las activas).
+    personas_por_lider = db.query(
+        PersonaModel.id_lider_responsable.label("id_lider"),
+        func.count(PersonaModel.id).label("total"),
+    ).filter(PersonaModel.id_lider_responsable.isnot(None)).group_by(PersonaModel.id_lider_responsable).subquery()
+    padron_por_lider = db.query(
+        PadronElectoral.id_lider_asignado.label("id_lider"),
+        func.count(PadronElectoral.id).label("total"),
+    ).filter(PadronElectoral.id_lider_asignado.isnot(None)).group_by(PadronElectoral.id_lider_asignado).subquery()
+
+    metricas_lideres = db.query(
+        UsuarioModel.nombre,
+        UsuarioModel.rol,
+        func.coalesce(personas_por_lider.c.total, 0).label('personas_registradas'),
+        func.coalesce(padron_por_lider.c.total, 0).label('personas_padron_asignadas')
+    ).outerjoin(
+        personas_por_lider, personas_por_lider.c.id_lider == UsuarioModel.id
+    ).outerjoin(
+        padron_por_lider, padron_por_lider.c.id_lider == UsuarioModel.id
+    ).filter(
+        UsuarioModel.activo == True,
+        UsuarioModel.rol.in_(["lider_estatal", "lider_regional", "lider_municipal", "lider_zona"])
+    ).order_by(UsuarioModel.id).all()
+    return {
+        "resumen_general": {
+            "total_padron_electoral": total_padron,
+            "padron_asignado": padron_asignado,
+            "padron_disponible": total_padron - padron_asignado,
+            "total_personas_registradas": total_personas,
+            "total_lideres_activos": len(metricas_lideres)
+        },
+        "metricas_por_lider": [
+            {
+                "lider": m.nombre, "rol": m.rol,
+                "personas_registradas": m.personas_registradas,
+                "personas_padron_asignadas": m.personas_padron_asignadas,
+                "total_movilizacion": m.personas_registradas + m.personas_padron_asignadas
+            }
+            for m in metricas_lideres
+        ],
+        "ranking_movilizacion": sorted(
+            [
+                {"lider": m.nombre, "rol": m.rol,
+                 "total_movilizacion": m.personas_registradas + m.personas_padron_asignadas}
                 for m in metricas_lideres
             ],
-            "ranking_movilizacion": sorted(
-                [
-                    {"lider": m.nombre, "rol": m.rol,
-                     "total_movilizacion": m.personas_registradas + m.personas_padron_asignadas}
-                    for m in metricas_lideres
-                ],
-                key=lambda x: x["total_movilizacion"], reverse=True
-            )
-        }
+            key=lambda x: x["total_movilizacion"], reverse=True
+        )
+    }
+
+
+@router.get("/metricas-movilizacion/", response_model=dict)
+async def obtener_metricas_movilizacion(
+    db: Session = Depends(get_db_lectura),
+    current_user: Usuario = Depends(get_current_active_user)
+):
+    try:
+        return _cache_metricas.get_or_set("metricas", lambda: _calcular_metricas_movilizacion(db))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error obteniendo metricas: {str(e)}")
+
+
+@router.get("/metricas-movilizacion/exportar")
+async def exportar_metricas_movilizacion(
+    formato: str = "csv",
+    db: Session = Depends(get_db_lectura),
+    current_user: Usuario = Depends(get_current_active_user)
+):
+    """Métricas por líder de /metricas-movilizacion/ en CSV o XLSX."""
+    metricas = _cache_metricas.get_or_set("metricas", lambda: _calcular_metricas_movilizacion(db))["metricas_por_lider"]
+    return respuesta_exportacion(
+        formato, "metricas_movilizacion",
+        ["Líder", "Rol", "Personas registradas", "Padrón asignado", "Total movilización"],
+        lambda sesion: (
+            (m["lider"], m["rol"], m["personas_registradas"], m["personas_padron_asignadas"], m["total_movilizacion"])
+            for m in metricas
+        ),
+        total=len(metricas),
+    )
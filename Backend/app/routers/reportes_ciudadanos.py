@@ -1,13 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Request
-from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 from typing import List, Optional
 import logging
 import os
-import shutil
 import uuid
 
-from ..database import get_db
-from ..auth import get_current_active_user
+from ..almacen_fotos import es_data_uri, guardar_archivo, guardar_data_uri, guardar_foto
+from ..variantes_fotos import encolar_variantes_url, url_variante
+from ..database import get_db, get_async_db
+from ..replica import get_async_db_lectura
+from ..auth import get_current_active_user, get_current_active_user_async
 from ..schemas import Usuario
 from ..schemas_reportes import ReporteCiudadano, ReporteCiudadanoCreate, ReporteCiudadanoUpdate
 from ..models import ReporteCiudadano as ReporteCiudadanoModel, FotoReporte as FotoReporteModel
@@ -17,6 +22,9 @@ router = APIRouter(prefix="/reportes-ciudadanos", tags=["reportes-ciudadanos"])
 
 ADMIN_ROLES = ['admin', 'presidente', 'lider_estatal', 'lider_regional', 'lider_municipal']
 
+# Carga ciudadano/administrador junto con el reporte (_safe_set_nombres no puede hacer lazy load en async)
+CON_NOMBRES = (selectinload(ReporteCiudadanoModel.ciudadano), selectinload(ReporteCiudadanoModel.administrador))
+
 
 def _safe_set_nombres(reporte):
     try:
@@ -30,6 +38,26 @@ def _safe_set_nombres(reporte):
         reporte.administrador_nombre = None
 
 
+def _foto_al_almacen(foto_url):
+    """Las fotos que llegan en data URI se guardan en el almacén; queda su URL.
+
+    Decodifica y escribe la foto: se llama con ``run_in_threadpool``."""
+    if not es_data_uri(foto_url):
+        return foto_url
+    try:
+        url = guardar_data_uri(foto_url)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    encolar_variantes_url(url)
+    return url
+
+
+def _url_absoluta(url, base_url):
+    if url.startswith("http") or url.startswith("data:"):
+        return url
+    return f"{base_url}{url}"
+
+
 @router.post("/", response_model=ReporteCiudadano)
 async def create_reporte_ciudadano(
     reporte: ReporteCiudadanoCreate,
@@ -42,7 +70,7 @@ async def create_reporte_ciudadano(
         if reporte.longitud is not None and (reporte.longitud < -180 or reporte.longitud > 180):
             raise HTTPException(status_code=400, detail="Longitud debe estar entre -180 y 180")
 
-        foto_url_processed = reporte.foto_url
+        foto_url_processed = await run_in_threadpool(_foto_al_almacen, reporte.foto_url)
         if reporte.foto_url and reporte.foto_url.startswith('file://'):
             foto_url_processed = None
 
@@ -77,17 +105,19 @@ async def list_reportes_ciudadanos(
     limit: int = 100,
     estado: Optional[str] = None,
     tipo: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Usuario = Depends(get_current_active_user_async)
 ):
-    query = db.query(ReporteCiudadanoModel).filter(ReporteCiudadanoModel.activo == True)
+    query = select(ReporteCiudadanoModel).options(*CON_NOMBRES).filter(ReporteCiudadanoModel.activo == True)
     if estado:
         query = query.filter(ReporteCiudadanoModel.estado == estado)
     if tipo:
         query = query.filter(ReporteCiudadanoModel.tipo == tipo)
     if current_user.rol not in ADMIN_ROLES + ['ciudadano']:
         query = query.filter(ReporteCiudadanoModel.ciudadano_id == current_user.id)
-    reportes = query.order_by(ReporteCiudadanoModel.fecha_creacion.desc()).offset(skip).limit(limit).all()
+    reportes = (await db.scalars(
+        query.order_by(ReporteCiudadanoModel.fecha_creacion.desc()).offset(skip).limit(limit)
+    )).all()
     for reporte in reportes:
         _safe_set_nombres(reporte)
     return reportes
@@ -95,16 +125,17 @@ async def list_reportes_ciudadanos(
 
 @router.get("/estados/")
 async def get_estados_reportes(
-    db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Usuario = Depends(get_current_active_user_async)
 ):
-    query = db.query(ReporteCiudadanoModel).filter(ReporteCiudadanoModel.activo == True)
+    query = select(ReporteCiudadanoModel.estado, func.count()).filter(
+        ReporteCiudadanoModel.activo == True,
+        ReporteCiudadanoModel.estado.in_(["pendiente", "en_proceso", "resuelto"])
+    ).group_by(ReporteCiudadanoModel.estado)
     if current_user.rol not in ADMIN_ROLES:
         query = query.filter(ReporteCiudadanoModel.ciudadano_id == current_user.id)
-    pendientes = query.filter(ReporteCiudadanoModel.estado == "pendiente").count()
-    en_proceso = query.filter(ReporteCiudadanoModel.estado == "en_proceso").count()
-    resueltos = query.filter(ReporteCiudadanoModel.estado == "resuelto").count()
-    return {"pendiente": pendientes, "en_proceso": en_proceso, "resuelto": resueltos}
+    conteos = dict((await db.execute(query)).all())
+    return {estado: conteos.get(estado, 0) for estado in ("pendiente", "en_proceso", "resuelto")}
 
 
 @router.post("/publico")
@@ -150,22 +181,16 @@ async def create_reporte_publico(
             try:
                 from ..cloudinary_utils import upload_image as _upload_cloud
                 foto_bytes_data = await foto.read()
-                cloud_url = _upload_cloud(foto_bytes_data, folder="reportes")
+                cloud_url = await run_in_threadpool(_upload_cloud, foto_bytes_data, folder="reportes")
                 if cloud_url:
                     # Cloudinary disponible: guardar URL permanente
                     foto_url_final = cloud_url
                     foto_size = len(foto_bytes_data)
                 else:
-                    # Fallback: guardar en disco local
-                    upload_dir = "uploads/reportes"
-                    os.makedirs(upload_dir, exist_ok=True)
-                    ext = os.path.splitext(foto.filename)[1] or ".jpg"
-                    filename = f"{uuid.uuid4().hex}{ext}"
-                    filepath = os.path.join(upload_dir, filename)
-                    with open(filepath, "wb") as f:
-                        f.write(foto_bytes_data)
-                    foto_url_final = f"/uploads/reportes/{filename}"
+                    # Fallback: almacén de fotos local
+                    foto_url_final = await run_in_threadpool(guardar_foto, foto_bytes_data, foto.content_type)
                     foto_size = len(foto_bytes_data)
+                    encolar_variantes_url(foto_url_final)
 
                 ext = os.path.splitext(foto.filename)[1] or ".jpg"
                 filename = f"{uuid.uuid4().hex}{ext}"
@@ -194,12 +219,12 @@ async def create_reporte_publico(
 
 
 @router.get("/publico/{reporte_id}")
-async def get_reporte_publico(reporte_id: int, db: Session = Depends(get_db)):
-    reporte = db.query(ReporteCiudadanoModel).filter(
+async def get_reporte_publico(reporte_id: int, db: AsyncSession = Depends(get_async_db_lectura)):
+    reporte = await db.scalar(select(ReporteCiudadanoModel).options(*CON_NOMBRES).filter(
         ReporteCiudadanoModel.id == reporte_id,
         ReporteCiudadanoModel.activo == True,
         ReporteCiudadanoModel.es_publico == True,
-    ).first()
+    ))
     if not reporte:
         raise HTTPException(status_code=404, detail="Reporte no encontrado")
     _safe_set_nombres(reporte)
@@ -225,9 +250,9 @@ async def obtener_reportes_publicos(
     limit: int = 100,
     estado: Optional[str] = None,
     tipo: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db_lectura)
 ):
-    query = db.query(ReporteCiudadanoModel).filter(
+    query = select(ReporteCiudadanoModel).options(*CON_NOMBRES).filter(
         ReporteCiudadanoModel.activo == True,
         ReporteCiudadanoModel.es_publico == True
     )
@@ -235,7 +260,9 @@ async def obtener_reportes_publicos(
         query = query.filter(ReporteCiudadanoModel.estado == estado)
     if tipo:
         query = query.filter(ReporteCiudadanoModel.tipo == tipo)
-    reportes = query.order_by(ReporteCiudadanoModel.fecha_creacion.desc()).offset(skip).limit(limit).all()
+    reportes = (await db.scalars(
+        query.order_by(ReporteCiudadanoModel.fecha_creacion.desc()).offset(skip).limit(limit)
+    )).all()
     for reporte in reportes:
         _safe_set_nombres(reporte)
     return reportes
@@ -249,10 +276,10 @@ async def obtener_reportes_publicos_con_fotos(
     estado: Optional[str] = None,
     fecha_inicio: Optional[str] = None,
     fecha_fin: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db_lectura)
 ):
     base_url = os.getenv("BASE_URL", "https://red-ciudadana.onrender.com")
-    query = db.query(ReporteCiudadanoModel).filter(
+    query = select(ReporteCiudadanoModel).filter(
         ReporteCiudadanoModel.activo == True,
         ReporteCiudadanoModel.es_publico == True
     )
@@ -264,25 +291,31 @@ async def obtener_reportes_publicos_con_fotos(
         query = query.filter(ReporteCiudadanoModel.fecha_creacion >= fecha_inicio)
     if fecha_fin:
         query = query.filter(ReporteCiudadanoModel.fecha_creacion <= fecha_fin)
-    reportes = query.offset(skip).limit(limit).all()
+    reportes = (await db.scalars(query.offset(skip).limit(limit))).all()
+    fotos_por_reporte = {}
+    if reportes:
+        fotos = await db.scalars(select(FotoReporteModel).filter(
+            FotoReporteModel.id_reporte.in_([r.id for r in reportes]),
+            FotoReporteModel.activo == True
+        ))
+        for foto in fotos:
+            fotos_por_reporte.setdefault(foto.id_reporte, []).append(foto)
     resultado = []
     for reporte in reportes:
-        fotos = db.query(FotoReporteModel).filter(
-            FotoReporteModel.id_reporte == reporte.id,
-            FotoReporteModel.activo == True
-        ).all()
         fotos_data = []
-        for foto in fotos:
+        for foto in fotos_por_reporte.get(reporte.id, []):
             if foto.contenido_base64:
+                # Sin almacén duradero la migración 3 deja el base64 en la fila
                 foto_url = f"data:{foto.tipo};base64,{foto.contenido_base64}"
             elif foto.url:
-                foto_url = f"{base_url}{foto.url}"
+                foto_url = _url_absoluta(foto.url, base_url)
             else:
                 foto_url = None
             fotos_data.append({
                 "id": foto.id,
                 "nombre_archivo": foto.nombre_archivo,
                 "url": foto_url,
+                "miniatura": url_variante(foto_url),
                 "tipo": foto.tipo,
                 "tamanio": foto.tamaño
             })
@@ -312,11 +345,10 @@ async def obtener_reportes_publicos_con_fotos(
 async def get_mapa_pins(
     tipo: Optional[str] = None,
     estado: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db_lectura)
 ):
     """Coordenadas livianas para Leaflet MarkerCluster."""
-    from sqlalchemy import text as _text
-    q = db.query(
+    q = select(
         ReporteCiudadanoModel.id,
         ReporteCiudadanoModel.tipo,
         ReporteCiudadanoModel.subtipo,
@@ -335,36 +367,31 @@ async def get_mapa_pins(
         q = q.filter(ReporteCiudadanoModel.tipo == tipo)
     if estado:
         q = q.filter(ReporteCiudadanoModel.estado == estado)
-    rows = q.order_by(ReporteCiudadanoModel.fecha_creacion.desc()).limit(2000).all()
+    rows = (await db.execute(q.order_by(ReporteCiudadanoModel.fecha_creacion.desc()).limit(2000))).all()
     base_url = os.getenv("BASE_URL", "https://red-ciudadana.onrender.com")
 
     # Obtener fotos de fotos_reportes para reportes sin foto_url
     ids_sin_foto = [r.id for r in rows if not r.foto_url]
     fotos_extra = {}
     if ids_sin_foto:
-        from sqlalchemy import text as _text
-        for rid in ids_sin_foto:
-            f = db.query(FotoReporteModel.url).filter(
-                FotoReporteModel.id_reporte == rid,
-                FotoReporteModel.activo == True
-            ).first()
-            if f and f.url:
-                fotos_extra[rid] = f.url
+        # Primera foto activa de cada reporte, en una sola consulta
+        fotos = await db.execute(select(FotoReporteModel.id_reporte, FotoReporteModel.url).filter(
+            FotoReporteModel.id_reporte.in_(ids_sin_foto),
+            FotoReporteModel.activo == True
+        ).order_by(FotoReporteModel.id))
+        for rid, url in fotos:
+            fotos_extra.setdefault(rid, url)
 
     result = []
     for r in rows:
-        foto = None
         raw = r.foto_url or fotos_extra.get(r.id)
-        if raw:
-            if raw.startswith("http") or raw.startswith("data:"):
-                foto = raw
-            else:
-                foto = f"{base_url}{raw}"
+        foto = _url_absoluta(raw, base_url) if raw else None
         result.append({
             "id": r.id, "tipo": r.tipo, "subtipo": r.subtipo,
             "estado": r.estado, "prioridad": r.prioridad,
             "latitud": r.latitud, "longitud": r.longitud,
             "foto_url": foto,
+            "foto_miniatura": url_variante(foto),
             "folio": r.folio or f"RC-{r.id}",
             "fecha_creacion": r.fecha_creacion.isoformat() if r.fecha_creacion else None,
             "votos": r.votos or 0,
@@ -375,23 +402,21 @@ async def get_mapa_pins(
 
 
 @router.get("/estadisticas-mapa")
-async def get_estadisticas_mapa(db: Session = Depends(get_db)):
+async def get_estadisticas_mapa(db: AsyncSession = Depends(get_async_db_lectura)):
     """Stats para el panel de estadísticas del mapa."""
-    from sqlalchemy import func as _func, case as _case
-    total = db.query(ReporteCiudadanoModel).filter(ReporteCiudadanoModel.activo == True).count()
-    por_tipo = db.execute(
+    por_tipo = (await db.execute(
         __import__('sqlalchemy').text(
             "SELECT tipo, COUNT(*) as total, "
             "SUM(CASE WHEN estado='resuelto' THEN 1 ELSE 0 END) as solucionados "
             "FROM reportes_ciudadanos WHERE activo=true GROUP BY tipo ORDER BY total DESC"
         )
-    ).fetchall()
-    por_estado = db.execute(
+    )).fetchall()
+    por_estado = (await db.execute(
         __import__('sqlalchemy').text(
             "SELECT estado, COUNT(*) as total FROM reportes_ciudadanos WHERE activo=true GROUP BY estado"
         )
-    ).fetchall()
-    resumen = db.execute(
+    )).fetchall()
+    resumen = (await db.execute(
         __import__('sqlalchemy').text(
             "SELECT COUNT(*) as total,"
             " SUM(CASE WHEN estado='pendiente' THEN 1 ELSE 0 END) as pendientes,"
@@ -401,7 +426,7 @@ async def get_estadisticas_mapa(db: Session = Depends(get_db)):
             " SUM(CASE WHEN estado='rechazado' THEN 1 ELSE 0 END) as rechazados"
             " FROM reportes_ciudadanos WHERE activo=true"
         )
-    ).fetchone()
+    )).fetchone()
     return {
         "resumen": dict(resumen._mapping) if resumen else {"total": 0},
         "porTipo": [dict(r._mapping) for r in por_tipo],
@@ -412,12 +437,12 @@ async def get_estadisticas_mapa(db: Session = Depends(get_db)):
 @router.get("/{reporte_id}", response_model=ReporteCiudadano)
 async def get_reporte_ciudadano(
     reporte_id: int,
-    db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Usuario = Depends(get_current_active_user_async)
 ):
-    reporte = db.query(ReporteCiudadanoModel).filter(
+    reporte = await db.scalar(select(ReporteCiudadanoModel).options(*CON_NOMBRES).filter(
         ReporteCiudadanoModel.id == reporte_id, ReporteCiudadanoModel.activo == True
-    ).first()
+    ))
     if not reporte:
         raise HTTPException(status_code=404, detail="Reporte no encontrado")
     if current_user.rol not in ADMIN_ROLES and reporte.ciudadano_id != current_user.id:
@@ -438,7 +463,10 @@ async def update_reporte_ciudadano(
         raise HTTPException(status_code=404, detail="Reporte no encontrado")
     if current_user.rol not in ADMIN_ROLES and reporte.ciudadano_id != current_user.id:
         raise HTTPException(status_code=403, detail="No puedes editar este reporte")
-    for field, value in reporte_update.dict(exclude_unset=True).items():
+    cambios = reporte_update.dict(exclude_unset=True)
+    if "foto_url" in cambios:
+        cambios["foto_url"] = await run_in_threadpool(_foto_al_almacen, cambios["foto_url"])
+    for field, value in cambios.items():
         setattr(reporte, field, value)
     db.commit()
     db.refresh(reporte)
@@ -658,17 +686,11 @@ async def actualizar_reporte_con_fotos(
     act_id = result.lastrowid
 
     ev_guardadas = []
-    upload_dir = "uploads/evidencias"
-    os.makedirs(upload_dir, exist_ok=True)
     for ev_file in evidencias:
         if ev_file and ev_file.filename:
             try:
-                ext = os.path.splitext(ev_file.filename)[1] or ".jpg"
-                fname = f"ev_{uuid.uuid4().hex}{ext}"
-                fpath = os.path.join(upload_dir, fname)
-                with open(fpath, "wb") as f:
-                    shutil.copyfileobj(ev_file.file, f)
-                url = f"/uploads/evidencias/{fname}"
+                url, _ = await run_in_threadpool(guardar_archivo, ev_file.file, ev_file.content_type)
+                encolar_variantes_url(url)
                 db.execute(_text(
                     "INSERT INTO evidencias_actualizaciones (actualizacion_id, reporte_id, url) VALUES (:aid, :rid, :url)"
                 ), {"aid": act_id, "rid": reporte_id, "url": url})
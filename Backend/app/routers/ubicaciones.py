@@ -1,11 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from typing import List, Optional
 import logging
 from pydantic import BaseModel
 
-from ..database import get_db
-from ..auth import get_current_active_user
+from ..database import get_async_db
+from ..auth import get_current_active_user_async
 from ..models import UbicacionTiempoReal as UbicacionTiempoRealModel
 from ..models import Vehiculo as VehiculoModel
 from ..models import AsignacionMovilizacion as AsignacionMovilizacionModel
@@ -37,8 +39,8 @@ class UbicacionUpdate(BaseModel):
 @router.post("/ubicacion/actualizar")
 async def actualizar_ubicacion(
     ubicacion: UbicacionUpdate,
-    db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Usuario = Depends(get_current_active_user_async)
 ):
     """Actualizar ubicación en tiempo real del usuario"""
     try:
@@ -46,37 +48,37 @@ async def actualizar_ubicacion(
         if not ubicacion.seguimiento_activo:
             if ubicacion.evento_id and ubicacion.vehiculo_id:
                 # Detener seguimiento específico
-                db.query(UbicacionTiempoRealModel).filter(
+                await db.execute(update(UbicacionTiempoRealModel).where(
                     UbicacionTiempoRealModel.id_usuario == current_user.id,
                     UbicacionTiempoRealModel.evento_id == ubicacion.evento_id,
                     UbicacionTiempoRealModel.vehiculo_id == ubicacion.vehiculo_id,
                     UbicacionTiempoRealModel.activo == True
-                ).update({"activo": False})
-                db.commit()
+                ).values(activo=False))
+                await db.commit()
                 return {"success": True, "message": f"Seguimiento detenido para evento {ubicacion.evento_id} y vehículo {ubicacion.vehiculo_id}"}
             else:
                 # Detener todos los seguimientos del usuario
-                db.query(UbicacionTiempoRealModel).filter(
+                await db.execute(update(UbicacionTiempoRealModel).where(
                     UbicacionTiempoRealModel.id_usuario == current_user.id,
                     UbicacionTiempoRealModel.activo == True
-                ).update({"activo": False})
-                db.commit()
+                ).values(activo=False))
+                await db.commit()
                 return {"success": True, "message": "Todos los seguimientos detenidos"}
 
         # Desactivar ubicación anterior del mismo usuario + evento + vehículo (si existe)
         if ubicacion.evento_id and ubicacion.vehiculo_id:
-            db.query(UbicacionTiempoRealModel).filter(
+            await db.execute(update(UbicacionTiempoRealModel).where(
                 UbicacionTiempoRealModel.id_usuario == current_user.id,
                 UbicacionTiempoRealModel.evento_id == ubicacion.evento_id,
                 UbicacionTiempoRealModel.vehiculo_id == ubicacion.vehiculo_id,
                 UbicacionTiempoRealModel.activo == True
-            ).update({"activo": False})
+            ).values(activo=False))
         else:
             # Si no hay evento/vehículo específico, desactivar todas las ubicaciones del usuario
-            db.query(UbicacionTiempoRealModel).filter(
+            await db.execute(update(UbicacionTiempoRealModel).where(
                 UbicacionTiempoRealModel.id_usuario == current_user.id,
                 UbicacionTiempoRealModel.activo == True
-            ).update({"activo": False})
+            ).values(activo=False))
 
         # Crear nueva ubicación
         nueva_ubicacion = UbicacionTiempoRealModel(
@@ -97,19 +99,19 @@ async def actualizar_ubicacion(
         )
 
         db.add(nueva_ubicacion)
-        db.commit()
-        db.refresh(nueva_ubicacion)
+        await db.commit()
+        await db.refresh(nueva_ubicacion)
 
         return {"success": True, "message": "Ubicación actualizada"}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error al actualizar ubicación: {str(e)}")
 
 
 @router.get("/ubicacion/vehiculos")
 async def obtener_ubicaciones_vehiculos(
-    db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Usuario = Depends(get_current_active_user_async)
 ):
     """Obtener ubicaciones en tiempo real de vehículos/líderes"""
     try:
@@ -117,13 +119,15 @@ async def obtener_ubicaciones_vehiculos(
         roles_vehiculos = ["lider_estatal", "lider_regional", "lider_municipal", "lider_zona", "admin"]
 
         # Obtener ubicaciones activas de estos roles
-        ubicaciones = db.query(UbicacionTiempoRealModel).join(
+        ubicaciones = (await db.scalars(select(UbicacionTiempoRealModel).options(
+            selectinload(UbicacionTiempoRealModel.usuario)
+        ).join(
             UsuarioModel, UbicacionTiempoRealModel.id_usuario == UsuarioModel.id
         ).filter(
             UbicacionTiempoRealModel.activo == True,
             UsuarioModel.rol.in_(roles_vehiculos),
             UsuarioModel.activo == True
-        ).all()
+        ))).all()
 
         # Formatear respuesta
         ubicaciones_formateadas = []
@@ -164,15 +168,15 @@ async def obtener_ubicaciones_vehiculos(
 
 @router.get("/ubicacion/mi-ubicacion")
 async def obtener_mi_ubicacion(
-    db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Usuario = Depends(get_current_active_user_async)
 ):
     """Obtener mis ubicaciones activas"""
     try:
-        ubicaciones = db.query(UbicacionTiempoRealModel).filter(
+        ubicaciones = (await db.scalars(select(UbicacionTiempoRealModel).filter(
             UbicacionTiempoRealModel.id_usuario == current_user.id,
             UbicacionTiempoRealModel.activo == True
-        ).all()
+        ))).all()
 
         if not ubicaciones:
             return {"ubicacion": None, "ubicaciones": []}
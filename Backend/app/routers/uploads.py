@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
 from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 import os
 import uuid
@@ -9,6 +10,8 @@ from ..database import get_db
 from ..auth import get_current_active_user, require_admin
 from ..schemas import Usuario
 from ..config import LOGO_PATH
+from ..almacen_fotos import guardar_archivo
+from ..variantes_fotos import encolar_variantes_url, url_variante
 
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["uploads"])
@@ -51,17 +54,18 @@ async def upload_foto_reporte(
 ):
     if not file.content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail="Solo se permiten archivos de imagen")
-    content = await file.read()
-    if len(content) > 10 * 1024 * 1024:
+    # El formulario ya está en un archivo temporal: no se carga en memoria
+    if file.size is not None and file.size > 10 * 1024 * 1024:
         raise HTTPException(status_code=400, detail="El archivo es demasiado grande (maximo 10MB)")
-    os.makedirs("static/reportes", exist_ok=True)
-    ext = file.filename.split('.')[-1] if file.filename and '.' in file.filename else 'jpg'
-    file_name = f"{uuid.uuid4()}.{ext}"
-    with open(f"static/reportes/{file_name}", "wb") as f:
-        f.write(content)
+    url, tamano = await run_in_threadpool(guardar_archivo, file.file, file.content_type)
+    encolar_variantes_url(url)
+    file_name = os.path.basename(url)
     base_url = os.getenv("BASE_URL", "http://localhost:8000")
-    logger.info(f"Foto de reporte subida: {file_name} ({len(content)} bytes)")
-    return {"success": True, "url": f"{base_url}/static/reportes/{file_name}", "filename": file_name, "size": len(content)}
+    logger.info(f"Foto de reporte subida: {file_name} ({tamano} bytes)")
+    miniatura, media = url_variante(url), url_variante(url, "media")
+    return {"success": True, "url": f"{base_url}{url}",
+            "miniatura": f"{base_url}{miniatura}" if miniatura else None,
+            "media": f"{base_url}{media}" if media else None, "filename": file_name, "size": tamano}
 
 
 @router.post("/upload-file")
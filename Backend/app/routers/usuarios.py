@@ -5,10 +5,11 @@ from pydantic import BaseModel
 import logging
 
 from ..database import get_db
-from ..auth import get_current_active_user, require_admin, can_access_user, get_password_hash
+from ..auth import get_current_active_user, require_admin, can_access_user, get_password_hash_async, invalidar_usuario, revocar_tokens
+from ..permisos import invalidar_permisos
+from ..contadores_red import registrar_lider, mover_subarbol, reactivar_lider, crearia_ciclo
 from ..models import Usuario as UsuarioModel
 from ..schemas import Usuario, UsuarioCreate, UsuarioUpdate
-from passlib.hash import bcrypt
 
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["usuarios"])
@@ -49,7 +50,7 @@ async def create_user(user: UsuarioCreate, db: Session = Depends(get_db)):
                 candidate = f"{base}{suffix}"
             generated_username = candidate
 
-        hashed_password = get_password_hash(user.password)
+        hashed_password = await get_password_hash_async(user.password)
         db_user = UsuarioModel(
             username=(user.username or generated_username),
             nombre=user.nombre,
@@ -63,6 +64,8 @@ async def create_user(user: UsuarioCreate, db: Session = Depends(get_db)):
             id_lider_superior=user.id_lider_superior
         )
         db.add(db_user)
+        db.flush()
+        registrar_lider(db, db_user.id, db_user.id_lider_superior)
         db.commit()
         db.refresh(db_user)
         return db_user
@@ -129,9 +132,21 @@ async def update_user(
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     if not can_access_user(user_id, current_user):
         raise HTTPException(status_code=403, detail="No tiene permisos para modificar este usuario")
-    for field, value in user_update.dict(exclude_unset=True).items():
+    superior_anterior, activo_anterior, email_anterior = user.id_lider_superior, user.activo, user.email
+    cambios = user_update.dict(exclude_unset=True)
+    if "id_lider_superior" in cambios and crearia_ciclo(db, user.id, cambios["id_lider_superior"]):
+        raise HTTPException(status_code=400, detail="El líder superior no puede ser el propio usuario ni alguien de su red")
+    for field, value in cambios.items():
         setattr(user, field, value)
+    if activo_anterior and not user.activo:
+        mover_subarbol(db, user.id, superior_anterior, None)
+    elif user.activo and not activo_anterior:
+        reactivar_lider(db, user.id, user.id_lider_superior)
+    elif user.activo and user.id_lider_superior != superior_anterior:
+        mover_subarbol(db, user.id, superior_anterior, user.id_lider_superior)
     db.commit()
+    invalidar_usuario(email_anterior)
+    invalidar_permisos(user.id)
     db.refresh(user)
     return user
 
@@ -145,8 +160,12 @@ async def deactivate_user(
     user = db.query(UsuarioModel).filter(UsuarioModel.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    if user.activo:
+        mover_subarbol(db, user.id, user.id_lider_superior, None)
     user.activo = False
     db.commit()
+    invalidar_usuario(user.email)
+    invalidar_permisos(user.id)
     db.refresh(user)
     return user
 
@@ -179,7 +198,26 @@ async def update_user_password(
     user = db.query(UsuarioModel).filter(UsuarioModel.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
-    user.password_hash = bcrypt.hash(password_update.new_password)
+    user.password_hash = await get_password_hash_async(password_update.new_password)
+    revocar_tokens(db, user)
     db.commit()
+    invalidar_usuario(user.email)
     db.refresh(user)
     return user
+
+
+@router.post("/users/{user_id}/revocar-tokens")
+async def revoke_user_tokens(
+    user_id: int,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(require_admin)
+):
+    """Invalida de inmediato todos los access y refresh tokens de un usuario."""
+    user = db.query(UsuarioModel).filter(UsuarioModel.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    revocar_tokens(db, user)
+    db.commit()
+    invalidar_usuario(user.email)
+    invalidar_permisos(user.id)
+    return {"ok": True, "token_version": user.token_version}
@@ -2,6 +2,7 @@ from pydantic import BaseModel, validator
 from typing import Optional
 from datetime import datetime
 from .constants import TIPOS_REPORTE, ESTADOS_REPORTE, PRIORIDADES_REPORTE, es_tipo_reporte_valido
+from .variantes_fotos import url_variante
 
 # Schemas para Reportes Ciudadanos
 class ReporteCiudadanoBase(BaseModel):
@@ -74,6 +75,7 @@ class ReporteCiudadano(BaseModel):
     longitud: float | None = None
     direccion: str | None = None
     foto_url: str | None = None
+    foto_miniatura: str | None = None  # variante de 320 px si la foto está en el almacén
     prioridad: str | None = None
     estado: str
     fecha_creacion: datetime
@@ -87,5 +89,9 @@ class ReporteCiudadano(BaseModel):
     ciudadano_nombre: str | None = None
     administrador_nombre: str | None = None
 
+    @validator('foto_miniatura', always=True)
+    def miniatura_de_foto(cls, v, values):
+        return v or url_variante(values.get('foto_url'))
+
     class Config:
         from_attributes = True
\ No newline at end of file
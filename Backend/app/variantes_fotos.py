@@ -0,0 +1,188 @@
+"""Variantes redimensionadas de las fotos del almacén (miniatura, media y completa).
+
+Por cada foto ``/fotos/<hash>.jpg`` se generan, junto al original en el
+almacén, ``<hash>_mini``, ``<hash>_media`` y ``<hash>_completa`` en WebP y en
+JPEG (lado mayor de 320, 1024 y 2048 px; nunca se agranda). La URL de una
+variante es ``/fotos/<hash>_mini.webp``.
+
+Se generan en un pool de hilos propio (VARIANTES_WORKERS, 1) para no ocupar
+el event loop ni el threadpool de los endpoints: ``encolar_variantes`` al
+subir una foto, y ``routers/fotos.py`` las agenda si alguien pide una
+variante que aún no existe (mientras tanto responde con el original). Varias
+peticiones de la misma foto comparten el trabajo, y una foto que no se pudo
+decodificar no se vuelve a intentar en VARIANTES_REINTENTO_SEGUNDOS.
+
+Con RELLENO_VARIANTES=1 (por defecto) cada worker, al arrancar, recorre en
+un hilo de fondo las fotos de los reportes que no tienen variantes (las
+anteriores a este cambio) y las agenda de una en una, en orden aleatorio
+para que varios workers no repitan el mismo trabajo.
+"""
+import io
+import logging
+import os
+import random
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+from .almacen_fotos import PREFIJO_URL, almacen
+from .cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+VARIANTES_WORKERS = int(os.getenv("VARIANTES_WORKERS", "1"))
+CALIDAD_FOTOS = int(os.getenv("CALIDAD_FOTOS", "80"))
+VARIANTES_REINTENTO_SEGUNDOS = float(os.getenv("VARIANTES_REINTENTO_SEGUNDOS", "3600"))
+RELLENO_VARIANTES = os.getenv("RELLENO_VARIANTES", "1") == "1"
+
+# nombre -> lado mayor en px
+TAMANOS = {"mini": 320, "media": 1024, "completa": 2048}
+FORMATOS = {".webp": "WEBP", ".jpg": "JPEG"}
+
+# Formatos que Pillow decodifica siempre; otras fotos (.bin, .heic) no tienen variantes
+EXTENSIONES_IMAGEN = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+
+_URL_ALMACEN = re.compile(r"/fotos/([0-9a-f]{64})(\.\w+)$")
+
+_pool_variantes = ThreadPoolExecutor(max_workers=max(1, VARIANTES_WORKERS), thread_name_prefix="variantes-fotos")
+_en_proceso = {}
+_en_proceso_lock = threading.Lock()
+# Fotos cuyo original no se pudo decodificar
+_ilegibles = TTLCache(ttl=VARIANTES_REINTENTO_SEGUNDOS, maxsize=4096)
+
+
+def clave_variante(clave: str, tamano: str, ext: str) -> str:
+    return f"{clave}_{tamano}{ext}"
+
+
+def url_variante(url: Optional[str], tamano: str = "mini", ext: str = ".webp") -> Optional[str]:
+    """URL de la variante de una foto del almacén (relativa o absoluta).
+
+    None si no es del almacén o no es de un formato de imagen decodificable:
+    el cliente usa entonces la foto original."""
+    encontrado = _URL_ALMACEN.search(url) if url else None
+    if encontrado is None or encontrado.group(2).lower() not in EXTENSIONES_IMAGEN:
+        return None
+    return f"{url[:encontrado.start()]}{PREFIJO_URL}{clave_variante(encontrado.group(1), tamano, ext)}"
+
+
+def _codificar(imagen, formato: str) -> bytes:
+    from PIL import Image
+
+    if formato == "JPEG" and imagen.mode != "RGB":
+        fondo = Image.new("RGB", imagen.size, "white")
+        fondo.paste(imagen, mask=imagen.getchannel("A") if imagen.mode == "RGBA" else None)
+        imagen = fondo
+    salida = io.BytesIO()
+    imagen.save(salida, formato, quality=CALIDAD_FOTOS, optimize=formato == "JPEG", method=4 if formato == "WEBP" else 0)
+    return salida.getvalue()
+
+
+def generar_variantes(clave: str) -> bool:
+    """Genera las variantes que falten; False si el original no es una imagen legible."""
+    # Pillow se importa con la primera foto, no al arrancar la app
+    from PIL import Image, ImageOps
+
+    destino = almacen()
+    if not destino.existe(clave):
+        return False
+    faltan = [(t, e) for t in TAMANOS for e in FORMATOS if not destino.existe(clave_variante(clave, t, e))]
+    if not faltan:
+        return True
+    try:
+        with Image.open(io.BytesIO(destino.leer(clave))) as original:
+            # JPEG: decodifica ya reducido (mucho más rápido con fotos de 10+ MP)
+            original.draft("RGB", (max(TAMANOS.values()),) * 2)
+            imagen = ImageOps.exif_transpose(original)
+            imagen = imagen.convert("RGBA" if "A" in imagen.getbands() or "transparency" in imagen.info else "RGB")
+    except (OSError, Image.DecompressionBombError, ValueError) as e:
+        logger.warning(f"No se generaron variantes de {clave}: {e}")
+        return False
+    # De mayor a menor: cada tamaño se reduce desde el anterior
+    for tamano, lado in sorted(TAMANOS.items(), key=lambda t: -t[1]):
+        imagen.thumbnail((lado, lado), Image.LANCZOS)
+        for ext, formato in FORMATOS.items():
+            if (tamano, ext) in faltan:
+                destino.guardar_como(clave_variante(clave, tamano, ext), _codificar(imagen, formato))
+    return True
+
+
+def _generar(clave: str) -> bool:
+    try:
+        generadas = generar_variantes(clave)
+        if not generadas:
+            _ilegibles.set(clave, True)
+        return generadas
+    finally:
+        with _en_proceso_lock:
+            _en_proceso.pop(clave, None)
+
+
+def encolar_variantes(clave: str) -> Optional[Future]:
+    """Agenda la generación (una sola vez por foto a la vez) y devuelve su Future.
+
+    None si el original no se pudo decodificar hace poco."""
+    if _ilegibles.get(clave):
+        return None
+    with _en_proceso_lock:
+        futuro = _en_proceso.get(clave)
+        if futuro is None:
+            futuro = _en_proceso[clave] = _pool_variantes.submit(_generar, clave)
+    return futuro
+
+
+def encolar_variantes_url(url: Optional[str]):
+    """Como ``encolar_variantes`` a partir de la URL /fotos/<hash>.ext; ignora otras URLs."""
+    encontrado = _URL_ALMACEN.search(url) if url else None
+    if encontrado is not None:
+        encolar_variantes(encontrado.group(1))
+
+
+def _claves_de_reportes() -> set:
+    """Claves de las fotos (decodificables) de fotos_reportes y reportes_ciudadanos."""
+    from .database import SessionLocal
+    from .models import FotoReporte, ReporteCiudadano
+    db = SessionLocal()
+    try:
+        urls = [u for (u,) in db.query(FotoReporte.url).filter(FotoReporte.url.like(f"%{PREFIJO_URL}%"))]
+        urls += [u for (u,) in db.query(ReporteCiudadano.foto_url).filter(ReporteCiudadano.foto_url.like(f"%{PREFIJO_URL}%"))]
+    finally:
+        db.close()
+    claves = set()
+    for url in urls:
+        encontrado = _URL_ALMACEN.search(url)
+        if encontrado is not None and encontrado.group(2).lower() in EXTENSIONES_IMAGEN:
+            claves.add(encontrado.group(1))
+    return claves
+
+
+def rellenar_variantes() -> int:
+    """Genera las variantes que falten de las fotos de reportes; devuelve cuántas fotos procesó."""
+    claves = list(_claves_de_reportes())
+    random.shuffle(claves)
+    destino = almacen()
+    procesadas = 0
+    for clave in claves:
+        # La miniatura JPEG es la última que escribe generar_variantes
+        if destino.existe(clave_variante(clave, "mini", ".jpg")):
+            continue
+        futuro = encolar_variantes(clave)
+        # De una en una: las fotos recién subidas no esperan detrás de todo el relleno
+        if futuro is not None and futuro.result():
+            procesadas += 1
+    return procesadas
+
+
+def _relleno_de_fondo():
+    try:
+        procesadas = rellenar_variantes()
+        if procesadas:
+            logger.info(f"Variantes generadas para {procesadas} fotos anteriores")
+    except Exception as e:
+        logger.error(f"Error rellenando variantes de fotos: {e}")
+
+
+def iniciar_relleno_variantes():
+    """Lanza ``rellenar_variantes`` en un hilo de fondo."""
+    threading.Thread(target=_relleno_de_fondo, name="relleno-variantes", daemon=True).start()
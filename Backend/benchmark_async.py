@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga mixta: consultas lentas y rápidas al mismo tiempo, con la
+sesión asíncrona (ASYNC_DB=1) y con la síncrona (ASYNC_DB=0).
+
+Lentas: /api/padron/buscar por nombre (ilike '%...%' recorre toda la tabla).
+Rápidas: /ubicacion/mi-ubicacion. Con la sesión síncrona cada consulta lenta
+bloquea el event loop y las rápidas esperan detrás de ella. Con más clientes
+que DB_POOL_SIZE + DB_MAX_OVERFLOW la corrida síncrona puede quedarse sin
+conexiones: la espera del pool también bloquea el event loop.
+
+Usa una base SQLite temporal (no toca red_ciudadana.db):
+    python benchmark_async.py --padron 300000 --lentas 2 --rapidas 8 --segundos 10
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--padron", type=int, default=300000)
+parser.add_argument("--lentas", type=int, default=2, help="clientes concurrentes con consultas lentas")
+parser.add_argument("--rapidas", type=int, default=8, help="clientes concurrentes con consultas rápidas")
+parser.add_argument("--segundos", type=float, default=10)
+parser.add_argument("--_hijo", action="store_true", help=argparse.SUPPRESS)
+parser.add_argument("--_db", help=argparse.SUPPRESS)
+args = parser.parse_args()
+
+
+def preparar_base():
+    """Crea la base una sola vez y la comparten las dos corridas."""
+    tmpdir = tempfile.mkdtemp(prefix="bench_async_")
+    ruta = os.path.join(tmpdir, "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{ruta}"
+    os.environ["ASYNC_DB"] = "0"
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from sqlalchemy import insert
+    from app.database import engine, SessionLocal
+    from app.models import Base, Usuario
+    from app.models_padron import PadronElectoral
+    from app.auth import get_password_hash
+    from app.main import app  # noqa: F401  registra todos los modelos
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    lider = Usuario(username="bench", nombre="Bench", email="bench@bench.local",
+                    password_hash=get_password_hash("bench"), rol="admin", activo=True)
+    db.add(lider)
+    db.commit()
+    for inicio in range(0, args.padron, 10000):
+        db.execute(insert(PadronElectoral), [
+            {"consecutivo": i, "elector": f"ELECTOR{i:011d}", "nombre": f"NOMBRE {i}", "ape_pat": "PATERNO",
+             "ape_mat": "MATERNO", "municipio": "MUNICIPIO", "seccion": str(i % 900), "activo": True}
+            for i in range(inicio, min(inicio + 10000, args.padron))
+        ])
+    db.commit()
+    db.close()
+    return ruta
+
+
+def lanzar():
+    ruta = preparar_base()
+    print(f"Padrón: {args.padron}  Lentas: {args.lentas}  Rápidas: {args.rapidas}  Segundos: {args.segundos}")
+    for modo in ("0", "1"):
+        env = dict(os.environ, ASYNC_DB=modo, DATABASE_URL=f"sqlite:///{ruta}")
+        subprocess.run([sys.executable, __file__, "--_hijo", "--_db", ruta, "--lentas", str(args.lentas),
+                        "--rapidas", str(args.rapidas), "--segundos", str(args.segundos)], env=env, check=True)
+
+
+async def medir():
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import logging
+    logging.disable(logging.INFO)
+
+    import httpx
+    from app.database import AsyncSessionLocal
+    from app.main import app
+
+    latencias = {"lentas": [], "rapidas": []}
+    fin = time.perf_counter() + args.segundos
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+        r = await client.post("/token", data={"username": "bench@bench.local", "password": "bench"})
+        headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+        async def cliente(tipo, metodo, url, **kwargs):
+            while time.perf_counter() < fin:
+                inicio = time.perf_counter()
+                r = await client.request(metodo, url, headers=headers, **kwargs)
+                assert r.status_code == 200, r.text
+                latencias[tipo].append(time.perf_counter() - inicio)
+
+        await asyncio.gather(
+            *(cliente("lentas", "POST", "/api/padron/buscar", json={"nombre": "inexistente", "limit": 20})
+              for _ in range(args.lentas)),
+            *(cliente("rapidas", "GET", "/ubicacion/mi-ubicacion") for _ in range(args.rapidas)),
+        )
+
+    modo = "async" if AsyncSessionLocal is not None else "sync "
+    for tipo, valores in latencias.items():
+        if not valores:
+            continue
+        valores.sort()
+        p95 = valores[int(len(valores) * 0.95) - 1] if valores else 0
+        print(f"{modo} {tipo:7s} req/s={len(valores) / args.segundos:8.1f} "
+              f"p50={statistics.median(valores) * 1000:7.1f} ms p95={p95 * 1000:7.1f} ms")
+
+
+if args._hijo:
+    asyncio.run(medir())
+else:
+    lanzar()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark de login: logins por segundo y latencia de /health durante una
+ráfaga de logins, para distintos tamaños del pool de hash (PASSWORD_HASH_WORKERS).
+
+Usa una base SQLite temporal (no toca red_ciudadana.db):
+    python benchmark_login.py --logins 200 --concurrencia 50 --workers 1,2,4,8
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--logins", type=int, default=200)
+parser.add_argument("--concurrencia", type=int, default=50)
+parser.add_argument("--workers", default=",".join(str(n) for n in (1, 2, 4, os.cpu_count() or 1)))
+parser.add_argument("--_hijo", action="store_true", help=argparse.SUPPRESS)
+args = parser.parse_args()
+
+
+def lanzar():
+    """Corre cada configuración en un proceso aparte (el pool se crea al importar app.auth)."""
+    print(f"Núcleos: {os.cpu_count()}  Logins: {args.logins}  Concurrencia: {args.concurrencia}")
+    for workers in sorted({int(w) for w in args.workers.split(",")}):
+        env = dict(os.environ, PASSWORD_HASH_WORKERS=str(workers))
+        subprocess.run([sys.executable, __file__, "--_hijo", "--logins", str(args.logins),
+                        "--concurrencia", str(args.concurrencia)], env=env, check=True)
+
+
+async def medir():
+    tmpdir = tempfile.mkdtemp(prefix="bench_login_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import logging
+    logging.disable(logging.INFO)
+
+    import httpx
+    from app.database import engine, SessionLocal
+    from app.models import Base, Usuario
+    from app.auth import get_password_hash, PASSWORD_HASH_WORKERS, BCRYPT_ROUNDS
+    from app.main import app
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.add(Usuario(username="bench", nombre="Bench", email="bench@bench.local",
+                   password_hash=get_password_hash("bench"), rol="lider_zona", activo=True))
+    db.commit()
+    db.close()
+
+    latencias_health = []
+    terminado = asyncio.Event()
+    limite = asyncio.Semaphore(args.concurrencia)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def login():
+            async with limite:
+                r = await client.post("/token", data={"username": "bench@bench.local", "password": "bench"})
+                assert r.status_code == 200, r.text
+
+        async def sondear_health():
+            while not terminado.is_set():
+                inicio = time.perf_counter()
+                await client.get("/health")
+                latencias_health.append(time.perf_counter() - inicio)
+                await asyncio.sleep(0.01)
+
+        sonda = asyncio.create_task(sondear_health())
+        inicio = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(args.logins)))
+        duracion = time.perf_counter() - inicio
+        terminado.set()
+        await sonda
+
+    latencias_health.sort()
+    p95 = latencias_health[int(len(latencias_health) * 0.95) - 1] if latencias_health else 0
+    print(f"workers={PASSWORD_HASH_WORKERS:3d} rounds={BCRYPT_ROUNDS} logins/s={args.logins / duracion:7.1f} "
+          f"/health p50={statistics.median(latencias_health) * 1000:6.1f} ms p95={p95 * 1000:6.1f} ms")
+
+
+if args._hijo:
+    asyncio.run(medir())
+else:
+    lanzar()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark de /reportes/personas: número de consultas y tiempo con N personas.
+
+Usa una base SQLite temporal (no toca red_ciudadana.db):
+    python benchmark_reporte_personas.py --personas 100000 --lideres 2000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--personas", type=int, default=100_000)
+parser.add_argument("--lideres", type=int, default=2_000)
+parser.add_argument("--seed", type=int, default=42)
+args = parser.parse_args()
+
+tmpdir = tempfile.mkdtemp(prefix="bench_rc_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import event  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.database import engine, SessionLocal  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import Usuario, Persona  # noqa: E402
+from app.auth import get_password_hash  # noqa: E402
+
+ROLES = ["lider_estatal", "lider_regional", "lider_municipal", "lider_zona"]
+
+
+def poblar(db):
+    random.seed(args.seed)
+    password = get_password_hash("bench")
+    usuarios = []
+    for i in range(args.lideres):
+        nivel = min(3, int(i ** 0.25)) if i else 0
+        superior = random.randrange(1, i + 1) if i else None
+        usuarios.append({
+            "id": i + 1000, "username": f"lider{i}", "nombre": f"Lider {i}", "email": f"lider{i}@bench.local",
+            "password_hash": password, "rol": ROLES[nivel], "activo": True,
+            "id_lider_superior": superior + 999 if superior else None,
+        })
+    db.bulk_insert_mappings(Usuario, usuarios)
+    db.bulk_insert_mappings(Persona, [
+        {
+            "nombre": f"Persona {i}", "id_lider_responsable": 1000 + random.randrange(args.lideres),
+            "id_usuario_registro": 1000, "seccion_electoral": str(random.randrange(1, 400)),
+            "colonia": f"Colonia {random.randrange(150)}", "activo": random.random() > 0.05,
+        }
+        for i in range(args.personas)
+    ])
+    db.commit()
+
+
+def medir(client, email, password):
+    token = client.post("/token", data={"username": email, "password": password}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    consultas = []
+
+    def contar(conn, cursor, statement, parameters, context, executemany):
+        consultas.append(statement)
+
+    event.listen(engine, "before_cursor_execute", contar)
+    inicio = time.perf_counter()
+    respuesta = client.get("/reportes/personas", headers=headers)
+    duracion = time.perf_counter() - inicio
+    event.remove(engine, "before_cursor_execute", contar)
+    datos = respuesta.json()
+    print(f"{email:28s} status={respuesta.status_code} consultas={len(consultas):3d} "
+          f"tiempo={duracion * 1000:8.1f} ms total_personas={datos.get('total_personas')}")
+
+
+with TestClient(app) as client:
+    db = SessionLocal()
+    poblar(db)
+    db.close()
+    print(f"Personas: {args.personas}  Lideres: {args.lideres}")
+    medir(client, "admin@redciudadana.com", "admin123")
+    medir(client, "lider0@bench.local", "bench")
+    medir(client, f"lider{args.lideres - 1}@bench.local", "bench")
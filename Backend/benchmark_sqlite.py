@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Prueba de concurrencia sobre SQLite: check-ins (POST /asistencias/) y
+lecturas (GET /asistencias/) al mismo tiempo en tres configuraciones:
+- default: sin el perfil de SQLite (journal por rollback, synchronous=FULL)
+- wal:     perfil sin escritor único (WAL, synchronous=NORMAL, cache/mmap)
+- perfil:  perfil completo (además, un solo escritor por engine)
+
+Cada proceso simula un worker de uvicorn con su propia app y sus clientes;
+todos comparten el mismo archivo. Se cuentan también las escrituras que
+fallan (p. ej. "database is locked").
+
+Usa una base SQLite temporal por corrida (no toca red_ciudadana.db):
+    python benchmark_sqlite.py --procesos 4 --escritores 4 --lectores 2 --segundos 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--procesos", type=int, default=4, help="workers (procesos) sobre la misma base")
+parser.add_argument("--escritores", type=int, default=4, help="clientes por proceso haciendo check-in")
+parser.add_argument("--lectores", type=int, default=2, help="clientes por proceso leyendo asistencias")
+parser.add_argument("--personas", type=int, default=20000)
+parser.add_argument("--segundos", type=float, default=10)
+parser.add_argument("--_hijo", type=int, help=argparse.SUPPRESS)
+parser.add_argument("--_preparar", action="store_true", help=argparse.SUPPRESS)
+args = parser.parse_args()
+
+CONFIGURACIONES = {
+    "default": {"SQLITE_OPTIMIZADO": "0"},
+    "wal": {"SQLITE_OPTIMIZADO": "1", "SQLITE_ESCRITOR_UNICO": "0"},
+    "perfil": {"SQLITE_OPTIMIZADO": "1", "SQLITE_ESCRITOR_UNICO": "1"},
+}
+
+
+def lanzar():
+    print(f"Procesos: {args.procesos}  Escritores: {args.escritores}  Lectores: {args.lectores}  "
+          f"Segundos: {args.segundos}")
+    comun = ["--personas", str(args.personas), "--segundos", str(args.segundos),
+             "--escritores", str(args.escritores), "--lectores", str(args.lectores)]
+    for nombre, variables in CONFIGURACIONES.items():
+        tmpdir = tempfile.mkdtemp(prefix="bench_sqlite_")
+        env = dict(os.environ, **variables, PYTHONWARNINGS="ignore",
+                   DATABASE_URL=f"sqlite:///{os.path.join(tmpdir, 'bench.db')}")
+        subprocess.run([sys.executable, __file__, "--_preparar"] + comun, env=env, check=True)
+        hijos = [subprocess.Popen([sys.executable, __file__, "--_hijo", str(n)] + comun, env=env,
+                                  stdout=subprocess.PIPE, text=True)
+                 for n in range(args.procesos)]
+        resultados = [json.loads(h.communicate()[0].strip().splitlines()[-1]) for h in hijos]
+        resumir(nombre, resultados)
+
+
+def resumir(perfil, resultados):
+    for tipo in ("escrituras", "lecturas"):
+        valores = sorted(v for r in resultados for v in r[tipo])
+        if not valores:
+            continue
+        p95 = valores[int(len(valores) * 0.95) - 1]
+        print(f"{perfil:8s}{tipo:10s} req/s={len(valores) / args.segundos:8.1f} "
+              f"p50={statistics.median(valores) * 1000:7.1f} ms p95={p95 * 1000:7.1f} ms")
+    errores = {}
+    for r in resultados:
+        for motivo, n in r["errores"].items():
+            errores[motivo] = errores.get(motivo, 0) + n
+    print(f"{perfil:8s}errores: {sum(errores.values())} {dict(list(errores.items())[:3]) if errores else ''}")
+
+
+def preparar_base():
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import logging
+    logging.disable(logging.WARNING)
+    from sqlalchemy import insert
+    from app.database import SessionLocal
+    from app.auth import get_password_hash
+    from app.migraciones import aplicar_migraciones
+    from app.database import engine
+    from app.models import Usuario, Persona, Evento
+
+    aplicar_migraciones(engine)
+    db = SessionLocal()
+    lider = Usuario(username="bench", nombre="Bench", email="bench@bench.local",
+                    password_hash=get_password_hash("bench"), rol="admin", activo=True)
+    db.add(lider)
+    db.flush()
+    evento = Evento(nombre="Evento bench", fecha=datetime.utcnow(), id_lider_organizador=lider.id)
+    db.add(evento)
+    db.execute(insert(Persona), [
+        {"nombre": f"Persona {i}", "id_lider_responsable": lider.id, "id_usuario_registro": lider.id, "activo": True}
+        for i in range(args.personas)
+    ])
+    db.commit()
+    db.close()
+
+
+async def medir():
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import logging
+    logging.disable(logging.WARNING)
+
+    import httpx
+    from app.main import app
+
+    latencias = {"escrituras": [], "lecturas": []}
+    errores = {}
+    # Cada proceso registra personas distintas en el único evento
+    siguiente = iter(range(args._hijo + 1, args.personas + 1, args.procesos))
+    fin = time.perf_counter() + args.segundos
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+        r = await client.post("/token", data={"username": "bench@bench.local", "password": "bench"})
+        headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+        async def cliente(tipo, pedir):
+            while time.perf_counter() < fin:
+                inicio = time.perf_counter()
+                try:
+                    r = await pedir()
+                    ok, motivo = r.status_code == 200, r.text[:80]
+                except Exception as e:
+                    ok, motivo = False, str(e)[:80]
+                if ok:
+                    latencias[tipo].append(time.perf_counter() - inicio)
+                else:
+                    errores[f"{tipo}: {motivo}"] = errores.get(f"{tipo}: {motivo}", 0) + 1
+
+        def check_in():
+            return client.post("/asistencias/", headers=headers,
+                               json={"id_evento": 1, "id_persona": next(siguiente), "asistio": True})
+
+        def leer():
+            return client.get("/asistencias/?limit=1000", headers=headers)
+
+        await asyncio.gather(*(cliente("escrituras", check_in) for _ in range(args.escritores)),
+                             *(cliente("lecturas", leer) for _ in range(args.lectores)))
+
+    print(json.dumps({**latencias, "errores": errores}))
+
+
+if args._preparar:
+    preparar_base()
+elif args._hijo is not None:
+    asyncio.run(medir())
+else:
+    lanzar()
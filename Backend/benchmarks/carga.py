@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga de día de elección contra una instancia de prueba.
+
+Usuarios virtuales al estilo locust: cada uno inicia sesión y repite su tarea
+con una pausa aleatoria entre peticiones; arrancan escalonados durante
+``--rampa`` segundos. La mezcla imita un evento masivo:
+
+- vehiculo:  chofer mandando GPS (POST /ubicacion/actualizar) cada 2-4 s
+- escaner:   check-in por QR cada 1-3 s, alternando
+             /movilizaciones/{id}/checkin y /asistencias/{id}/checkin
+- tablero:   líder refrescando /reportes/asistencias-tiempo-real cada 4-6 s
+- mapa:      ciudadano abriendo /reportes-ciudadanos/mapa/pins cada 5-15 s
+
+Al final imprime por escenario y endpoint: peticiones, peticiones/s, tasa de
+error (estado >= 400, timeout o fallo de conexión) y p50/p95/p99/máx. Termina
+con código 1 si algún endpoint pasa de ``--max-errores``.
+
+Con ``--levantar`` toma los datos de ``generar_datos`` (los genera si faltan),
+copia la base y levanta uvicorn con ``--workers`` sobre ella. Sin
+``--levantar`` apunta a ``--host``, que debe servir una base de
+``generar_datos`` cuyo manifiesto se pasa con ``--manifiesto``. Un solo
+proceso generador llega a unos cientos de peticiones/s; para más carga,
+correr varios en paralelo contra el mismo host.
+
+Desde Backend/:
+    python -m benchmarks.carga --levantar --workers 2 --duracion 60
+    python -m benchmarks.carga --host http://localhost:8000 --manifiesto /tmp/datos.db.json \\
+        --vehiculos 300 --escaneres 50 --tableros 40
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+import httpx
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+RAIZ = os.path.dirname(DIRECTORIO)
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--host", default="http://localhost:8000")
+parser.add_argument("--manifiesto", help="JSON de generar_datos de la base que sirve --host")
+parser.add_argument("--levantar", action="store_true", help="levantar uvicorn sobre una copia de los datos")
+parser.add_argument("--workers", type=int, default=2, help="workers de uvicorn con --levantar")
+parser.add_argument("--escala", type=float, default=0.05, help="escala de los datos con --levantar")
+parser.add_argument("--seed", type=int, default=42)
+parser.add_argument("--datos", default=os.path.join(tempfile.gettempdir(), "red_ciudadana_bench"))
+parser.add_argument("--vehiculos", type=int, default=100)
+parser.add_argument("--escaneres", type=int, default=30)
+parser.add_argument("--tableros", type=int, default=20)
+parser.add_argument("--mapa", type=int, default=10)
+parser.add_argument("--duracion", type=float, default=60, help="segundos de carga")
+parser.add_argument("--rampa", type=float, default=10, help="segundos para arrancar a todos los usuarios")
+parser.add_argument("--timeout", type=float, default=30)
+parser.add_argument("--max-errores", type=float, default=0.01, help="tasa de error permitida por endpoint")
+parser.add_argument("--json", help="guardar los resultados en este archivo")
+args = parser.parse_args()
+
+
+class Resultados:
+    """Latencias (ms) y errores por (escenario, endpoint)."""
+
+    def __init__(self):
+        self.latencias = defaultdict(list)
+        self.errores = defaultdict(Counter)
+
+    async def medir(self, client, escenario, nombre, metodo, url, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            respuesta = await client.request(metodo, url, **kwargs)
+            error = str(respuesta.status_code) if respuesta.status_code >= 400 else None
+        except httpx.HTTPError as e:
+            respuesta, error = None, type(e).__name__
+        self.latencias[(escenario, nombre)].append((time.perf_counter() - inicio) * 1000)
+        if error:
+            self.errores[(escenario, nombre)][error] += 1
+        return respuesta
+
+
+def percentil(ordenados, p):
+    return ordenados[max(0, math.ceil(len(ordenados) * p) - 1)]
+
+
+class Sesiones:
+    """Un token por correo (None si falló el login); cada cuenta inicia sesión una sola vez."""
+
+    def __init__(self, client, resultados, password):
+        self.client = client
+        self.resultados = resultados
+        self.password = password
+        self.tokens = {}
+
+    async def cabeceras(self, email):
+        if email not in self.tokens:
+            self.tokens[email] = asyncio.ensure_future(self._login(email))
+        return await self.tokens[email]
+
+    async def _login(self, email):
+        r = await self.resultados.medir(self.client, "login", "POST /token", "POST", "/token",
+                                        data={"username": email, "password": self.password})
+        if r is None or r.status_code != 200:
+            return None  # el error ya quedó contado en "login"
+        return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+
+# --- Escenarios ----------------------------------------------------------------
+# Cada escenario es (pausa mínima, pausa máxima, fábrica); la fábrica recibe
+# (ctx, n, rng) y devuelve el correo con que inicia sesión (o None) y una
+# corrutina tarea(client, cabeceras) que hace una iteración.
+
+def vehiculo(ctx, n, rng):
+    vehiculos, eventos = ctx["vehiculos"], ctx["datos"]["eventos_hoy"]
+    v = vehiculos[n % len(vehiculos)]
+    evento = eventos[n % len(eventos)]
+    posicion = [29.0729 + rng.uniform(-0.2, 0.2), -110.9559 + rng.uniform(-0.2, 0.2)]
+
+    async def tarea(client, cabeceras):
+        posicion[0] += rng.uniform(-5e-4, 5e-4)
+        posicion[1] += rng.uniform(-5e-4, 5e-4)
+        await ctx["resultados"].medir(client, "vehiculo", "POST /ubicacion/actualizar", "POST", "/ubicacion/actualizar",
+                                      headers=cabeceras, json={
+                                          "latitud": posicion[0], "longitud": posicion[1],
+                                          "velocidad": rng.uniform(0, 60), "bateria": rng.randrange(10, 100),
+                                          "evento_id": evento, "vehiculo_id": v["id"]})
+    return v["email"], tarea
+
+
+def escaner(ctx, n, rng):
+    async def tarea(client, cabeceras):
+        asignacion = next(ctx["asignaciones"])
+        if next(ctx["alternar"]):
+            nombre, url = "POST /movilizaciones/{id}/checkin", f"/movilizaciones/{asignacion}/checkin"
+        else:
+            nombre, url = "POST /asistencias/{id}/checkin", f"/asistencias/{asignacion}/checkin"
+        await ctx["resultados"].medir(client, "escaner", nombre, "POST", url, headers=cabeceras)
+    return ctx["datos"]["lider_zona"]["email"], tarea
+
+
+def tablero(ctx, n, rng):
+    # Uno de cada cuatro es el admin (ve todos los eventos); el resto, líderes de zona
+    vehiculos = ctx["vehiculos"]
+    email = ctx["datos"]["admin"] if n % 4 == 0 else vehiculos[n % len(vehiculos)]["email"]
+
+    async def tarea(client, cabeceras):
+        await ctx["resultados"].medir(client, "tablero", "GET /reportes/asistencias-tiempo-real", "GET",
+                                      "/reportes/asistencias-tiempo-real", headers=cabeceras)
+    return email, tarea
+
+
+def mapa(ctx, n, rng):
+    async def tarea(client, cabeceras):
+        await ctx["resultados"].medir(client, "mapa", "GET /reportes-ciudadanos/mapa/pins", "GET",
+                                      "/reportes-ciudadanos/mapa/pins")
+    return None, tarea
+
+
+ESCENARIOS = {
+    "vehiculos": (2, 4, vehiculo),
+    "escaneres": (1, 3, escaner),
+    "tableros": (4, 6, tablero),
+    "mapa": (5, 15, mapa),
+}
+
+
+# --- Ejecución -----------------------------------------------------------------
+
+async def usuario(client, ctx, fabrica, pausa, n, arranque, fin):
+    rng = random.Random(args.seed * 100_003 + n)
+    email, tarea = fabrica(ctx, n, rng)
+    await asyncio.sleep(arranque)
+    cabeceras = await ctx["sesiones"].cabeceras(email) if email else {}
+    if cabeceras is None:
+        return
+    while time.monotonic() < fin:
+        await tarea(client, cabeceras)
+        await asyncio.sleep(rng.uniform(*pausa))
+
+
+async def correr(host, datos) -> tuple:
+    resultados = Resultados()
+    asignaciones = list(datos["asignaciones_hoy"])
+    random.Random(args.seed).shuffle(asignaciones)
+    usuarios = [(pausa_min, pausa_max, fabrica, getattr(args, nombre))
+                for nombre, (pausa_min, pausa_max, fabrica) in ESCENARIOS.items()]
+    total = sum(cantidad for *_, cantidad in usuarios)
+    limites = httpx.Limits(max_connections=total + 10, max_keepalive_connections=total + 10)
+    async with httpx.AsyncClient(base_url=host, timeout=args.timeout, limits=limites) as client:
+        ctx = {
+            "datos": datos,
+            "resultados": resultados,
+            "sesiones": Sesiones(client, resultados, datos["password"]),
+            # Bases generadas antes de que el manifiesto listara los vehículos
+            "vehiculos": datos.get("vehiculos") or [{"id": datos["movilizador"]["vehiculo_id"],
+                                                     "email": datos["movilizador"]["email"]}],
+            "asignaciones": itertools.cycle(asignaciones),
+            "alternar": itertools.cycle((True, False)),
+        }
+        print(f"Usuarios: {total} ({', '.join(f'{n} {getattr(args, n)}' for n in ESCENARIOS)}), "
+              f"{args.duracion:g} s contra {host}")
+        inicio = time.monotonic()
+        fin = inicio + args.rampa + args.duracion
+        tareas, n = [], 0
+        for pausa_min, pausa_max, fabrica, cantidad in usuarios:
+            for _ in range(cantidad):
+                arranque = args.rampa * n / max(1, total)
+                tareas.append(usuario(client, ctx, fabrica, (pausa_min, pausa_max), n, arranque, fin))
+                n += 1
+        await asyncio.gather(*tareas)
+        return resultados, time.monotonic() - inicio
+
+
+def resumir(resultados: Resultados, segundos: float) -> dict:
+    resumen = {}
+    print(f"\n{'escenario':10s} {'endpoint':40s} {'peticiones':>10s} {'pet/s':>7s} {'error':>7s} "
+          f"{'p50':>8s} {'p95':>8s} {'p99':>8s} {'máx':>8s}  (ms)")
+    for (escenario, nombre), latencias in sorted(resultados.latencias.items()):
+        latencias.sort()
+        errores = resultados.errores[(escenario, nombre)]
+        fila = {
+            "peticiones": len(latencias),
+            "por_segundo": round(len(latencias) / segundos, 1),
+            "tasa_error": round(sum(errores.values()) / len(latencias), 4),
+            "errores": dict(errores),
+            "p50_ms": round(percentil(latencias, 0.50), 1),
+            "p95_ms": round(percentil(latencias, 0.95), 1),
+            "p99_ms": round(percentil(latencias, 0.99), 1),
+            "max_ms": round(latencias[-1], 1),
+        }
+        resumen[f"{escenario} {nombre}"] = fila
+        detalle = "  " + ", ".join(f"{e}: {c}" for e, c in errores.most_common(3)) if errores else ""
+        print(f"{escenario:10s} {nombre:40s} {fila['peticiones']:10d} {fila['por_segundo']:7.1f} "
+              f"{fila['tasa_error']:7.1%} {fila['p50_ms']:8.1f} {fila['p95_ms']:8.1f} {fila['p99_ms']:8.1f} "
+              f"{fila['max_ms']:8.1f}{detalle}")
+    return resumen
+
+
+def puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def levantar() -> tuple:
+    sys.path.insert(0, RAIZ)
+    from benchmarks.generar_datos import copia_de_datos
+
+    copia, datos = copia_de_datos(args.datos, args.escala, args.seed)
+    puerto = puerto_libre()
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{copia}", RESUMENES_NOCTURNOS="0", PYTHONWARNINGS="ignore")
+    servidor = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(puerto),
+                                 "--workers", str(args.workers), "--log-level", "warning"], cwd=RAIZ, env=env)
+    host = f"http://127.0.0.1:{puerto}"
+    limite = time.monotonic() + 60
+    while True:
+        try:
+            if httpx.get(f"{host}/health", timeout=2).status_code == 200:
+                break
+        except httpx.HTTPError:
+            pass
+        if servidor.poll() is not None or time.monotonic() > limite:
+            servidor.kill()
+            sys.exit("uvicorn no arrancó")
+        time.sleep(0.5)
+    return servidor, host, datos, copia
+
+
+def main():
+    servidor = copia = None
+    if args.levantar:
+        servidor, host, datos, copia = levantar()
+    else:
+        if not args.manifiesto:
+            parser.error("indica --manifiesto (o usa --levantar)")
+        host = args.host
+        with open(args.manifiesto) as f:
+            datos = json.load(f)
+    try:
+        resultados, segundos = asyncio.run(correr(host, datos))
+    finally:
+        if servidor is not None:
+            servidor.terminate()
+            servidor.wait()
+            shutil.rmtree(os.path.dirname(copia), ignore_errors=True)
+
+    resumen = resumir(resultados, segundos)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"host": host, "segundos": round(segundos, 1), "usuarios": {n: getattr(args, n) for n in ESCENARIOS},
+                       "endpoints": resumen}, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+    excedidos = [nombre for nombre, fila in resumen.items() if fila["tasa_error"] > args.max_errores]
+    if excedidos:
+        print(f"\nTasa de error mayor a {args.max_errores:.1%}: {', '.join(excedidos)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
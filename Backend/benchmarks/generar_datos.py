@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Genera una base SQLite sintética y reproducible para los benchmarks.
+
+Con la misma ``--seed`` y ``--escala`` el contenido es idéntico. La escala 1
+corresponde a un despliegue estatal en día de elección:
+
+    padrón 1,000,000 · personas 200,000 · líderes 2,000 · eventos 500
+    reportes ciudadanos 50,000 · pings de ubicación 1,000,000
+
+Junto a la base se escribe ``<salida>.json`` con los tamaños y los
+datos que usan los escenarios (correos, eventos de hoy, rangos de ids).
+Todos los usuarios tienen la contraseña ``bench``.
+
+Desde Backend/:
+    python -m benchmarks.generar_datos --escala 0.05 --salida /tmp/datos.db
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ESCALA_COMPLETA = {
+    "padron": 1_000_000,
+    "personas": 200_000,
+    "lideres": 2_000,
+    "eventos": 500,
+    "reportes": 50_000,
+    "ubicaciones": 1_000_000,
+}
+MINIMOS = {"lideres": 20, "eventos": 10}
+
+PASSWORD = "bench"
+ADMIN_EMAIL = "admin@bench.redciudadana.mx"
+ASIGNADOS_POR_EVENTO = 40
+SECCIONES = 400
+LOTE = 10_000
+
+NOMBRES = ["JUAN", "MARIA", "JOSE", "GUADALUPE", "FRANCISCO", "ANA", "LUIS", "ROSA", "CARLOS", "LAURA",
+           "JESUS", "PATRICIA", "MIGUEL", "ELENA", "PEDRO", "SOFIA", "JORGE", "ADRIANA", "RAUL", "CLAUDIA"]
+APELLIDOS = ["HERNANDEZ", "GARCIA", "MARTINEZ", "LOPEZ", "GONZALEZ", "RODRIGUEZ", "PEREZ", "SANCHEZ",
+             "RAMIREZ", "CRUZ", "FLORES", "GOMEZ", "MORALES", "VAZQUEZ", "REYES", "JIMENEZ", "TORRES",
+             "DIAZ", "GUTIERREZ", "RUIZ", "MENDOZA", "AGUILAR", "ORTIZ", "MORENO", "CASTILLO", "ROMERO"]
+MUNICIPIOS = ["HERMOSILLO", "CAJEME", "NOGALES", "SAN LUIS RIO COLORADO", "NAVOJOA", "GUAYMAS",
+              "AGUA PRIETA", "CABORCA", "EMPALME", "HUATABAMPO"]
+TIPOS_REPORTE = ["baches", "iluminacion", "agua", "basura", "seguridad", "salud", "drenaje", "otro"]
+ESTADOS_REPORTE = ["pendiente", "en_revision", "en_progreso", "resuelto", "rechazado"]
+CENTRO = (29.0729, -110.9559)
+
+
+def tamanos(escala: float) -> dict:
+    return {clave: max(MINIMOS.get(clave, 1), int(total * escala)) for clave, total in ESCALA_COMPLETA.items()}
+
+
+def elector_padron(i: int) -> str:
+    return f"EL{i:016d}"
+
+
+def _insertar(conn, tabla, filas):
+    lote = []
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) == LOTE:
+            conn.execute(tabla.insert(), lote)
+            lote = []
+    if lote:
+        conn.execute(tabla.insert(), lote)
+
+
+def _lideres(rng, n):
+    """Árbol estatal -> regionales -> municipales -> zona; ids 2..n+1 (el 1 es el admin)."""
+    regionales = max(1, n // 100)
+    municipales = max(1, n // 10)
+    niveles = []
+    for k in range(n):
+        if k == 0:
+            niveles.append(("lider_estatal", None))
+        elif k <= regionales:
+            niveles.append(("lider_regional", 2))
+        elif k <= regionales + municipales:
+            niveles.append(("lider_municipal", 3 + rng.randrange(regionales)))
+        else:
+            niveles.append(("lider_zona", 3 + regionales + rng.randrange(municipales)))
+    return niveles
+
+
+def generar(salida: str, escala: float, seed: int) -> dict:
+    os.environ["DATABASE_URL"] = f"sqlite:///{salida}"
+    os.environ["RESUMENES_NOCTURNOS"] = "0"
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    from app.auth import get_password_hash
+    from app.contadores_red import reconstruir_contadores
+    from app.database import SessionLocal, engine
+    from app.migraciones import aplicar_migraciones
+    from app.models import (AsignacionMovilizacion, Asistencia, Evento, Persona, ReporteCiudadano,
+                            UbicacionTiempoReal, Usuario, Vehiculo)
+    from app.models_padron import PadronElectoral
+    from app.resumenes import generar_resumenes
+
+    rng = random.Random(seed)
+    n = tamanos(escala)
+    ahora = datetime.utcnow().replace(microsecond=0)
+    hoy = ahora.replace(hour=0, minute=0, second=0)
+    password_hash = get_password_hash(PASSWORD)
+    aplicar_migraciones(engine)
+
+    niveles = _lideres(rng, n["lideres"])
+    ids_zona = [k + 2 for k, (rol, _) in enumerate(niveles) if rol == "lider_zona"]
+    ids_lideres = list(range(2, n["lideres"] + 2))
+    movilizadores = ids_zona[: max(1, len(ids_zona) // 10)]
+    vehiculos = [(v + 1, movilizadores[v % len(movilizadores)]) for v in range(len(movilizadores) * 2)]
+    # El último 5% de los eventos es hoy (check-in); el resto ya pasó
+    eventos_hoy = list(range(n["eventos"] - max(1, n["eventos"] // 20) + 1, n["eventos"] + 1))
+
+    with engine.begin() as conn:
+        _insertar(conn, Usuario.__table__, [
+            {"id": 1, "username": "admin_bench", "nombre": "Admin Bench", "email": ADMIN_EMAIL,
+             "password_hash": password_hash, "rol": "admin", "activo": True, "token_version": 0},
+        ] + [
+            {"id": k + 2, "username": f"lider{k}", "nombre": f"Lider {k}", "email": f"lider{k}@bench.redciudadana.mx",
+             "password_hash": password_hash, "rol": rol, "id_lider_superior": superior, "activo": True,
+             "token_version": 0}
+            for k, (rol, superior) in enumerate(niveles)
+        ])
+
+        # Al padrón se le asigna líder en 1 de cada 10 registros
+        _insertar(conn, PadronElectoral.__table__, (
+            {"id": i, "consecutivo": i, "elector": elector_padron(i), "curp": f"CURP{i:014d}",
+             "nombre": rng.choice(NOMBRES), "ape_pat": rng.choice(APELLIDOS), "ape_mat": rng.choice(APELLIDOS),
+             "sexo": rng.choice("HM"), "edad": rng.randrange(18, 90), "colonia": f"COLONIA {rng.randrange(300)}",
+             "codpostal": f"83{rng.randrange(1000):03d}", "entidad": "SONORA", "distrito": str(rng.randrange(1, 8)),
+             "municipio": rng.choice(MUNICIPIOS), "seccion": str(rng.randrange(1, SECCIONES + 1)), "activo": True,
+             "id_lider_asignado": rng.choice(ids_lideres) if i % 10 == 0 else None}
+            for i in range(1, n["padron"] + 1)
+        ))
+
+        _insertar(conn, Persona.__table__, (
+            {"id": i, "nombre": f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)}", "clave_elector": f"PE{i:016d}",
+             "seccion_electoral": str(rng.randrange(1, SECCIONES + 1)), "colonia": f"COLONIA {rng.randrange(300)}",
+             "municipio": rng.choice(MUNICIPIOS), "id_lider_responsable": rng.choice(ids_lideres),
+             "id_usuario_registro": 1, "activo": rng.random() > 0.05, "acepta_politica": True,
+             "latitud": CENTRO[0] + rng.uniform(-0.2, 0.2), "longitud": CENTRO[1] + rng.uniform(-0.2, 0.2),
+             "fecha_registro": ahora - timedelta(minutes=rng.randrange(525_600))}
+            for i in range(1, n["personas"] + 1)
+        ))
+
+        _insertar(conn, Evento.__table__, [
+            {"id": e, "nombre": f"Evento {e}", "tipo": rng.choice(["mitin", "reunion", "brigada"]),
+             "fecha": hoy + timedelta(hours=10) if e in eventos_hoy else hoy - timedelta(days=n["eventos"] - e + 1),
+             "id_lider_organizador": rng.choice(ids_lideres), "seccion_electoral": str(rng.randrange(1, SECCIONES + 1)),
+             "activo": True}
+            for e in range(1, n["eventos"] + 1)
+        ])
+        _insertar(conn, Vehiculo.__table__, [
+            {"id": v, "tipo": "camion", "capacidad": 40, "placas": f"BEN{v:04d}", "id_movilizador": m, "activo": True}
+            for v, m in vehiculos
+        ])
+
+        asignaciones, asistencias = [], []
+        for e in range(1, n["eventos"] + 1):
+            for persona in rng.sample(range(1, n["personas"] + 1), min(ASIGNADOS_POR_EVENTO, n["personas"])):
+                asignaciones.append({"id": len(asignaciones) + 1, "id_evento": e, "id_vehiculo": rng.choice(vehiculos)[0],
+                                     "id_persona": persona, "asistio": False})
+                if e not in eventos_hoy:
+                    asistio = rng.random() < 0.7
+                    asistencias.append({"id_evento": e, "id_persona": persona, "asistio": asistio, "movilizado": True,
+                                        "hora_checkin": hoy - timedelta(days=n["eventos"] - e) if asistio else None})
+        _insertar(conn, AsignacionMovilizacion.__table__, asignaciones)
+        _insertar(conn, Asistencia.__table__, asistencias)
+
+        _insertar(conn, ReporteCiudadano.__table__, (
+            {"id": r, "titulo": f"Reporte {r}", "descripcion": "Reporte generado para benchmark",
+             "tipo": rng.choice(TIPOS_REPORTE), "estado": rng.choice(ESTADOS_REPORTE),
+             "prioridad": rng.choice(["baja", "normal", "alta"]),
+             "latitud": CENTRO[0] + rng.uniform(-0.3, 0.3), "longitud": CENTRO[1] + rng.uniform(-0.3, 0.3),
+             "foto_url": f"/uploads/reportes/{r}.jpg" if rng.random() < 0.3 else None,
+             "es_publico": rng.random() < 0.8, "activo": True, "folio": f"RC-{r}", "votos": rng.randrange(20),
+             "colonia": f"COLONIA {rng.randrange(300)}", "fecha_creacion": ahora - timedelta(minutes=rng.randrange(525_600))}
+            for r in range(1, n["reportes"] + 1)
+        ))
+
+        # Pings históricos: todos inactivos salvo el último de cada movilizador
+        inicio_pings = ahora - timedelta(seconds=n["ubicaciones"] * 2)
+        _insertar(conn, UbicacionTiempoReal.__table__, (
+            {"id": u, "id_usuario": vehiculo[1], "vehiculo_id": vehiculo[0], "evento_id": rng.choice(eventos_hoy),
+             "latitud": CENTRO[0] + rng.uniform(-0.2, 0.2), "longitud": CENTRO[1] + rng.uniform(-0.2, 0.2),
+             "velocidad": rng.uniform(0, 80), "bateria": rng.randrange(5, 100),
+             "timestamp": inicio_pings + timedelta(seconds=u * 2), "activo": False}
+            for u, vehiculo in ((u, rng.choice(vehiculos)) for u in range(1, n["ubicaciones"] + 1))
+        ))
+        conn.exec_driver_sql(
+            "UPDATE ubicaciones_tiempo_real SET activo = 1 WHERE id IN "
+            "(SELECT max(id) FROM ubicaciones_tiempo_real GROUP BY id_usuario)"
+        )
+
+    db = SessionLocal()
+    try:
+        reconstruir_contadores(db)
+        generar_resumenes(db)
+        db.commit()
+    finally:
+        db.close()
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+    engine.dispose()
+
+    zona = ids_zona[0]
+    manifiesto = {
+        "escala": escala,
+        "seed": seed,
+        "tamanos": n,
+        "password": PASSWORD,
+        "admin": ADMIN_EMAIL,
+        "lider_zona": {"id": zona, "email": f"lider{zona - 2}@bench.redciudadana.mx"},
+        "movilizador": {"id": vehiculos[0][1], "email": f"lider{vehiculos[0][1] - 2}@bench.redciudadana.mx",
+                        "vehiculo_id": vehiculos[0][0]},
+        "vehiculos": [{"id": v, "movilizador": m, "email": f"lider{m - 2}@bench.redciudadana.mx"} for v, m in vehiculos],
+        "eventos_hoy": eventos_hoy,
+        "asignaciones_hoy": [a["id"] for a in asignaciones if a["id_evento"] in eventos_hoy],
+        "apellidos": APELLIDOS,
+        "secciones": SECCIONES,
+    }
+    with open(salida + ".json", "w") as f:
+        json.dump(manifiesto, f, indent=1)
+    return manifiesto
+
+
+def copia_de_datos(directorio: str, escala: float, seed: int) -> tuple:
+    """Copia temporal de la base para (escala, seed) y su manifiesto; la genera en ``directorio`` si falta."""
+    os.makedirs(directorio, exist_ok=True)
+    original = os.path.join(directorio, f"datos_e{escala:g}_s{seed}.db")
+    if not os.path.exists(original + ".json"):
+        for archivo in (original, original + ".json"):
+            if os.path.exists(archivo):
+                os.remove(archivo)
+        print(f"Generando datos (escala {escala:g}, seed {seed})...")
+        # En otro proceso: generar() fija DATABASE_URL antes de importar la app
+        subprocess.run([sys.executable, "-m", "benchmarks.generar_datos", "--escala", str(escala),
+                        "--seed", str(seed), "--salida", original],
+                       cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), check=True)
+    copia = os.path.join(tempfile.mkdtemp(prefix="bench_"), "bench.db")
+    shutil.copyfile(original, copia)
+    with open(original + ".json") as f:
+        return copia, json.load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--escala", type=float, default=0.05, help="1 = tamaños completos (ver arriba)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--salida", required=True, help="archivo .db a crear (no debe existir)")
+    args = parser.parse_args()
+    if os.path.exists(args.salida):
+        parser.error(f"{args.salida} ya existe")
+    inicio = time.perf_counter()
+    datos = generar(args.salida, args.escala, args.seed)
+    print(f"Datos generados en {time.perf_counter() - inicio:.1f} s: {datos['tamanos']}")
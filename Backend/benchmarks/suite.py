@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Suite de rendimiento: endpoints calientes contra una base SQLite sintética.
+
+1. Genera (o reutiliza de ``--datos``) la base de ``generar_datos`` para la
+   escala y semilla pedidas, y corre sobre una copia.
+2. Ejecuta cada escenario ``--iteraciones`` veces con TestClient, después de
+   unas vueltas de calentamiento, y mide p50/p95 y consultas SQL por llamada.
+   El cache de reportes se desactiva (REPORTES_CACHE_TTL=0) para medir las
+   consultas y no el cache.
+3. Compara contra ``linea_base.json`` (por escala). Es regresión si el p50
+   sube más de ``--tolerancia`` (y más de ``--margen-ms``) o si sube el número de
+   consultas; en ese caso termina con código 1.
+
+Los tiempos dependen de la máquina: la línea base debe grabarse en la misma
+máquina (o el mismo tipo de runner de CI) en que se compara. Las consultas
+por llamada no dependen de la máquina.
+
+Desde Backend/:
+    python -m benchmarks.suite                          # escala 0.05, compara
+    python -m benchmarks.suite --guardar-linea-base     # graba la línea base
+    python -m benchmarks.suite --escala 1 --solo padron_buscar_nombre,mapa_pins
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+RAIZ = os.path.dirname(DIRECTORIO)
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--escala", type=float, default=0.05)
+parser.add_argument("--seed", type=int, default=42)
+parser.add_argument("--iteraciones", type=int, default=30)
+parser.add_argument("--calentamiento", type=int, default=3)
+parser.add_argument("--datos", default=os.path.join(tempfile.gettempdir(), "red_ciudadana_bench"),
+                    help="directorio donde se guardan las bases generadas")
+parser.add_argument("--linea-base", default=os.path.join(DIRECTORIO, "linea_base.json"))
+parser.add_argument("--tolerancia", type=float, default=0.25, help="aumento de p50 permitido (0.25 = 25%%)")
+parser.add_argument("--margen-ms", type=float, default=5.0, help="aumento absoluto de p50 que se ignora (ruido)")
+parser.add_argument("--guardar-linea-base", action="store_true")
+parser.add_argument("--solo", help="escenarios separados por coma")
+args = parser.parse_args()
+
+
+# --- Escenarios ----------------------------------------------------------------
+# Cada escenario recibe (client, contexto, i) y hace una petición.
+
+def padron_buscar_nombre(client, ctx, i):
+    apellidos = ctx["datos"]["apellidos"]
+    return client.post("/api/padron/buscar", headers=ctx["admin"],
+                       json={"ape_pat": apellidos[i % len(apellidos)], "nombre": "MA", "limit": 50})
+
+
+def padron_buscar_seccion(client, ctx, i):
+    return client.post("/api/padron/buscar", headers=ctx["admin"],
+                       json={"seccion": str(i % ctx["datos"]["secciones"] + 1), "limit": 50})
+
+
+def persona_crear(client, ctx, i):
+    # i-ésima clave del padrón sin líder asignado (los múltiplos de 10 ya tienen), desde el final
+    tope = ctx["datos"]["tamanos"]["padron"] // 10 * 10
+    indice = tope - 1 - (i // 9) * 10 - i % 9
+    return client.post("/personas/", headers=ctx["lider"], json={
+        "nombre": f"Persona benchmark {i}", "clave_elector": f"EL{indice:016d}",
+        "id_lider_responsable": ctx["datos"]["lider_zona"]["id"], "seccion_electoral": "1",
+        "colonia": "COLONIA 1", "acepta_politica": True,
+    })
+
+
+def reporte_personas(client, ctx, i):
+    return client.get("/reportes/personas", headers=ctx["admin"])
+
+
+def reporte_personas_lider(client, ctx, i):
+    return client.get("/reportes/personas", headers=ctx["lider"])
+
+
+def reporte_eventos_historicos(client, ctx, i):
+    return client.get("/reportes/eventos-historicos", headers=ctx["admin"])
+
+
+def mapa_pins(client, ctx, i):
+    return client.get("/reportes-ciudadanos/mapa/pins")
+
+
+def checkin(client, ctx, i):
+    asignaciones = ctx["datos"]["asignaciones_hoy"]
+    return client.post(f"/asistencias/{asignaciones[i % len(asignaciones)]}/checkin", headers=ctx["admin"])
+
+
+def ubicacion_actualizar(client, ctx, i):
+    movilizador = ctx["datos"]["movilizador"]
+    return client.post("/ubicacion/actualizar", headers=ctx["movilizador"], json={
+        "latitud": 29.07 + i * 1e-4, "longitud": -110.95, "velocidad": 30, "bateria": 80,
+        "evento_id": ctx["datos"]["eventos_hoy"][0], "vehiculo_id": movilizador["vehiculo_id"],
+    })
+
+
+ESCENARIOS = [
+    padron_buscar_nombre, padron_buscar_seccion, persona_crear, reporte_personas, reporte_personas_lider,
+    reporte_eventos_historicos, mapa_pins, checkin, ubicacion_actualizar,
+]
+
+
+# --- Ejecución -----------------------------------------------------------------
+
+def medir(client, ctx, escenario) -> dict:
+    from app.medicion_consultas import presupuesto_consultas
+
+    for i in range(args.calentamiento):
+        escenario(client, ctx, args.iteraciones + i)
+    tiempos, consultas = [], []
+    for i in range(args.iteraciones):
+        with presupuesto_consultas(sys.maxsize) as sentencias:
+            inicio = time.perf_counter()
+            respuesta = escenario(client, ctx, i)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        if respuesta.status_code != 200:
+            raise RuntimeError(f"{escenario.__name__}: {respuesta.status_code} {respuesta.text[:200]}")
+        consultas.append(len(sentencias))
+    tiempos.sort()
+    return {
+        "p50_ms": round(statistics.median(tiempos), 2),
+        "p95_ms": round(tiempos[max(0, int(len(tiempos) * 0.95) - 1)], 2),
+        "consultas": int(statistics.median(consultas)),
+    }
+
+
+def comparar(resultados: dict, base: dict) -> list:
+    regresiones = []
+    print(f"\n{'escenario':28s} {'p50 ms':>9s} {'p95 ms':>9s} {'consultas':>9s}   vs línea base")
+    for nombre, r in resultados.items():
+        b = base.get(nombre)
+        comparacion = ""
+        if b:
+            cambio = (r["p50_ms"] - b["p50_ms"]) / b["p50_ms"] if b["p50_ms"] else 0
+            comparacion = f"p50 {cambio:+.0%} ({b['p50_ms']:.1f} ms), consultas {b['consultas']}"
+            if cambio > args.tolerancia and r["p50_ms"] - b["p50_ms"] > args.margen_ms:
+                regresiones.append(f"{nombre}: p50 {b['p50_ms']:.1f} -> {r['p50_ms']:.1f} ms")
+                comparacion += "  << REGRESIÓN"
+            if r["consultas"] > b["consultas"]:
+                regresiones.append(f"{nombre}: consultas {b['consultas']} -> {r['consultas']}")
+                comparacion += "  << MÁS CONSULTAS"
+        print(f"{nombre:28s} {r['p50_ms']:9.1f} {r['p95_ms']:9.1f} {r['consultas']:9d}   {comparacion}")
+    return regresiones
+
+
+def main():
+    from benchmarks.generar_datos import copia_de_datos
+
+    copia, datos = copia_de_datos(args.datos, args.escala, args.seed)
+    os.environ["DATABASE_URL"] = f"sqlite:///{copia}"
+    os.environ["RESUMENES_NOCTURNOS"] = "0"
+    os.environ["REPORTES_CACHE_TTL"] = "0"
+    sys.path.insert(0, RAIZ)
+    logging.disable(logging.WARNING)
+
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    escenarios = ESCENARIOS
+    if args.solo:
+        nombres = args.solo.split(",")
+        escenarios = [e for e in ESCENARIOS if e.__name__ in nombres]
+
+    with TestClient(app) as client:
+        def login(email):
+            r = client.post("/token", data={"username": email, "password": datos["password"]})
+            return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+        ctx = {"datos": datos, "admin": login(datos["admin"]), "lider": login(datos["lider_zona"]["email"]),
+               "movilizador": login(datos["movilizador"]["email"])}
+        resultados = {e.__name__: medir(client, ctx, e) for e in escenarios}
+
+    clave = f"{args.escala:g}"
+    lineas_base = {}
+    if os.path.exists(args.linea_base):
+        with open(args.linea_base) as f:
+            lineas_base = json.load(f)
+    regresiones = comparar(resultados, lineas_base.get(clave, {}).get("escenarios", {}))
+
+    if args.guardar_linea_base:
+        anterior = lineas_base.get(clave, {}).get("escenarios", {})
+        lineas_base[clave] = {
+            "seed": args.seed,
+            "iteraciones": args.iteraciones,
+            "tamanos": datos["tamanos"],
+            "maquina": f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPU, Python {platform.python_version()}",
+            "fecha": datetime.utcnow().strftime("%Y-%m-%d"),
+            "escenarios": {**anterior, **resultados},
+        }
+        with open(args.linea_base, "w") as f:
+            json.dump(lineas_base, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(f"\nLínea base guardada en {args.linea_base} (escala {clave})")
+    elif regresiones:
+        print("\nRegresiones:\n  " + "\n  ".join(regresiones))
+        sys.exit(1)
+    shutil.rmtree(os.path.dirname(copia), ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Mueve las fotos que siguen en base64 al almacén de fotos.
+
+Cada worker las mueve al arrancar, en un hilo de fondo y en lotes, salvo que
+el almacén no sea duradero (ALMACEN_FOTOS=disco con FOTOS_DIR_PERSISTENTE=0)
+o MOVER_FOTOS_BASE64=0. Después de configurar un almacén duradero, o para
+hacerlo fuera de la aplicación, se corre este script con las mismas variables
+de entorno que la aplicación:
+
+    python mover_fotos_base64.py
+"""
+import logging
+import sys
+
+from app.almacen_fotos import ALMACEN_FOTOS, almacen_duradero
+from app.database import engine
+from app.migraciones import mover_fotos_base64
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    if not almacen_duradero():
+        print(f"❌ El almacén '{ALMACEN_FOTOS}' no es duradero; las fotos se perderían al redesplegar")
+        return 1
+    movidas = mover_fotos_base64(engine)
+    print(f"✅ {movidas} fotos movidas al almacén '{ALMACEN_FOTOS}'")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
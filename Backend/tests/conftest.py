@@ -0,0 +1,119 @@
+"""Fixtures de las pruebas: la app sobre una base SQLite temporal con datos sembrados.
+
+Las variables de entorno se fijan antes de importar ``app``: base y fotos en
+un directorio temporal, sin tareas de fondo (resúmenes nocturnos, relleno de
+variantes, fotos en base64) y con los caches en memoria apagados (TTL 0), para
+que cada petición haga siempre sus consultas.
+"""
+import os
+import shutil
+import tempfile
+
+DIRECTORIO = tempfile.mkdtemp(prefix="red-ciudadana-pruebas-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(DIRECTORIO, 'pruebas.db')}",
+    "FOTOS_DIR": os.path.join(DIRECTORIO, "fotos"),
+    "FOTOS_CACHE_DIR": os.path.join(DIRECTORIO, "fotos-cache"),
+    "RESUMENES_NOCTURNOS": "0",
+    "RELLENO_VARIANTES": "0",
+    "MOVER_FOTOS_BASE64": "0",
+    "BCRYPT_ROUNDS": "4",
+    "AUTH_CACHE_TTL": "0",
+    "PERMISOS_CACHE_TTL": "0",
+    "REPORTES_CACHE_TTL": "0",
+    "ESTRUCTURA_CACHE_TTL": "0",
+    "METRICAS_MOVILIZACION_CACHE_TTL": "0",
+})
+
+import pytest  # noqa: E402
+from datetime import datetime, timedelta  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+ROLES_LIDER = ["lider_estatal", "lider_regional", "lider_municipal", "lider_zona"]
+
+
+def sembrar(db):
+    """Una red de 4 niveles (1 + 3 + 9 + 27 líderes), personas, eventos y reportes ciudadanos.
+
+    Tiene suficientes filas de cada tipo para que una consulta por líder, por
+    evento o por reporte (N+1) rebase cualquier presupuesto de las pruebas."""
+    from app.auth import get_password_hash
+    from app.contadores_red import reconstruir_contadores
+    from app.models import Asistencia, Evento, FotoReporte, Persona, ReporteCiudadano, Usuario
+
+    clave = get_password_hash("clave")
+    niveles = []
+    for nivel, rol in enumerate(ROLES_LIDER):
+        # Un líder estatal; cada líder de los demás niveles tiene tres subordinados
+        superiores = [None] if nivel == 0 else [s for s in niveles[-1] for _ in range(3)]
+        actuales = [
+            Usuario(username=f"{rol}{i}", nombre=f"{rol} {i}", email=f"{rol}{i}@pruebas.mx",
+                    password_hash=clave, rol=rol, activo=True,
+                    id_lider_superior=superior.id if superior else None)
+            for i, superior in enumerate(superiores)
+        ]
+        db.add_all(actuales)
+        db.flush()
+        niveles.append(actuales)
+    lideres = [l for nivel in niveles for l in nivel]
+
+    personas = []
+    for i in range(200):
+        lider = lideres[i % len(lideres)]
+        personas.append(Persona(nombre=f"Persona {i}", id_lider_responsable=lider.id, id_usuario_registro=lider.id,
+                                seccion_electoral=str(100 + i % 12), colonia=f"Colonia {i % 8}", activo=i % 10 != 0))
+    db.add_all(personas)
+    db.flush()
+
+    for e in range(12):
+        evento = Evento(nombre=f"Evento {e}", fecha=datetime.utcnow() - timedelta(days=e), tipo="reunion",
+                        id_lider_organizador=lideres[e].id, activo=True)
+        db.add(evento)
+        db.flush()
+        db.add_all(Asistencia(id_evento=evento.id, id_persona=p.id, asistio=p.id % 2 == 0, movilizado=p.id % 3 == 0)
+                   for p in personas[e * 10:e * 10 + 15])
+
+    for r in range(30):
+        reporte = ReporteCiudadano(titulo=f"Reporte {r}", descripcion="d", tipo="basura_alumbrado",
+                                   latitud=29 + r / 100, longitud=-110, estado="pendiente", prioridad="normal",
+                                   activo=True, es_publico=True,
+                                   foto_url=f"/fotos/{r:064x}.jpg" if r % 2 else None)
+        db.add(reporte)
+        db.flush()
+        if not r % 2:
+            db.add(FotoReporte(id_reporte=reporte.id, nombre_archivo="a.jpg", url=f"/fotos/{r:064x}.jpg",
+                               tipo="image/jpeg", tamaño=10, activo=True))
+    reconstruir_contadores(db)
+    db.commit()
+
+
+@pytest.fixture(scope="session")
+def client():
+    from app.database import SessionLocal
+    from app.main import app
+
+    with TestClient(app) as cliente:
+        db = SessionLocal()
+        try:
+            sembrar(db)
+        finally:
+            db.close()
+        yield cliente
+    shutil.rmtree(DIRECTORIO, ignore_errors=True)
+
+
+def _token(client, email, password):
+    respuesta = client.post("/token", data={"username": email, "password": password})
+    assert respuesta.status_code == 200, respuesta.text
+    return {"Authorization": f"Bearer {respuesta.json()['access_token']}"}
+
+
+@pytest.fixture(scope="session")
+def admin(client):
+    return _token(client, "admin@redciudadana.com", "admin123")
+
+
+@pytest.fixture(scope="session")
+def lider(client):
+    """Líder regional: su alcance es un subárbol (3 municipales y 9 de zona)."""
+    return _token(client, "lider_regional0@pruebas.mx", "clave")
@@ -0,0 +1,104 @@
+"""Almacén de fotos direccionado por contenido y paso de las fotos en base64 al almacén."""
+import base64
+import hashlib
+import io
+import os
+
+import pytest
+
+from app import almacen_fotos
+from app.almacen_fotos import AlmacenDisco, guardar_archivo, guardar_foto
+
+JPEG = b"\xff\xd8\xff\xe0" + b"foto de prueba" * 50
+PNG = b"\x89PNG\r\n\x1a\n" + b"otra foto" * 50
+
+
+def _archivos(directorio):
+    return [f for _, _, nombres in os.walk(directorio) for f in nombres]
+
+
+def test_clave_es_el_hash_del_contenido(tmp_path, monkeypatch):
+    monkeypatch.setattr(almacen_fotos, "_almacen", AlmacenDisco(str(tmp_path)))
+    url = guardar_foto(JPEG)
+    assert url == f"/fotos/{hashlib.sha256(JPEG).hexdigest()}.jpg"
+    assert guardar_foto(PNG, "image/png").endswith(".png")
+    assert almacen_fotos.almacen().leer(url[len("/fotos/"):-4]) == JPEG
+
+
+def test_misma_foto_se_guarda_una_vez(tmp_path, monkeypatch):
+    monkeypatch.setattr(almacen_fotos, "_almacen", AlmacenDisco(str(tmp_path)))
+    assert guardar_foto(JPEG) == guardar_foto(JPEG, "image/jpeg")
+    url, tamano = guardar_archivo(io.BytesIO(JPEG))
+    assert url == guardar_foto(JPEG) and tamano == len(JPEG)
+    assert _archivos(tmp_path) == [hashlib.sha256(JPEG).hexdigest()]
+
+    # Un archivo que ya está en el almacén no se vuelve a escribir
+    monkeypatch.setattr(AlmacenDisco, "guardar_archivo", lambda *a: pytest.fail("reescribió la foto"))
+    assert guardar_archivo(io.BytesIO(JPEG))[0] == url
+
+
+def test_almacen_en_la_base(client, tmp_path):
+    from app.database import engine
+    from app.models import FotoAlmacen
+
+    destino = almacen_fotos.AlmacenBase(str(tmp_path))
+    clave = destino.guardar(PNG)
+    assert destino.guardar(PNG) == clave == hashlib.sha256(PNG).hexdigest()
+    with engine.connect() as conn:
+        filas = conn.execute(FotoAlmacen.__table__.select().where(FotoAlmacen.clave == clave)).all()
+    assert len(filas) == 1
+    # La primera lectura va a la base y deja la foto en el caché local
+    assert destino.ruta(clave) is None
+    assert destino.leer(clave) == PNG
+    assert destino.ruta(clave) is not None
+
+
+def test_servir_foto(client):
+    url = guardar_foto(JPEG)
+    respuesta = client.get(url)
+    assert respuesta.status_code == 200
+    assert respuesta.content == JPEG
+    assert respuesta.headers["content-type"] == "image/jpeg"
+    etag = respuesta.headers["etag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    parcial = client.get(url, headers={"Range": "bytes=0-3"})
+    assert parcial.status_code == 206 and parcial.content == JPEG[:4]
+    assert client.get(f"/fotos/{'0' * 64}.jpg").status_code == 404
+
+
+def test_mover_fotos_base64(client):
+    from app.database import SessionLocal, engine
+    from app.migraciones import mover_fotos_base64
+    from app.models import FotoReporte, ReporteCiudadano
+
+    db = SessionLocal()
+    try:
+        reporte = ReporteCiudadano(titulo="Con base64", descripcion="d", tipo="basura_alumbrado", latitud=29,
+                                   longitud=-110, estado="pendiente", prioridad="normal", activo=True,
+                                   foto_url="data:image/png;base64," + base64.b64encode(PNG).decode())
+        db.add(reporte)
+        db.flush()
+        en_base64 = FotoReporte(id_reporte=reporte.id, nombre_archivo="a.jpg", tipo="image/jpeg", tamaño=0,
+                                contenido_base64=base64.b64encode(JPEG).decode())
+        invalida = FotoReporte(id_reporte=reporte.id, nombre_archivo="b.jpg", tipo="image/jpeg", tamaño=0,
+                               contenido_base64="esto no es base64")
+        db.add_all([en_base64, invalida])
+        db.commit()
+
+        assert mover_fotos_base64(engine) == 2
+        db.expire_all()
+        assert reporte.foto_url == guardar_foto(PNG)
+        assert en_base64.url == guardar_foto(JPEG)
+        assert en_base64.contenido_base64 is None and en_base64.tamaño == len(JPEG)
+        # Lo que no es base64 válido se deja como estaba
+        assert invalida.contenido_base64 == "esto no es base64" and invalida.url is None
+        assert client.get(en_base64.url).content == JPEG
+
+        # Repetirlo no mueve nada
+        assert mover_fotos_base64(engine) == 0
+    finally:
+        db.rollback()
+        db.query(FotoReporte).filter(FotoReporte.id_reporte == reporte.id).delete()
+        db.delete(reporte)
+        db.commit()
+        db.close()
@@ -0,0 +1,16 @@
+"""Las dependencias pesadas se importan al usarlas, no al arrancar la app."""
+import os
+import subprocess
+import sys
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PEREZOSOS = ["PIL", "pandas", "dbf", "requests"]
+
+
+def test_importar_app_no_carga_dependencias_pesadas():
+    # Proceso aparte: en este ya pudieron importarse por otras pruebas
+    codigo = f"import sys, app.main; print([m for m in {PEREZOSOS!r} if m in sys.modules])"
+    salida = subprocess.run([sys.executable, "-c", codigo], cwd=BACKEND, env=os.environ,
+                            capture_output=True, text=True, check=True).stdout
+    assert salida.strip().splitlines()[-1] == "[]"
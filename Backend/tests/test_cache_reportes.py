@@ -0,0 +1,99 @@
+"""Cache de /reportes/*: una escritura sube la generación y el alcance separa las claves.
+
+Las pruebas encienden el cache (conftest lo apaga) con un backend en memoria
+nuevo, para no depender de lo que hayan cacheado otras pruebas.
+"""
+import pytest
+
+from app import cache_reportes
+from app.medicion_consultas import presupuesto_consultas
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    backend = cache_reportes.MemoriaBackend(ttl=60, maxsize=100)
+    monkeypatch.setattr(cache_reportes, "REPORTES_CACHE_TTL", 60)
+    monkeypatch.setattr(cache_reportes, "backend", backend)
+    return backend
+
+
+def _consultas(client, ruta, headers):
+    with presupuesto_consultas(100) as sentencias:
+        respuesta = client.get(ruta, headers=headers)
+    assert respuesta.status_code == 200, respuesta.text
+    return respuesta.json(), len(sentencias)
+
+
+def test_escritura_sube_generacion(client, admin, cache):
+    from app.database import SessionLocal
+    from app.models import Persona
+
+    primero, consultas_primero = _consultas(client, "/reportes/personas", admin)
+    repetido, consultas_repetido = _consultas(client, "/reportes/personas", admin)
+    assert repetido == primero
+    # Solo la autenticación: el reporte sale del cache
+    assert consultas_repetido == 1 < consultas_primero
+
+    generacion = cache.generaciones(["personas"])[0]
+    db = SessionLocal()
+    try:
+        persona = db.query(Persona).filter(Persona.activo == True).order_by(Persona.id).first()
+        colonia = persona.colonia
+        persona.colonia = "Colonia de prueba"
+        db.commit()
+        assert cache.generaciones(["personas"])[0] == generacion + 1
+
+        despues, consultas_despues = _consultas(client, "/reportes/personas", admin)
+        assert consultas_despues == consultas_primero
+        assert despues["personas_por_colonia"]["Colonia de prueba"] == 1
+    finally:
+        persona.colonia = colonia
+        db.commit()
+        db.close()
+
+
+def test_rollback_no_sube_generacion(client, cache):
+    from app.database import SessionLocal
+    from app.models import Persona
+
+    db = SessionLocal()
+    try:
+        db.query(Persona).filter(Persona.id == -1).update({Persona.colonia: "x"}, synchronize_session=False)
+        db.rollback()
+    finally:
+        db.close()
+    assert cache.generaciones(["personas"]) == [0]
+
+
+def test_alcance_separa_claves(client, admin, lider, cache):
+    del_admin, _ = _consultas(client, "/reportes/personas", admin)
+    del_lider, consultas_lider = _consultas(client, "/reportes/personas", lider)
+    # El líder no recibe la entrada del admin: calcula la suya, más chica
+    assert consultas_lider > 1
+    assert del_lider["total_personas"] < del_admin["total_personas"]
+    assert _consultas(client, "/reportes/personas", lider) == (del_lider, 1)
+    assert _consultas(client, "/reportes/personas", admin) == (del_admin, 1)
+
+
+def test_replica_no_cachea_justo_despues_de_un_cambio(client, admin, cache, monkeypatch):
+    # Leído de una réplica que quizá aún no tiene el cambio: se devuelve sin guardarlo
+    monkeypatch.setattr(cache_reportes, "sesion_en_replica", lambda db: True)
+    cache_reportes.invalidar("personas")
+    _, consultas = _consultas(client, "/reportes/personas", admin)
+    assert _consultas(client, "/reportes/personas", admin)[1] == consultas
+
+    # Pasada la ventana de LECTURA_PROPIA_SEGUNDOS sí se guarda
+    monkeypatch.setattr(cache_reportes, "LECTURA_PROPIA_SEGUNDOS", 0)
+    _consultas(client, "/reportes/personas", admin)
+    assert _consultas(client, "/reportes/personas", admin)[1] == 1
+
+
+def test_alcance():
+    class U:
+        def __init__(self, id, rol):
+            self.id, self.rol = id, rol
+
+    assert cache_reportes.alcance(None) == "anonimo"
+    assert cache_reportes.alcance(U(1, "admin")) == "admin"
+    assert cache_reportes.alcance(U(7, "lider_zona")) == "red:7"
+    assert cache_reportes.alcance(U(7, "capturista")) == "usuario:7"
@@ -0,0 +1,122 @@
+"""contadores_red coincide con un recálculo completo después de cada escritura por la API.
+
+La prueba trabaja con líderes y personas propios y al final los borra y
+reconstruye los contadores, para no cambiar los totales de las demás pruebas.
+"""
+import pytest
+
+from app.contadores_red import reconstruir_contadores, verificar_contadores
+
+
+def _db():
+    from app.database import SessionLocal
+    return SessionLocal()
+
+
+def _sin_diferencias():
+    db = _db()
+    try:
+        assert verificar_contadores(db) == []
+    finally:
+        db.close()
+
+
+def _contador(id_usuario):
+    from app.models import ContadorRed
+
+    db = _db()
+    try:
+        c = db.get(ContadorRed, id_usuario)
+        return (c.personas_directas, c.personas_red, c.lideres_red) if c else None
+    finally:
+        db.close()
+
+
+def _id_de(email):
+    from app.models import Usuario
+
+    db = _db()
+    try:
+        return db.query(Usuario.id).filter(Usuario.email == email).scalar()
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def limpiar(client):
+    from app.models import ContadorRed, Persona, ProbableDuplicado, Usuario
+
+    db = _db()
+    ultima_persona = db.query(Persona.id).order_by(Persona.id.desc()).limit(1).scalar()
+    ultimo_usuario = db.query(Usuario.id).order_by(Usuario.id.desc()).limit(1).scalar()
+    db.close()
+    yield
+    db = _db()
+    try:
+        db.query(ProbableDuplicado).filter(
+            (ProbableDuplicado.id_persona_1 > ultima_persona) | (ProbableDuplicado.id_persona_2 > ultima_persona)
+        ).delete()
+        db.query(Persona).filter(Persona.id > ultima_persona).delete()
+        db.query(ContadorRed).filter(ContadorRed.id_usuario > ultimo_usuario).delete()
+        db.query(Usuario).filter(Usuario.id > ultimo_usuario).delete()
+        reconstruir_contadores(db)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _crear_lider(client, email, rol, superior):
+    respuesta = client.post("/users/", json={"nombre": email, "email": email, "rol": rol,
+                                             "password": "clave", "id_lider_superior": superior})
+    assert respuesta.status_code == 200, respuesta.text
+    return respuesta.json()["id"]
+
+
+def _crear_persona(client, admin, nombre, lider):
+    respuesta = client.post("/personas/", headers=admin, json={"nombre": nombre, "id_lider_responsable": lider})
+    assert respuesta.status_code == 200, respuesta.text
+    return respuesta.json()["id"]
+
+
+def test_contadores_tras_cada_escritura(client, admin, limpiar):
+    regional = _id_de("lider_regional1@pruebas.mx")
+    otro_regional = _id_de("lider_regional2@pruebas.mx")
+    regional_antes = _contador(regional)
+
+    # Alta de líderes
+    municipal = _crear_lider(client, "municipal.contadores@pruebas.mx", "lider_municipal", regional)
+    zona = _crear_lider(client, "zona.contadores@pruebas.mx", "lider_zona", municipal)
+    _sin_diferencias()
+    assert _contador(municipal) == (0, 0, 1)
+
+    # Alta de personas
+    personas = [_crear_persona(client, admin, f"Contada {i}", zona) for i in range(3)]
+    _sin_diferencias()
+    assert _contador(zona) == (3, 3, 0)
+    assert _contador(regional)[1] == regional_antes[1] + 3
+
+    # Cambio de líder y baja de una persona
+    respuesta = client.put(f"/personas/{personas[0]}", headers=admin, json={"id_lider_responsable": municipal})
+    assert respuesta.status_code == 200, respuesta.text
+    assert client.delete(f"/personas/{personas[1]}", headers=admin).status_code == 200
+    _sin_diferencias()
+    assert _contador(zona) == (1, 1, 0)
+    assert _contador(municipal) == (1, 2, 1)
+
+    # Mover el subárbol a otro superior
+    respuesta = client.put(f"/users/{municipal}", headers=admin, json={"id_lider_superior": otro_regional})
+    assert respuesta.status_code == 200, respuesta.text
+    _sin_diferencias()
+    assert _contador(regional) == regional_antes
+
+    # Un superior dentro de la propia red crearía un ciclo
+    respuesta = client.put(f"/users/{municipal}", headers=admin, json={"id_lider_superior": zona})
+    assert respuesta.status_code == 400
+
+    # Baja y reactivación del líder con su red
+    assert client.delete(f"/users/{municipal}", headers=admin).status_code == 200
+    _sin_diferencias()
+    respuesta = client.put(f"/users/{municipal}", headers=admin, json={"activo": True})
+    assert respuesta.status_code == 200, respuesta.text
+    _sin_diferencias()
+    assert _contador(municipal) == (1, 2, 1)
@@ -0,0 +1,75 @@
+"""Exportaciones CSV / XLSX: contenido, alcance del usuario y envío por bloques."""
+import csv
+import io
+
+from openpyxl import load_workbook
+
+from app import exportacion
+
+
+def _csv(respuesta):
+    assert respuesta.status_code == 200, respuesta.text
+    texto = respuesta.content.decode("utf-8")
+    assert texto.startswith("\ufeff")
+    return list(csv.reader(io.StringIO(texto[1:])))
+
+
+def test_personas_csv(client, admin, lider):
+    respuesta = client.get("/reportes/personas/exportar?formato=csv", headers=admin)
+    filas = _csv(respuesta)
+    assert respuesta.headers["content-type"].startswith("text/csv")
+    assert 'filename="personas_' in respuesta.headers["content-disposition"]
+    assert filas[0][:2] == ["ID", "Nombre"]
+    # Solo las personas activas, una fila por persona, en orden de ID
+    assert len(filas) - 1 == int(respuesta.headers["x-total-filas"]) == 180
+    ids = [int(f[0]) for f in filas[1:]]
+    assert ids == sorted(ids)
+
+    del_lider = _csv(client.get("/reportes/personas/exportar?formato=csv", headers=lider))
+    assert 1 < len(del_lider) < len(filas)
+    assert {f[0] for f in del_lider[1:]} <= {f[0] for f in filas[1:]}
+
+
+def test_personas_xlsx_igual_a_csv(client, admin):
+    filas_csv = _csv(client.get("/reportes/personas/exportar?formato=csv", headers=admin))
+    respuesta = client.get("/reportes/personas/exportar?formato=xlsx", headers=admin)
+    assert respuesta.status_code == 200, respuesta.text
+    hoja = load_workbook(io.BytesIO(respuesta.content), read_only=True).active
+    filas_xlsx = [["" if v is None else str(v) for v in fila] for fila in hoja.iter_rows(values_only=True)]
+    assert len(filas_xlsx) == len(filas_csv)
+    assert filas_xlsx[0] == filas_csv[0]
+    # Las primeras columnas (ID a Líder) son texto o números iguales en los dos formatos
+    assert [f[:8] for f in filas_xlsx[1:]] == [f[:8] for f in filas_csv[1:]]
+
+
+def test_eventos_historicos_y_metricas(client, admin):
+    eventos = client.get("/reportes/eventos-historicos/exportar?formato=csv", headers=admin)
+    assert len(_csv(eventos)) - 1 == int(eventos.headers["x-total-filas"])
+
+    metricas = _csv(client.get("/reportes/metricas-movilizacion/exportar?formato=csv", headers=admin))
+    datos = client.get("/reportes/metricas-movilizacion/", headers=admin).json()["metricas_por_lider"]
+    assert [f[0] for f in metricas[1:]] == [m["lider"] for m in datos]
+
+
+def test_formato_no_soportado(client, admin):
+    respuesta = client.get("/reportes/personas/exportar?formato=pdf", headers=admin)
+    assert respuesta.status_code == 400
+
+
+def test_csv_por_bloques(monkeypatch):
+    monkeypatch.setattr(exportacion, "EXPORTACION_LOTE", 10)
+    leidas = []
+
+    def filas():
+        for i in range(25):
+            leidas.append(i)
+            yield (i, f"fila {i}")
+
+    cuerpo = exportacion._csv(["ID", "Texto"], filas())
+    primero = next(cuerpo)
+    # El primer bloque sale tras EXPORTACION_LOTE filas, sin leer el resto
+    assert len(leidas) == 10
+    assert primero.decode("utf-8").count("\n") == 11
+    resto = list(cuerpo)
+    assert len(resto) == 2
+    assert b"".join([primero, *resto]).decode("utf-8").count("\n") == 26
@@ -0,0 +1,63 @@
+"""Migraciones versionadas sobre bases SQLite propias (no la de las demás pruebas)."""
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from app.migraciones import MIGRACIONES, VERSION_ESQUEMA, aplicar_migraciones, version_esquema
+from app.database import Base
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migraciones.db'}")
+    yield engine
+    engine.dispose()
+
+
+def _version(engine):
+    with engine.connect() as conn:
+        return version_esquema(conn)
+
+
+def _columnas(engine, tabla):
+    return {c["name"] for c in inspect(engine).get_columns(tabla)}
+
+
+def test_base_nueva(engine):
+    assert _version(engine) is None
+    assert aplicar_migraciones(engine) == [m.version for m in MIGRACIONES]
+    assert _version(engine) == VERSION_ESQUEMA == 3
+    tablas = set(inspect(engine).get_table_names())
+    assert {"schema_version", "usuarios", "contadores_red", "fotos_almacen"} <= tablas
+
+
+def test_base_al_dia_no_hace_nada(engine):
+    aplicar_migraciones(engine)
+    with engine.connect() as conn:
+        aplicadas = conn.execute(text("SELECT version, aplicada_en FROM schema_version ORDER BY version")).all()
+    assert aplicar_migraciones(engine) == []
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT version, aplicada_en FROM schema_version ORDER BY version")).all() == aplicadas
+
+
+def test_actualiza_esquema_anterior_a_las_migraciones(engine):
+    # Base creada por una versión vieja: sin schema_version, sin fotos_almacen
+    # y sin columnas que se agregaron después
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE fotos_almacen")
+        conn.exec_driver_sql("ALTER TABLE usuarios DROP COLUMN token_version")
+        conn.exec_driver_sql("ALTER TABLE reportes_ciudadanos DROP COLUMN subtipo")
+        conn.exec_driver_sql(
+            "INSERT INTO usuarios (username, nombre, email, password_hash, rol, activo) "
+            "VALUES ('viejo', 'Usuario viejo', 'viejo@pruebas.mx', 'x', 'capturista', 1)"
+        )
+    assert "token_version" not in _columnas(engine, "usuarios")
+
+    assert aplicar_migraciones(engine) == [1, 2, 3]
+    assert _version(engine) == VERSION_ESQUEMA
+    assert "token_version" in _columnas(engine, "usuarios")
+    assert "subtipo" in _columnas(engine, "reportes_ciudadanos")
+    assert "fotos_almacen" in inspect(engine).get_table_names()
+    with engine.connect() as conn:
+        # Los datos existentes se conservan y la columna nueva toma su valor por defecto
+        assert conn.execute(text("SELECT token_version FROM usuarios WHERE username = 'viejo'")).scalar() == 0
@@ -0,0 +1,72 @@
+"""Cuántas consultas hace cada reporte pesado, fijado con presupuesto_consultas.
+
+Los presupuestos son los de hoy e incluyen la autenticación (una consulta por
+petición). Si un cambio agrega consultas, el mensaje de la falla lista el
+SQL; una consulta repetida por líder, evento o reporte es un N+1.
+"""
+import pytest
+
+from app.medicion_consultas import presupuesto_consultas
+
+# ruta -> consultas (igual para admin y para un líder con subárbol)
+PRESUPUESTOS = {
+    "/reportes/personas": 5,
+    "/reportes/estructura-jerarquica": 2,
+    "/reportes/metricas-movilizacion/": 4,
+    "/reportes/mi-red": 2,
+}
+
+
+@pytest.mark.parametrize("usuario", ["admin", "lider"])
+@pytest.mark.parametrize("ruta", PRESUPUESTOS)
+def test_reportes(client, request, usuario, ruta):
+    encabezados = request.getfixturevalue(usuario)
+    with presupuesto_consultas(PRESUPUESTOS[ruta]):
+        respuesta = client.get(ruta, headers=encabezados)
+    assert respuesta.status_code == 200, respuesta.text
+
+
+def test_reporte_personas_por_lider(client, lider):
+    with presupuesto_consultas(PRESUPUESTOS["/reportes/personas"]):
+        datos = client.get("/reportes/personas", headers=lider).json()
+    # El regional y los 12 líderes debajo de él (uno sin personas activas)
+    assert len(datos["personas_por_lider"]) == 12
+    assert sum(datos["personas_por_lider"].values()) == datos["total_personas"]
+
+
+def test_mapa_pins(client):
+    # Reportes y primera foto de los que no tienen foto_url: dos consultas sin importar cuántos haya
+    with presupuesto_consultas(2):
+        respuesta = client.get("/reportes-ciudadanos/mapa/pins")
+    assert respuesta.status_code == 200, respuesta.text
+    pins = respuesta.json()
+    assert len(pins) == 30
+    assert all(p["foto_url"] for p in pins)
+
+
+def test_reporte_personas_con_lider_inactivo(client, admin):
+    # Las personas activas de un líder desactivado siguen contando, con su nombre
+    from app.database import SessionLocal
+    from app.models import Usuario
+
+    db = SessionLocal()
+    try:
+        inactivo = db.query(Usuario).filter(Usuario.email == "lider_zona0@pruebas.mx").one()
+        inactivo.activo = False
+        db.commit()
+        with presupuesto_consultas(PRESUPUESTOS["/reportes/personas"]):
+            datos = client.get("/reportes/personas", headers=admin).json()
+        assert datos["personas_por_lider"].get("lider_zona 0", 0) > 0
+        assert sum(datos["personas_por_lider"].values()) == datos["total_personas"]
+    finally:
+        inactivo.activo = True
+        db.commit()
+        db.close()
+
+
+def test_metricas_movilizacion_cuenta_todas_las_personas(client, admin):
+    with presupuesto_consultas(PRESUPUESTOS["/reportes/metricas-movilizacion/"]):
+        datos = client.get("/reportes/metricas-movilizacion/", headers=admin).json()
+    # El resumen cuenta las 180 activas; por líder cuentan también las 20 inactivas
+    assert datos["resumen_general"]["total_personas_registradas"] == 180
+    assert sum(m["personas_registradas"] for m in datos["metricas_por_lider"]) == 200
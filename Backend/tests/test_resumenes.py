@@ -0,0 +1,80 @@
+"""Resúmenes congelados: iguales al cálculo en vivo y sin duplicados al repetirse."""
+from sqlalchemy import select
+
+from app.metricas_eventos import calcular_metricas
+from app.resumenes import CAMPOS_METRICAS, generar_resumenes
+
+
+def _generar(**opciones):
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        resultado = generar_resumenes(db, **opciones)
+        db.commit()
+        return resultado
+    finally:
+        db.close()
+
+
+def test_resumenes_iguales_a_calculo_en_vivo(client, admin):
+    from app.database import SessionLocal
+    from app.models import ContadorRed, Evento, ResumenEvento, ResumenLiderDiario
+
+    db = SessionLocal()
+    try:
+        db.query(ResumenEvento).delete()
+        db.query(ResumenLiderDiario).delete()
+        db.commit()
+    finally:
+        db.close()
+    en_vivo = client.get("/reportes/eventos-historicos", headers=admin)
+    assert en_vivo.status_code == 200, en_vivo.text
+
+    resultado = _generar()
+    assert resultado["eventos"] > 0 and resultado["lideres"] > 0
+    congelado = client.get("/reportes/eventos-historicos", headers=admin)
+    assert congelado.json() == en_vivo.json()
+
+    db = SessionLocal()
+    try:
+        resumenes = db.query(ResumenEvento).all()
+        metricas = calcular_metricas(db, select(Evento.id))
+        for r in resumenes:
+            assert {c: getattr(r, c) for c in CAMPOS_METRICAS} == {c: metricas[r.id_evento][c] for c in CAMPOS_METRICAS}
+        contadores = {c.id_usuario: (c.personas_directas, c.personas_red, c.lideres_red)
+                      for c in db.query(ContadorRed).all()}
+        for r in db.query(ResumenLiderDiario).all():
+            assert (r.personas_directas, r.personas_red, r.lideres_red) == contadores[r.id_usuario]
+    finally:
+        db.close()
+
+
+def test_repetir_no_duplica(client):
+    from app.database import SessionLocal
+    from app.models import ResumenEvento, ResumenLiderDiario
+
+    _generar()
+    db = SessionLocal()
+    try:
+        antes = (db.query(ResumenEvento).count(), db.query(ResumenLiderDiario).count())
+    finally:
+        db.close()
+
+    # Otra corrida (otro worker, o la agendada después de una manual) no encuentra nada
+    assert _generar() == {"eventos": 0, "lideres": 0}
+    assert _generar(una_vez_al_dia=True) == {"eventos": 0, "lideres": 0}
+
+    db = SessionLocal()
+    try:
+        assert (db.query(ResumenEvento).count(), db.query(ResumenLiderDiario).count()) == antes
+    finally:
+        db.close()
+
+
+def test_recalcular_rehace_lo_mismo(client, admin):
+    respuesta = client.post("/reportes/resumenes/generar?recalcular=true", headers=admin)
+    assert respuesta.status_code == 200, respuesta.text
+    assert respuesta.json()["eventos"] > 0
+    # La corrida agendada ya no hace nada ese día aunque se haya recalculado
+    assert _generar(una_vez_al_dia=True) == {"eventos": 0, "lideres": 0}
@@ -0,0 +1,66 @@
+"""Access y refresh tokens: canje, tipo de token y revocación inmediata.
+
+Cada prueba usa su propio líder de zona, para no revocar los tokens de los
+fixtures ``admin`` y ``lider``.
+"""
+
+
+def _login(client, email):
+    respuesta = client.post("/token", data={"username": email, "password": "clave"})
+    assert respuesta.status_code == 200, respuesta.text
+    return respuesta.json()
+
+
+def _bearer(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _yo(client, token):
+    return client.get("/users/me", headers=_bearer(token))
+
+
+def test_canje_de_refresh(client):
+    tokens = _login(client, "lider_zona1@pruebas.mx")
+    assert tokens["refresh_token"] != tokens["access_token"]
+
+    respuesta = client.post("/token/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert respuesta.status_code == 200, respuesta.text
+    nuevo = respuesta.json()["access_token"]
+    assert _yo(client, nuevo).json()["email"] == "lider_zona1@pruebas.mx"
+
+
+def test_tipo_de_token(client):
+    tokens = _login(client, "lider_zona2@pruebas.mx")
+    # Un refresh token no sirve como access token, ni al revés
+    assert _yo(client, tokens["refresh_token"]).status_code == 401
+    respuesta = client.post("/token/refresh", json={"refresh_token": tokens["access_token"]})
+    assert respuesta.status_code == 401
+    assert client.post("/token/refresh", json={"refresh_token": "no-es-un-jwt"}).status_code == 401
+
+
+def test_revocar_mis_tokens(client):
+    tokens = _login(client, "lider_zona3@pruebas.mx")
+    otra_sesion = _login(client, "lider_zona3@pruebas.mx")
+    assert _yo(client, tokens["access_token"]).status_code == 200
+
+    assert client.post("/token/revocar", headers=_bearer(tokens["access_token"])).status_code == 200
+    # Todas las sesiones: los access y refresh tokens emitidos antes dejan de servir
+    for emitidos in (tokens, otra_sesion):
+        assert _yo(client, emitidos["access_token"]).status_code == 401
+        assert client.post("/token/refresh", json={"refresh_token": emitidos["refresh_token"]}).status_code == 401
+
+    assert _yo(client, _login(client, "lider_zona3@pruebas.mx")["access_token"]).status_code == 200
+
+
+def test_admin_revoca_tokens_de_otro(client, admin):
+    tokens = _login(client, "lider_zona4@pruebas.mx")
+    id_usuario = _yo(client, tokens["access_token"]).json()["id"]
+
+    respuesta = client.post(f"/users/{id_usuario}/revocar-tokens", headers=admin)
+    assert respuesta.status_code == 200, respuesta.text
+    assert _yo(client, tokens["access_token"]).status_code == 401
+    assert client.post("/token/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code == 401
+
+    # Solo el admin puede revocar los de otro
+    otro = _bearer(_login(client, "lider_zona5@pruebas.mx")["access_token"])
+    assert client.post(f"/users/{id_usuario}/revocar-tokens", headers=otro).status_code == 403
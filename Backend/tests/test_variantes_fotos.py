@@ -0,0 +1,86 @@
+"""Variantes de fotos: tamaños generados, el original mientras faltan y fotos ilegibles."""
+import io
+
+import pytest
+from PIL import Image
+
+from app import almacen_fotos
+from app.almacen_fotos import AlmacenDisco, guardar_foto
+from app.variantes_fotos import FORMATOS, TAMANOS, clave_variante, encolar_variantes, generar_variantes, url_variante
+
+
+@pytest.fixture(autouse=True)
+def almacen(tmp_path, monkeypatch):
+    destino = AlmacenDisco(str(tmp_path))
+    monkeypatch.setattr(almacen_fotos, "_almacen", destino)
+    return destino
+
+
+def _imagen(ancho, alto, modo="RGB", formato="JPEG", color=(200, 30, 30)):
+    salida = io.BytesIO()
+    Image.new(modo, (ancho, alto), color).save(salida, formato)
+    return salida.getvalue()
+
+
+def _clave(url):
+    return url.rsplit("/", 1)[1].split(".")[0]
+
+
+def test_genera_todos_los_tamanos(almacen):
+    clave = _clave(guardar_foto(_imagen(3000, 1500)))
+    assert generar_variantes(clave)
+    for tamano, lado in TAMANOS.items():
+        for ext, formato in FORMATOS.items():
+            with Image.open(io.BytesIO(almacen.leer(clave_variante(clave, tamano, ext)))) as variante:
+                assert variante.format == formato
+                assert variante.size == (lado, lado // 2)
+
+
+def test_no_agranda_y_quita_transparencia_en_jpeg(almacen):
+    clave = _clave(guardar_foto(_imagen(100, 40, "RGBA", "PNG", (0, 0, 255, 128))))
+    assert generar_variantes(clave)
+    with Image.open(io.BytesIO(almacen.leer(clave_variante(clave, "completa", ".jpg")))) as jpeg:
+        assert jpeg.size == (100, 40) and jpeg.mode == "RGB"
+    with Image.open(io.BytesIO(almacen.leer(clave_variante(clave, "mini", ".webp")))) as webp:
+        assert webp.size == (100, 40) and webp.mode == "RGBA"
+
+
+def test_original_mientras_falta_la_variante(client, almacen):
+    original = _imagen(800, 600, color=(10, 120, 10))
+    clave = _clave(guardar_foto(original))
+
+    respuesta = client.get(f"/fotos/{clave}_mini.webp")
+    assert respuesta.status_code == 200
+    assert respuesta.content == original
+    assert respuesta.headers["cache-control"] == "no-cache"
+
+    # La petición agendó la variante; cuando termina se sirve ya la variante
+    encolar_variantes(clave).result(timeout=30)
+    respuesta = client.get(f"/fotos/{clave}_mini.webp")
+    assert respuesta.headers["content-type"] == "image/webp"
+    assert "immutable" in respuesta.headers["cache-control"]
+    with Image.open(io.BytesIO(respuesta.content)) as variante:
+        assert variante.size == (320, 240)
+
+
+def test_foto_ilegible(client, almacen):
+    datos = b"\xff\xd8\xff no es un jpeg completo" * 10
+    clave = _clave(guardar_foto(datos))
+    assert generar_variantes(clave) is False
+
+    assert encolar_variantes(clave).result(timeout=30) is False
+    # No se reintenta durante VARIANTES_REINTENTO_SEGUNDOS y se sigue sirviendo el original
+    assert encolar_variantes(clave) is None
+    respuesta = client.get(f"/fotos/{clave}_media.jpg")
+    assert respuesta.status_code == 200 and respuesta.content == datos
+    assert not almacen.existe(clave_variante(clave, "media", ".jpg"))
+
+
+def test_url_variante():
+    clave = "ab" * 32
+    assert url_variante(f"/fotos/{clave}.jpg") == f"/fotos/{clave}_mini.webp"
+    assert url_variante(f"https://api.ejemplo.mx/fotos/{clave}.png", "media", ".jpg") == \
+        f"https://api.ejemplo.mx/fotos/{clave}_media.jpg"
+    assert url_variante(f"/fotos/{clave}.bin") is None
+    assert url_variante("https://res.cloudinary.com/demo/foto.jpg") is None
+    assert url_variante(None) is None
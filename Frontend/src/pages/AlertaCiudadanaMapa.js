@@ -360,12 +360,12 @@ export default function AlertaCiudadanaMapa() {
               <Marker
                 key={r.id}
                 position={[r.latitud, r.longitud]}
-                icon={makePinIcon(r.tipo, r.estado, r.foto_url)}
+                icon={makePinIcon(r.tipo, r.estado, r.foto_miniatura || r.foto_url)}
               >
                 <Popup maxWidth={260} minWidth={210}>
                   {r.foto_url && (
                     <img
-                      src={r.foto_url}
+                      src={r.foto_miniatura || r.foto_url}
                       alt=""
                       style={{ width: '100%', height: 110, objectFit: 'cover', borderRadius: '8px 8px 0 0', display: 'block' }}
                       onError={e => e.target.style.display = 'none'}
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 Script para importar datos del padrón electoral via API
-Con reconexión automática cuando expire el token
+Con renovación automática del token (refresh token) cuando expire
 """
 
 import pandas as pd
@@ -15,8 +15,11 @@ API_BASE = "https://red-ciudadana-production.up.railway.app"
 USERNAME = "admin@redciudadana.com"
 PASSWORD = "admin123"
 
+refresh_token = None
+
 def login():
     """Iniciar sesión y obtener token"""
+    global refresh_token
     print("🔐 Iniciando sesión...")
     
     login_data = {
@@ -30,6 +33,7 @@ def login():
         if response.status_code == 200:
             data = response.json()
             token = data.get("access_token")
+            refresh_token = data.get("refresh_token")
             print("✅ Login exitoso")
             return token
         else:
@@ -39,6 +43,18 @@ def login():
         print(f"❌ Error de conexión: {str(e)}")
         return None
 
+def renovar_token():
+    """Obtener un token nuevo con el refresh token; si no es posible, iniciar sesión de nuevo"""
+    if refresh_token:
+        try:
+            response = requests.post(f"{API_BASE}/token/refresh", json={"refresh_token": refresh_token}, timeout=30)
+            if response.status_code == 200:
+                print("✅ Token renovado")
+                return response.json().get("access_token")
+        except Exception as e:
+            print(f"⚠️ Error renovando token: {str(e)}")
+    return login()
+
 def procesar_archivo_excel(archivo_excel):
     """Procesar archivo Excel y preparar datos para la API"""
     try:
@@ -129,8 +145,8 @@ def importar_datos_via_api(datos, token, inicio_lote=0):
                     break
                     
                 elif response.status_code == 401:
-                    print(f"🔄 Token expirado, reconectando...")
-                    token = login()
+                    print(f"🔄 Token expirado, renovando...")
+                    token = renovar_token()
                     if not token:
                         print(f"❌ No se pudo reconectar, deteniendo importación")
                         return total_enviados, total_guardados